@@ -0,0 +1,7 @@
+"""
+Benchmarks of the chunkers and the gRPC server.
+
+- ``python -m benchmarks.micro``: every registered chunker on generated inputs
+- ``python -m benchmarks.load``: concurrent LLM-like streams against the server
+- ``python -m benchmarks.compare``: a report against a baseline report
+"""
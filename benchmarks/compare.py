@@ -0,0 +1,70 @@
+"""
+Compare a benchmark report against a baseline.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.1
+
+Results are matched by name. Exits with status 1 if any throughput metric
+dropped, or any latency or memory metric rose, by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from .report import flatten
+
+
+def direction(metric: str) -> Optional[int]:
+    """1 if higher values of ``metric`` are better, -1 if lower, None if neither."""
+    if metric.endswith("_per_second") or metric == "speedup":
+        return 1
+    if metric == "errors" or metric == "peak_rss_kb" or "_ms." in metric:
+        return -1
+    return None
+
+
+def compare(baseline, current, threshold: float) -> Iterator[Tuple[str, str, float, float, float, bool]]:
+    """(name, metric, baseline, current, relative change, regressed) of comparable metrics."""
+    baseline_results = {result["name"]: flatten(result) for result in baseline["results"]}
+    for result in current["results"]:
+        before = baseline_results.get(result["name"])
+        if before is None:
+            continue
+        for metric, value in flatten(result).items():
+            sign = direction(metric)
+            if sign is None or metric not in before:
+                continue
+            old = before[metric]
+            change = (value - old) / old if old else (0.0 if value == old else float("inf"))
+            yield result["name"], metric, old, value, change, -sign * change > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark reports")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative change counted as a regression"
+    )
+    parser.add_argument("--all", action="store_true", help="list unchanged metrics too")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text())
+    current = json.loads(Path(args.current).read_text())
+    if baseline.get("kind") != current.get("kind"):
+        sys.exit(f"Cannot compare a {baseline.get('kind')} report with a {current.get('kind')} report")
+
+    regressions = 0
+    for name, metric, old, new, change, regressed in compare(baseline, current, args.threshold):
+        regressions += regressed
+        if regressed or args.all or abs(change) > args.threshold:
+            marker = "REGRESSION" if regressed else "improved" if abs(change) > args.threshold else ""
+            print(f"{name} {metric}: {old:g} -> {new:g} ({change:+.1%}) {marker}".rstrip())
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Deterministic benchmark inputs.
+"""
+
+import random
+import re
+from typing import Callable, Dict, List
+
+SHAPES = ("prose", "code", "no_punctuation", "cjk")
+
+_WORDS = (
+    "the model answer question user system request response stream token "
+    "chunk detector policy content safety language text output input data "
+    "result value example service server client orchestrator guardrail "
+    "sentence paragraph document context window length limit batch"
+).split()
+_NAMES = ("Alice", "Bob", "Paris", "Monday", "Python", "Dr.", "Mr.", "U.S.")
+_CJK_PUNCTUATION = "。！？，"
+
+
+def _sentence(rnd: random.Random) -> str:
+    words = [rnd.choice(_WORDS) for _ in range(rnd.randint(4, 18))]
+    if rnd.random() < 0.3:
+        words.insert(rnd.randrange(len(words)), rnd.choice(_NAMES))
+    if rnd.random() < 0.2:
+        words.append(f"{rnd.randint(1, 99)}.{rnd.randint(0, 9)}")
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rnd.choice(".....!?")
+
+
+def _prose(rnd: random.Random) -> str:
+    paragraph = " ".join(_sentence(rnd) for _ in range(rnd.randint(2, 6)))
+    return paragraph + "\n\n"
+
+
+def _code(rnd: random.Random) -> str:
+    name = "_".join(rnd.sample(_WORDS, 2))
+    lines = [f"def {name}({rnd.choice(_WORDS)}, {rnd.choice(_WORDS)}=None):"]
+    for _ in range(rnd.randint(2, 8)):
+        left, right = rnd.sample(_WORDS, 2)
+        lines.append(f"    {left} = {right}.get({rnd.randint(0, 9)!r}) or [{rnd.randint(0, 99)}]")
+    lines.append(f"    return {rnd.choice(_WORDS)}\n\n")
+    return "\n".join(lines)
+
+
+def _no_punctuation(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(20, 60))) + " "
+
+
+def _cjk(rnd: random.Random) -> str:
+    characters = "".join(chr(rnd.randint(0x4E00, 0x62FF)) for _ in range(rnd.randint(8, 30)))
+    return characters + rnd.choice(_CJK_PUNCTUATION)
+
+
+_GENERATORS: Dict[str, Callable[[random.Random], str]] = {
+    "prose": _prose,
+    "code": _code,
+    "no_punctuation": _no_punctuation,
+    "cjk": _cjk,
+}
+
+
+def generate(shape: str, size: int, seed: int = 0) -> str:
+    """Text of the given shape, exactly ``size`` characters long."""
+    rnd = random.Random(f"{shape}-{seed}")
+    parts = []
+    length = 0
+    while length < size:
+        part = _GENERATORS[shape](rnd)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+# Roughly what LLM tokenizers produce: a word piece of up to four characters
+# with its leading whitespace, or a run of whitespace
+_TOKEN = re.compile(r"\s*\S{1,4}|\s+")
+
+
+def llm_tokens(text: str) -> List[str]:
+    """Split text into pieces the size of LLM output tokens."""
+    return _TOKEN.findall(text)
@@ -0,0 +1,269 @@
+"""
+Load generator for the gRPC server.
+
+Replays LLM output as bidi streams of one token per message, optionally
+paced at a given token rate, from many concurrent clients. Unary requests
+and document uploads send the same texts whole and in segments. Unless
+``--target`` names a running server, the server is started in this process
+with ``grpc_server.serve`` (or ``serve_async`` for ``--mode aio``), so the
+reported peak RSS covers server and clients together.
+
+    python -m benchmarks.load --concurrency 32 --streams 256 --tokens-per-second 50
+
+Chunk latency is the time from sending the message that completes a chunk
+to receiving the chunk, taken as the last message sent before the chunk
+arrived; with ``--tokens-per-second`` slower than the server answers, that
+is the completing message. Time to first chunk runs from the start of the
+stream.
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent import futures
+from typing import Any, Dict, List
+
+import grpc
+
+from .corpus import SHAPES, generate, llm_tokens
+from .report import latency_summary, peak_rss_kb, print_table, write_report
+
+
+def start_server(mode: str) -> None:
+    """Run the server on a daemon thread of this process."""
+    from chunkers import grpc_server
+
+    if mode == "aio":
+        from chunkers.aio_server import serve_async
+
+        target = lambda: asyncio.run(serve_async())  # noqa: E731
+    else:
+        target = grpc_server.serve
+    threading.Thread(target=target, name="benchmark-server", daemon=True).start()
+
+
+def _stream(stub, request_type, tokens: List[str], interval: float, metadata) -> Dict[str, Any]:
+    """Send one stream, returning its timings."""
+    sent = []
+
+    def requests():
+        next_at = time.perf_counter()
+        for index, token in enumerate(tokens):
+            if interval:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_at += interval
+            sent.append(time.perf_counter())
+            yield request_type(text_stream=token, input_index_stream=index)
+
+    started = time.perf_counter()
+    first_chunk = None
+    latencies = []
+    for response in stub.BidiStreamingChunkerTokenizationTaskPredict(requests(), metadata=metadata):
+        if not response.results:
+            continue
+        now = time.perf_counter()
+        # Chunks completed by a message carry the index of the message
+        # before it as input_end_index; the completing one is the last sent
+        completed_by = sent[-1]
+        if first_chunk is None:
+            first_chunk = now - started
+        # A coalesced response carries several chunks completed by one message
+        latencies.extend([now - completed_by] * len(response.results))
+    return {
+        "duration": time.perf_counter() - started,
+        "first_chunk": first_chunk,
+        "latencies": latencies,
+    }
+
+
+def run_streams(stub, args, texts) -> Dict[str, Any]:
+    from chunkers import chunkers_pb2
+
+    metadata = _metadata(args)
+    interval = 1 / args.tokens_per_second if args.tokens_per_second else 0.0
+    token_lists = [llm_tokens(text) for text in texts]
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(args.concurrency) as pool:
+        calls = [
+            pool.submit(
+                _stream,
+                stub,
+                chunkers_pb2.BidiStreamingChunkerTokenizationTaskRequest,
+                tokens,
+                interval,
+                metadata,
+            )
+            for tokens in token_lists
+        ]
+        streams, errors = _gather(calls)
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for stream in streams for latency in stream["latencies"]]
+    return {
+        "name": f"load/stream/{_scenario(args)}",
+        "streams": len(texts),
+        "errors": errors,
+        "tokens_per_second_per_stream": args.tokens_per_second,
+        "streams_per_second": round(len(streams) / elapsed, 3),
+        "chars_per_second": round(sum(map(len, texts)) / elapsed),
+        "chunks_per_second": round(len(latencies) / elapsed, 3),
+        "latency_ms": latency_summary(latencies),
+        "ttfc_ms": latency_summary(
+            [stream["first_chunk"] for stream in streams if stream["first_chunk"] is not None]
+        ),
+        "stream_duration_ms": latency_summary([stream["duration"] for stream in streams]),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _unary(stub, request, metadata) -> float:
+    started = time.perf_counter()
+    stub.ChunkerTokenizationTaskPredict(request, metadata=metadata)
+    return time.perf_counter() - started
+
+
+def run_unary(stub, args, texts) -> Dict[str, Any]:
+    from chunkers import chunkers_pb2
+
+    metadata = _metadata(args)
+    requests = [chunkers_pb2.ChunkerTokenizationTaskRequest(text=text) for text in texts]
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(args.concurrency) as pool:
+        calls = [pool.submit(_unary, stub, request, metadata) for request in requests]
+        latencies, errors = _gather(calls)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": f"load/unary/{_scenario(args)}",
+        "requests": len(texts),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 3),
+        "chars_per_second": round(sum(map(len, texts)) / elapsed),
+        "latency_ms": latency_summary(latencies),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _upload(stub, request_type, text: str, segment_size: int, metadata) -> float:
+    """Upload one document in UTF-8 segments, returning the time until its last chunk."""
+    data = text.encode()
+    segments = [
+        request_type(data=data[start : start + segment_size])
+        for start in range(0, len(data), segment_size)
+    ]
+    started = time.perf_counter()
+    for _ in stub.UploadChunkerTokenizationTaskPredict(iter(segments), metadata=metadata):
+        pass
+    return time.perf_counter() - started
+
+
+def run_uploads(stub, args, texts) -> Dict[str, Any]:
+    from chunkers import chunkers_pb2
+
+    metadata = _metadata(args)
+    request_type = chunkers_pb2.UploadChunkerTokenizationTaskRequest
+
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(args.concurrency) as pool:
+        calls = [
+            pool.submit(_upload, stub, request_type, text, args.segment_size, metadata)
+            for text in texts
+        ]
+        latencies, errors = _gather(calls)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "name": f"load/upload/{_scenario(args)}/s{args.segment_size}",
+        "uploads": len(texts),
+        "errors": errors,
+        "uploads_per_second": round(len(latencies) / elapsed, 3),
+        "chars_per_second": round(sum(map(len, texts)) / elapsed),
+        "latency_ms": latency_summary(latencies),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _metadata(args):
+    metadata = [("mm-model-id", args.chunker)]
+    if args.offsets_only:
+        metadata.append(("mm-offsets-only", "true"))
+    if args.coalesce:
+        metadata.append(("mm-coalesce-chunks", "true"))
+    return tuple(metadata)
+
+
+def _scenario(args) -> str:
+    """Result name suffix identifying the load and the response options requested."""
+    name = f"{args.chunker}/{args.shape}/{args.size}/c{args.concurrency}"
+    return name + ("/offsets" if args.offsets_only else "") + ("/coalesce" if args.coalesce else "")
+
+
+def _gather(calls):
+    """Results of finished calls, and the number that failed."""
+    results = []
+    errors = 0
+    for call in calls:
+        try:
+            results.append(call.result())
+        except grpc.RpcError:
+            errors += 1
+    return results, errors
+
+
+RUNS = {"stream": run_streams, "unary": run_unary, "upload": run_uploads}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gRPC server load generator")
+    parser.add_argument("--target", help="host:port of a running server (default: start one)")
+    parser.add_argument("--mode", choices=["thread", "aio"], default="thread")
+    parser.add_argument("--rpcs", default="stream,unary", help="comma-separated: stream,unary,upload")
+    parser.add_argument("--chunker", default="sentence")
+    parser.add_argument("--shape", choices=SHAPES, default="prose")
+    parser.add_argument("--size", type=int, default=4096, help="characters per stream or request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--streams", type=int, default=64, help="streams or requests per RPC type")
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=0,
+        help="pace of each stream; 0 sends as fast as possible",
+    )
+    parser.add_argument(
+        "--segment-size", type=int, default=64 * 1024, help="bytes per upload segment"
+    )
+    parser.add_argument(
+        "--offsets-only", action="store_true", help="request chunk offsets without chunk text"
+    )
+    parser.add_argument(
+        "--coalesce", action="store_true", help="request one stream response per message"
+    )
+    parser.add_argument("--output", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    # Per-request log lines would compete with the clients for the CPU
+    os.environ.setdefault("CHUNKER_LOG_LEVEL", "WARNING")
+    from chunkers import chunkers_pb2_grpc, grpc_server
+
+    target = args.target
+    if target is None:
+        start_server(args.mode)
+        target = f"localhost:{grpc_server.PORT}"
+    channel = grpc.insecure_channel(target)
+    grpc.channel_ready_future(channel).result(timeout=60)
+    stub = chunkers_pb2_grpc.ChunkersServiceStub(channel)
+
+    texts = [generate(args.shape, args.size, seed) for seed in range(args.streams)]
+    results = [RUNS[rpc.strip()](stub, args, texts) for rpc in args.rpcs.split(",") if rpc.strip()]
+    print_table(results, ["errors", "chars_per_second", "latency_ms.p50", "latency_ms.p99", "ttfc_ms.p50"])
+    write_report("load", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Micro-benchmarks of every registered chunker.
+
+Each chunker chunks generated texts of each shape and size, both in one
+``chunk`` call and as a stream of LLM-sized tokens through a
+``StreamSession``, the way the server handles them. The ``scan`` mode
+times the sentence chunker's per-terminator scan against the single
+regular expression it replaced, on the same text.
+
+    python -m benchmarks.micro --sizes 1024,65536 --output micro.json
+"""
+
+import argparse
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from chunkers import get_chunker_registry
+from chunkers.base_chunker import BaseChunker
+from chunkers.sentence_chunker import SentenceChunker
+from chunkers.stream_session import StreamSession
+
+from .corpus import SHAPES, generate, llm_tokens
+from .report import latency_summary, peak_rss_kb, print_table, write_report
+
+
+def bench_unary(chunker: BaseChunker, shape: str, text: str, repeat: int) -> Dict[str, Any]:
+    """Chunk ``text`` in one call, ``repeat`` times after a warm-up."""
+    chunker.chunk(text)
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = chunker.chunk(text)
+        durations.append(time.perf_counter() - started)
+    return {
+        "name": f"micro/unary/{chunker.name}/{shape}/{len(text)}",
+        "chunks": len(chunks),
+        "chars_per_second": round(len(text) * repeat / sum(durations)),
+        "latency_ms": latency_summary(durations),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def bench_stream(chunker: BaseChunker, shape: str, text: str, repeat: int) -> Dict[str, Any]:
+    """
+    Stream ``text`` token by token, ``repeat`` times.
+
+    Latency is that of single messages, including finalizing the stream.
+    Time to first chunk runs from the start of the stream to the first
+    message that emits a chunk.
+    """
+    tokens = llm_tokens(text)
+    durations = []
+    first_chunk = []
+    total = 0.0
+    for _ in range(repeat):
+        session = StreamSession(chunker)
+        stream_started = time.perf_counter()
+        first = None
+        for index, token in enumerate(tokens):
+            started = time.perf_counter()
+            chunks = session.feed(token, index)
+            now = time.perf_counter()
+            durations.append(now - started)
+            if chunks and first is None:
+                first = now - stream_started
+        started = time.perf_counter()
+        chunks = session.finalize()
+        now = time.perf_counter()
+        durations.append(now - started)
+        if first is None:
+            first = now - stream_started
+        first_chunk.append(first)
+        total += now - stream_started
+    return {
+        "name": f"micro/stream/{chunker.name}/{shape}/{len(text)}",
+        "messages": len(tokens),
+        "chunks": session.chunks,
+        "chars_per_second": round(len(text) * repeat / total),
+        "latency_ms": latency_summary(durations),
+        "ttfc_ms": latency_summary(first_chunk),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+# ``SentenceChunker.DEFAULT_PATTERN`` spelled differently, so that the chunker
+# runs it as a custom pattern: one regular expression over the whole text
+SINGLE_REGEX = r"(?:[.!?]+(?=\s+[A-Z]|$))"
+
+
+def _best(func, *args, repeat: int) -> float:
+    func(*args)
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - started)
+    return min(durations)
+
+
+def bench_scan(chunker: BaseChunker, shape: str, text: str, repeat: int) -> Optional[Dict[str, Any]]:
+    """
+    Split ``text`` into sentences with the per-terminator scan and with the
+    single regular expression, best of ``repeat`` runs each.
+
+    Only sentence chunkers with the default rules have both; others are
+    skipped. ``speedup`` is the single expression's time over the scan's.
+    """
+    if not isinstance(chunker, SentenceChunker) or chunker.params != SentenceChunker().params:
+        return None
+    spans = list(chunker.chunk_spans(text))
+    if list(chunker.chunk_spans(text, pattern=SINGLE_REGEX)) != spans:
+        raise SystemExit(f"{chunker.name}: the scan and the single expression disagree on {shape} text")
+    scan = _best(chunker.chunk_spans, text, repeat=repeat)
+    single = _best(lambda text: chunker.chunk_spans(text, pattern=SINGLE_REGEX), text, repeat=repeat)
+    return {
+        "name": f"micro/scan/{chunker.name}/{shape}/{len(text)}",
+        "chunks": len(spans),
+        "chars_per_second": round(len(text) / scan),
+        "single_regex_chars_per_second": round(len(text) / single),
+        "speedup": round(single / scan, 2),
+    }
+
+
+BENCHMARKS = {"unary": bench_unary, "stream": bench_stream, "scan": bench_scan}
+
+
+def run(chunker_names, shapes, sizes, modes, repeat) -> List[Dict[str, Any]]:
+    registry = get_chunker_registry()
+    # Chunkers are loaded on first use; loading them all up front drops
+    # those that fail to load from the list
+    registry.warmup(chunker_names or None)
+    results = []
+    for name in chunker_names or registry.list_names():
+        chunker = registry.get(name)
+        if chunker is None:
+            raise SystemExit(f"Unknown chunker: {name}. Available: {registry.list_names()}")
+        for shape in shapes:
+            for size in sizes:
+                text = generate(shape, size)
+                for mode in modes:
+                    result = BENCHMARKS[mode](chunker, shape, text, repeat)
+                    if result is not None:
+                        results.append(result)
+    return results
+
+
+def _list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunker micro-benchmarks")
+    parser.add_argument("--chunkers", type=_list, default=[], help="comma-separated (default: all)")
+    parser.add_argument("--shapes", type=_list, default=list(SHAPES), help="comma-separated")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in _list(value)],
+        default=[1024, 16384],
+        help="comma-separated input sizes in characters",
+    )
+    parser.add_argument("--modes", type=_list, default=list(BENCHMARKS), help="unary,stream,scan")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="JSON report path (default: stdout)")
+    args = parser.parse_args()
+
+    # Chunkers may warn on every call, e.g. about oversized chunks
+    logging.basicConfig(level=logging.ERROR)
+    results = run(args.chunkers, args.shapes, args.sizes, args.modes, args.repeat)
+    print_table(results, ["chars_per_second", "latency_ms.p50", "latency_ms.p99", "ttfc_ms.p50", "speedup"])
+    write_report("micro", results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Summary statistics and the JSON report format shared by the benchmarks.
+
+A report is an object with the benchmark ``kind``, the ``environment`` it
+ran in and a list of ``results``. Each result has a unique ``name`` and
+numeric metrics, some of them nested one level such as ``latency_ms.p99``.
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """The ``q``-th percentile of ``values``, interpolating between ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    """p50, p99, mean and max of durations, in milliseconds."""
+    if not seconds:
+        return {"p50": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(seconds, 50) * 1000, 4),
+        "p99": round(percentile(seconds, 99) * 1000, 4),
+        "mean": round(sum(seconds) / len(seconds) * 1000, 4),
+        "max": round(max(seconds) * 1000, 4),
+    }
+
+
+def peak_rss_kb() -> int:
+    """Peak resident set size of this process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what the benchmark ran, to judge whether reports compare."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_report(kind: str, results: List[Dict[str, Any]], output: Optional[str]) -> None:
+    """Write a report as JSON to ``output``, or to stdout if None."""
+    report = {"kind": kind, "environment": environment(), "results": results}
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).write_text(text + "\n")
+    else:
+        print(text)
+
+
+def print_table(results: List[Dict[str, Any]], columns: Sequence[str]) -> None:
+    """Print selected metrics of each result to stderr, one result per line."""
+    rows = [["name", *columns]]
+    for result in results:
+        rows.append([result["name"], *(_format(flatten(result).get(column)) for column in columns)])
+    widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)), file=sys.stderr)
+
+
+def flatten(result: Dict[str, Any]) -> Dict[str, Any]:
+    """A result's metrics with nested ones keyed as ``outer.inner``."""
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            for inner, inner_value in value.items():
+                flat[f"{key}.{inner}"] = inner_value
+        else:
+            flat[key] = value
+    return flat
+
+
+def _format(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
@@ -3,22 +3,33 @@ Chunker microservice for FMS Guardrails Orchestrator.
 """
 
 import logging
+import os
+import time
+from typing import Dict, List
+
+# Start of the package import, from which startup durations are measured
+IMPORT_STARTED = time.perf_counter()
 
 from .base_chunker import BaseChunker
 from .chunker_factory import ChunkerFactory
 from .chunker_registry import ChunkerRegistry
+from .incremental_chunker import IncrementalChunker
 from .sentence_chunker import SentenceChunker
+from .spans import Spans
 
 logger = logging.getLogger(__name__)
 
-# Create and populate the global registry
-_registry = ChunkerRegistry()
+# Create and populate the global registry. Chunkers from the configuration
+# are only built on first use or warmup, as some backends load slowly.
+_registry = ChunkerRegistry(
+    max_configured=int(os.environ.get("CHUNKER_PARAMS_CACHE_SIZE", 64))
+)
 _registry.register(SentenceChunker())
 try:
-    factory_chunkers = ChunkerFactory.create_from_config()
-    for chunker in factory_chunkers:
-        _registry.register(chunker)
-    logger.info(f"Registered {len(factory_chunkers)} chunkers from configuration")
+    factory_loaders = ChunkerFactory.loaders_from_config()
+    for name, loader, chunker_config in factory_loaders:
+        _registry.register_lazy(name, loader, chunker_config)
+    logger.info(f"Registered {len(factory_loaders)} chunkers from configuration")
 except Exception as e:
     logger.warning(f"Failed to load chunkers from configuration: {e}")
 
@@ -28,10 +39,23 @@ def get_chunker_registry() -> ChunkerRegistry:
     return _registry
 
 
+def reload_chunker_config() -> Dict[str, List[str]]:
+    """
+    Reload the config file into the global registry, see ``ChunkerRegistry.reload``.
+
+    Raises:
+        Exception: If the file cannot be read, in which case nothing changes
+    """
+    return _registry.reload(ChunkerFactory.loaders_from_config(strict=True))
+
+
 __all__ = [
     "BaseChunker",
+    "IncrementalChunker",
     "SentenceChunker",
+    "Spans",
     "ChunkerRegistry",
     "ChunkerFactory",
     "get_chunker_registry",
+    "reload_chunker_config",
 ]
@@ -0,0 +1,348 @@
+"""
+Admission control and per-chunker executors.
+
+The chunking work of each chunker runs on its own lane, a thread pool of
+limited size with a bounded queue, so requests for an expensive chunker
+cannot take the threads that requests for a cheap one need. Before work is
+queued on a lane, the time it would take is estimated from the characters
+already admitted to the lane and the rate at which the lane has been
+chunking. Work that would not finish within the latency budget is rejected
+at once with a retry hint, instead of waiting in a queue without bound.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Mapping, Optional
+
+from .metrics import (LANE_QUEUED, LANE_RUNNING, SHED_REQUESTS,
+                      TimedThreadPoolExecutor)
+
+if TYPE_CHECKING:
+    from concurrent import futures
+
+    from .chunker_registry import ChunkerRegistry
+    from .metrics import RequestStats
+
+logger = logging.getLogger(__name__)
+
+# Defaults of the lane of a chunker without an ``admission`` block
+LANE_CONCURRENCY = int(os.environ.get("CHUNKER_LANE_CONCURRENCY", 2))
+LANE_MAX_QUEUED = int(os.environ.get("CHUNKER_LANE_MAX_QUEUED", 8))
+# Milliseconds admitted work may be estimated to take; 0 disables the estimate
+LATENCY_BUDGET_MS = float(os.environ.get("CHUNKER_LATENCY_BUDGET_MS", 1000))
+
+# Trailing metadata key of the retry hint of a rejected request, which gRPC
+# clients with a retry policy wait for before retrying
+RETRY_PUSHBACK_KEY = "grpc-retry-pushback-ms"
+
+
+class Overloaded(Exception):
+    """
+    Raised when admitting work would exceed the limits of its lane.
+
+    Attributes:
+        reason: ``queue_full`` or ``budget``
+        retry_after: Seconds after which the lane is expected to accept the work
+    """
+
+    def __init__(self, model_id: str, reason: str, retry_after: float):
+        super().__init__(
+            f"Chunker {model_id} is overloaded ({reason}), retry in {retry_after * 1000:.0f} ms"
+        )
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionPolicy:
+    """
+    Limits of the lane of one chunker.
+
+    Args:
+        concurrency: Number of threads chunking for the lane
+        max_queued: Number of calls that may wait for a thread; more are rejected
+        budget: Seconds admitted work may be estimated to take, including
+            its wait for a thread; None admits work whenever the queue has room
+    """
+
+    SETTINGS = ("concurrency", "max_queued", "budget_ms")
+
+    def __init__(
+        self,
+        concurrency: int = LANE_CONCURRENCY,
+        max_queued: int = LANE_MAX_QUEUED,
+        budget: Optional[float] = LATENCY_BUDGET_MS / 1000 or None,
+    ):
+        if concurrency <= 0:
+            raise ValueError(f"concurrency must be positive, got {concurrency}")
+        if max_queued < 0:
+            raise ValueError(f"max_queued must be at least 0, got {max_queued}")
+        if budget is not None and budget <= 0:
+            raise ValueError(f"budget must be positive, got {budget}")
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.budget = budget
+
+    def __repr__(self) -> str:
+        return (
+            f"AdmissionPolicy(concurrency={self.concurrency}, "
+            f"max_queued={self.max_queued}, budget={self.budget})"
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, AdmissionPolicy):
+            return NotImplemented
+        return (self.concurrency, self.max_queued, self.budget) == (
+            other.concurrency, other.max_queued, other.budget
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.concurrency, self.max_queued, self.budget))
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["AdmissionPolicy"]:
+        """Create a policy from an ``admission`` block in chunker_config.yaml."""
+        if not config:
+            return None
+        unknown = set(config) - set(cls.SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown admission settings: {sorted(unknown)}")
+        settings = {key: config[key] for key in ("concurrency", "max_queued") if key in config}
+        if "budget_ms" in config:
+            settings["budget"] = config["budget_ms"] / 1000 if config["budget_ms"] else None
+        return cls(**settings)
+
+
+class Lane:
+    """
+    Executor and admission accounting of one chunker.
+
+    Work is admitted while a thread is free. Once all are busy, further work
+    waits in the queue if there is room and its estimated completion is
+    within the budget: the characters already admitted, spread over the
+    threads, plus its own, at the lane's measured seconds per character.
+
+    Args:
+        model_id: Registered name of the chunker
+        policy: Limits of the lane
+    """
+
+    # Weight of the latest call in the measured seconds per character
+    RATE_SMOOTHING = 0.2
+    # Calls on fewer characters than this are not measured, as their fixed
+    # costs would dominate
+    RATE_MIN_CHARS = 1024
+
+    def __init__(self, model_id: str, policy: AdmissionPolicy):
+        self.model_id = model_id
+        self.policy = policy
+        self.executor = TimedThreadPoolExecutor(
+            max_workers=policy.concurrency,
+            thread_name_prefix=f"lane-{model_id}",
+            executor_name=f"lane:{model_id}",
+        )
+        self.seconds_per_char: Optional[float] = None
+        self._lock = threading.Lock()
+        # Admitted calls that did not finish, and how many of them started
+        self._admitted = 0
+        self._running = 0
+        self._admitted_chars = 0
+        self._queued_gauge = LANE_QUEUED.labels(model_id)
+        self._running_gauge = LANE_RUNNING.labels(model_id)
+        # What this lane added to the gauges, which a lane replaced after a
+        # config reload shares with its successor until its calls finish
+        self._published = (0, 0)
+
+    def check(self, size: int) -> None:
+        """
+        Check that work on ``size`` characters would be admitted now.
+
+        Raises:
+            Overloaded: If the queue is full or the work would exceed the budget
+        """
+        with self._lock:
+            self._check(size)
+
+    def submit(
+        self,
+        size: int,
+        func,
+        *args,
+        check: bool = True,
+        stats: Optional["RequestStats"] = None,
+    ) -> "futures.Future":
+        """
+        Admit a call of ``func`` on ``size`` characters and queue it on the lane.
+
+        Args:
+            check: Whether the call may be rejected; work of streams that
+                were already admitted is always queued
+            stats: Stats of the request, whose ``queue`` stage is charged
+                with the time the call waits for a thread
+
+        Raises:
+            Overloaded: If ``check`` is set and the call is not admitted
+        """
+        with self._lock:
+            if check:
+                self._check(size)
+            self._admit(size)
+        try:
+            return self.executor.submit(self._call, time.perf_counter(), size, stats, func, *args)
+        except BaseException:
+            self._release(size)
+            raise
+
+    @contextmanager
+    def occupy(self, size: int, check: bool = True) -> Iterator[None]:
+        """
+        Account for work on ``size`` characters that runs outside the lane's threads.
+
+        Raises:
+            Overloaded: If ``check`` is set and the work is not admitted
+        """
+        with self._lock:
+            if check:
+                self._check(size)
+            self._admit(size)
+            self._running += 1
+            self._update_gauges()
+        try:
+            yield
+        finally:
+            self._release(size, started=True)
+
+    def shutdown(self, cancel: bool = True) -> None:
+        """Stop the lane's threads once idle, dropping its queued calls if ``cancel`` is set."""
+        self.executor.shutdown(wait=False, cancel_futures=cancel)
+
+    def _call(self, submitted: float, size: int, stats, func, *args):
+        started = time.perf_counter()
+        if stats is not None:
+            stats.add("queue", started - submitted)
+        with self._lock:
+            self._running += 1
+            self._update_gauges()
+        try:
+            return func(*args)
+        finally:
+            self._release(size, started=True, seconds=time.perf_counter() - started)
+
+    def _check(self, size: int) -> None:
+        policy = self.policy
+        queued = self._admitted - policy.concurrency
+        if queued < 0:
+            return
+        wait = None
+        if self.seconds_per_char is not None:
+            wait = self._admitted_chars * self.seconds_per_char / policy.concurrency
+        if queued >= policy.max_queued:
+            self._reject("queue_full", wait)
+        if wait is not None and policy.budget is not None:
+            if wait + size * self.seconds_per_char > policy.budget:
+                self._reject("budget", wait)
+
+    def _reject(self, reason: str, wait: Optional[float]):
+        SHED_REQUESTS.labels(self.model_id, reason).inc()
+        if wait is None:
+            # Nothing finished yet to measure the rate by
+            wait = self.policy.budget or 1.0
+        raise Overloaded(self.model_id, reason, wait)
+
+    def _admit(self, size: int) -> None:
+        self._admitted += 1
+        self._admitted_chars += size
+        self._update_gauges()
+
+    def _release(self, size: int, started: bool = False, seconds: Optional[float] = None) -> None:
+        with self._lock:
+            self._admitted -= 1
+            self._admitted_chars -= size
+            if started:
+                self._running -= 1
+            if seconds is not None and size >= self.RATE_MIN_CHARS:
+                rate = seconds / size
+                if self.seconds_per_char is None:
+                    self.seconds_per_char = rate
+                else:
+                    self.seconds_per_char += self.RATE_SMOOTHING * (rate - self.seconds_per_char)
+            self._update_gauges()
+
+    def _update_gauges(self) -> None:
+        queued, running = self._admitted - self._running, self._running
+        published_queued, published_running = self._published
+        if queued != published_queued:
+            self._queued_gauge.inc(queued - published_queued)
+        if running != published_running:
+            self._running_gauge.inc(running - published_running)
+        self._published = (queued, running)
+
+
+class AdmissionController:
+    """
+    Lanes of the registered chunkers, each created on its chunker's first use.
+
+    A chunker's lane follows the ``admission_policy`` of the chunker as
+    registered, so variants configured with request parameters share it.
+    When a config reload changes the policy, the next call gets a new lane;
+    calls already admitted to the old one still run there.
+
+    Args:
+        registry: Registry of the chunkers
+    """
+
+    def __init__(self, registry: "ChunkerRegistry"):
+        self._registry = registry
+        self._lanes: Dict[str, Lane] = {}
+        self._lock = threading.Lock()
+        self._default_policy = AdmissionPolicy()
+
+    def lane(self, model_id: str) -> Lane:
+        """Lane of a registered chunker."""
+        lane = self._lanes.get(model_id)
+        chunker = self._registry.get(model_id)
+        if lane is not None and chunker is None:
+            # Removed by a reload while streams of it still run
+            return lane
+        policy = getattr(chunker, "admission_policy", None) or self._default_policy
+        if lane is None or lane.policy != policy:
+            with self._lock:
+                lane = self._lanes.get(model_id)
+                if lane is None or lane.policy != policy:
+                    previous = lane
+                    lane = self._lanes[model_id] = Lane(model_id, policy)
+                    if previous is not None:
+                        # The rate measured so far is a better first estimate than none
+                        lane.seconds_per_char = previous.seconds_per_char
+                        previous.shutdown(cancel=False)
+                    logger.info("Created lane for %s: %s", model_id, policy)
+        return lane
+
+    @contextmanager
+    def occupy(self, sizes: Mapping[str, int]) -> Iterator[None]:
+        """
+        Account for work of several chunkers that runs outside their lanes.
+
+        The work is admitted if every lane would admit its part.
+
+        Args:
+            sizes: Characters of the work by chunker
+
+        Raises:
+            Overloaded: If a lane would not admit its part
+        """
+        lanes = [(self.lane(model_id), size) for model_id, size in sizes.items()]
+        for lane, size in lanes:
+            lane.check(size)
+        with ExitStack() as stack:
+            for lane, size in lanes:
+                stack.enter_context(lane.occupy(size, check=False))
+            yield
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for lane in self._lanes.values():
+                lane.shutdown()
+            self._lanes.clear()
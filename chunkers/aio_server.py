@@ -0,0 +1,316 @@
+"""
+asyncio (grpc.aio) server mode.
+
+Each RPC runs as a coroutine on one event loop instead of holding a pool
+thread, so idle bidi streams waiting for their next message cost no thread.
+Chunking work on large inputs is offloaded to a thread pool so it does not
+stall the loop for other streams.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from concurrent import futures
+
+import grpc
+from grpc_health.v1 import health, health_pb2_grpc
+from grpc_reflection.v1alpha import reflection
+
+from . import chunkers_pb2_grpc
+from .grpc_server import (CACHE_MAX_BYTES, CHUNKER_PARAMS_METADATA_KEY,
+                          HEALTH_REFRESH_INTERVAL, OFFLOAD_CHARS, PORT,
+                          SERVICE_NAMES, ChunkersServicer, RpcCall,
+                          health_status, log_startup, server_options,
+                          start_config_watch, start_warmup)
+from .metrics import TimedThreadPoolExecutor, start_metrics_server
+from .profiling import install_signal_handlers
+from .result_cache import AsyncPreserializedResponseInterceptor
+
+logger = logging.getLogger(__name__)
+
+# Threads for work on large inputs that runs on no chunker's lane, such as
+# result cache lookups, batches and fan-out requests
+EXECUTOR_WORKERS = int(os.environ.get("CHUNKER_AIO_EXECUTOR_WORKERS", 4))
+MAX_CONCURRENT_STREAMS = int(os.environ.get("CHUNKER_AIO_MAX_CONCURRENT_STREAMS", 10000))
+
+
+class AsyncLoggingInterceptor(grpc.aio.ServerInterceptor):
+    """Interceptor to log all gRPC requests, see ``LoggingInterceptor``."""
+
+    async def intercept_service(self, continuation, handler_call_details):
+        logger.debug("gRPC request received: %s", handler_call_details.method)
+        try:
+            return await continuation(handler_call_details)
+        except Exception as e:
+            logger.error("gRPC request failed: %s, error: %s", handler_call_details.method, e)
+            raise
+
+
+async def _poll_requests(request_iterator, deadline):
+    """
+    Iterate over stream requests, yielding None whenever ``deadline()`` passes.
+
+    Requests are read by a separate task so that waiting for a flush deadline
+    never cancels a read in progress.
+    """
+    requests = asyncio.Queue()
+    done = object()
+
+    async def read():
+        try:
+            async for request in request_iterator:
+                await requests.put(request)
+        except Exception as e:
+            await requests.put(e)
+        await requests.put(done)
+
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            due = deadline()
+            timeout = None if due is None else max(due - time.monotonic(), 0)
+            try:
+                item = await asyncio.wait_for(requests.get(), timeout)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        reader.cancel()
+
+
+class AsyncChunkersServicer(ChunkersServicer):
+    """
+    gRPC servicer for chunking operations on the asyncio server.
+
+    Handlers run the steps of their ``ChunkersServicer`` counterparts,
+    awaiting those that may block instead of calling them in place.
+    """
+
+    def __init__(self, executor: futures.Executor):
+        super().__init__()
+        self._executor = executor
+
+    async def ChunkerTokenizationTaskPredict(self, request, context):
+        """Unary chunking request."""
+        async with self._rpc("unary", context, "Chunking", request) as call:
+            chunker = await self._get_chunker(call)
+            cache_key, cached = await self._run(
+                len(request.text), self._cache_lookup, call, chunker, request.text, stats=call.stats
+            )
+            if cached is not None:
+                return cached
+            chunks = await self._run_on_lane(
+                call.stats, call.model_id, len(request.text), self.shards.run, chunker, request.text
+            )
+            return self._unary_response(call, request.text, chunks, cache_key)
+
+    async def BatchChunkerTokenizationTaskPredict(self, request, context):
+        """Unary chunking request for a batch of texts."""
+        async with self._rpc("batch", context, "Batch chunking", request) as call:
+            items = self._batch_items(call, request)
+            await self._get_chunkers(call, [model_id for model_id, _ in items])
+            return await self._run(
+                sum(len(text) for _, text in items),
+                self._batch_response,
+                call,
+                items,
+                stats=call.stats,
+            )
+
+    async def MultiChunkerTokenizationTaskPredict(self, request, context):
+        """Unary request running several chunkers over one text."""
+        async with self._rpc("multi", context, "Multi-chunker chunking", request) as call:
+            model_ids = self._multi_model_ids(call, request)
+            await self._get_chunkers(call, model_ids)
+            return await self._run(
+                len(request.text) * len(model_ids),
+                self._multi_response,
+                call,
+                model_ids,
+                request.text,
+                stats=call.stats,
+            )
+
+    async def BidiStreamingChunkerTokenizationTaskPredict(self, request_iterator, context):
+        """Streaming chunking request with incremental chunking."""
+        async with self._rpc("stream", context, "Stream chunking") as call:
+            chunker = await self._get_chunker(call)
+            session = self._open_stream(call, chunker, context)
+
+            # Yield an initial empty response to establish the bidirectional stream
+            yield self._stream_opened()
+
+            if self._polls(session):
+                request_iterator = _poll_requests(request_iterator, session.deadline)
+            async for request in request_iterator:
+                chunks = await self._run_on_stream_lane(call, *self._stream_step(call, request))
+                for response in self._stream_responses(call, chunks, request):
+                    yield response
+
+            chunks = await self._run_on_stream_lane(call, 0, session.finalize)
+            for response in self._stream_responses(call, chunks):
+                yield response
+            self._log_stream(call, context)
+
+    async def UploadChunkerTokenizationTaskPredict(self, request_iterator, context):
+        """Chunking of one document uploaded in segments, with chunks streamed back as they complete."""
+        async with self._rpc("upload", context, "Upload chunking") as call:
+            chunker = await self._get_chunker(call)
+            session = self._open_upload(call, chunker)
+
+            async for request in request_iterator:
+                chunks = await self._run_on_stream_lane(call, *self._upload_step(call, request))
+                for response in self._stream_responses(call, chunks):
+                    yield response
+
+            chunks = await self._run_on_stream_lane(call, 0, self._finalize_upload, session)
+            for response in self._stream_responses(call, chunks):
+                yield response
+            self._log_stream(call, context)
+
+    @contextlib.asynccontextmanager
+    async def _rpc(self, method, context, name, request=None):
+        """Serve one RPC in the block, see ``ChunkersServicer._rpc``."""
+        call = RpcCall(method, context)
+        if request is not None:
+            call.stats.request_bytes = request.ByteSize()
+        try:
+            yield call
+        except Exception as e:
+            code, details = self._error_status(call, e, name)
+            # Trailing metadata set after an abort is not sent
+            await context.abort(code, details, tuple(call.stats.trailing_metadata))
+        finally:
+            self._finish(call, context)
+
+    async def _run(self, size: int, func, *args, stats=None):
+        """
+        Call ``func`` inline, or on the executor if ``size`` is large.
+
+        Time spent waiting for an executor thread is accounted to the
+        ``queue`` stage of ``stats``.
+        """
+        if size < OFFLOAD_CHARS:
+            return func(*args)
+        submitted = time.perf_counter()
+
+        def call():
+            if stats is not None:
+                stats.add("queue", time.perf_counter() - submitted)
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, call)
+
+    async def _get_chunker(self, call):
+        """
+        Look up the chunker of a single-chunker request, see ``ChunkersServicer._find_chunker``.
+
+        Building a chunker that is not loaded yet, or a variant configured
+        with request parameters, can take long, so it runs on the executor
+        instead of stalling the loop.
+        """
+        if CHUNKER_PARAMS_METADATA_KEY not in call.metadata and self.registry.is_loaded(call.model_id):
+            return self._find_chunker(call)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._find_chunker, call)
+
+    async def _get_chunkers(self, call, model_ids):
+        """
+        Check the chunkers of a request running several, see ``ChunkersServicer._find_chunkers``.
+
+        Chunkers that are not loaded yet are built on the executor.
+        """
+        if all(self.registry.is_loaded(model_id) for model_id in model_ids):
+            return self._find_chunkers(call, model_ids)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._find_chunkers, call, model_ids)
+
+    async def _run_on_lane(self, stats, model_id, size, func, *args, check=True):
+        """Make a timed chunking call for ``model_id``, see ``ChunkersServicer._on_lane``."""
+        if size < OFFLOAD_CHARS:
+            return self._chunk_timed(stats, func, *args)
+        lane = self.lanes.lane(model_id)
+        future = lane.submit(size, self._chunk_timed, stats, func, *args, check=check, stats=stats)
+        return await asyncio.wrap_future(future)
+
+    async def _run_on_stream_lane(self, call, size, func, *args):
+        """Make a timed call of a stream's session, see ``ChunkersServicer._on_stream_lane``."""
+        return await self._run_on_lane(
+            call.stats, call.model_id, call.session.buffered + size, func, *args, check=False
+        )
+
+
+async def _watch_worker_health(health_servicer, worker_health):
+    """Keep the overall health status in line with the other workers."""
+    status = None
+    while True:
+        current = health_status(worker_health)
+        if current != status:
+            await health_servicer.set("", current)
+            status = current
+        await asyncio.sleep(HEALTH_REFRESH_INTERVAL)
+
+
+async def serve_async(reuse_port: bool = False, worker_health=None):
+    """
+    Start the asyncio gRPC server.
+
+    Args:
+        reuse_port: Bind with SO_REUSEPORT so other workers can share the port
+        worker_health: WorkerHealth of this worker when run under a WorkerPool
+    """
+    executor = TimedThreadPoolExecutor(
+        max_workers=EXECUTOR_WORKERS, thread_name_prefix="chunker", executor_name="aio"
+    )
+    interceptors = [AsyncLoggingInterceptor()]
+    if CACHE_MAX_BYTES:
+        interceptors.append(AsyncPreserializedResponseInterceptor())
+
+    server = grpc.aio.server(
+        interceptors=interceptors,
+        options=server_options(
+            max_concurrent_streams=MAX_CONCURRENT_STREAMS, reuse_port=reuse_port
+        ),
+    )
+
+    servicer = AsyncChunkersServicer(executor)
+    chunkers_pb2_grpc.add_ChunkersServiceServicer_to_server(servicer, server)
+
+    health_servicer = health.aio.HealthServicer()
+    health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
+    await health_servicer.set("", health_status(worker_health))
+
+    reflection.enable_server_reflection(SERVICE_NAMES, server)
+
+    server.add_insecure_port(f"[::]:{PORT}")
+
+    log_startup("aio")
+    if worker_health is None:
+        start_metrics_server()
+    install_signal_handlers()
+    await server.start()
+    start_warmup()
+    config_watcher = start_config_watch(servicer)
+    watcher = None
+    if worker_health is not None:
+        worker_health.mark_ready()
+        watcher = asyncio.create_task(
+            _watch_worker_health(health_servicer, worker_health)
+        )
+    try:
+        await server.wait_for_termination()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if config_watcher is not None:
+            config_watcher.stop()
+        executor.shutdown(wait=False)
+        servicer.lanes.shutdown()
@@ -2,13 +2,32 @@
 Base class for all chunkers.
 """
 
+import typing
 from abc import ABC, abstractmethod
-from typing import List, Tuple
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .incremental_chunker import IncrementalChunker
+from .spans import Spans
+
+if TYPE_CHECKING:
+    from .admission import AdmissionPolicy
+    from .prepared_text import PreparedText
+    from .stream_session import FlushPolicy
+
+
+class UnsupportedParameters(ValueError):
+    """Request parameters sent to a chunker that cannot be configured with them."""
 
 
 class BaseChunker(ABC):
     """Abstract base class for text chunkers."""
 
+    # Default flush policy for streams using this chunker
+    flush_policy: Optional["FlushPolicy"] = None
+    # Limits of this chunker's lane on the server, by default those of
+    # ``CHUNKER_LANE_*``
+    admission_policy: Optional["AdmissionPolicy"] = None
+
     @abstractmethod
     def chunk(self, text: str, **kwargs) -> List[Tuple[str, int, int]]:
         """
@@ -23,8 +42,171 @@ class BaseChunker(ABC):
         """
         pass
 
+    def chunk_spans(self, text: str, **kwargs) -> Spans:
+        """
+        Split text into chunks kept as offsets into ``text``.
+
+        Unlike ``chunk``, this copies no chunk text; chunks are sliced from
+        ``text`` when they are read. Chunkers that find their chunks as
+        offsets override this and implement ``chunk`` on top of it.
+
+        Args:
+            text: Input text to chunk
+            **kwargs: Additional chunker-specific parameters
+
+        Returns:
+            Spans of the chunks
+        """
+        return Spans.from_chunks(text, self.chunk(text, **kwargs))
+
+    def chunk_prepared(self, prepared: "PreparedText", **kwargs) -> Spans:
+        """
+        Split a text that other chunkers may process in the same request.
+
+        Chunkers override this to reuse what others already derived from the
+        text, see ``PreparedText``.
+
+        Args:
+            prepared: Input text with shared derived data
+            **kwargs: Additional chunker-specific parameters
+
+        Returns:
+            Spans of the chunks
+        """
+        if prepared.blank:
+            return Spans(prepared.text)
+        return self.chunk_spans(prepared.text, **kwargs)
+
+    def chunk_batch(self, texts: Sequence[str], **kwargs) -> List[Spans]:
+        """
+        Split several texts into chunks.
+
+        Chunkers that can process texts together more cheaply than one at a
+        time override this.
+
+        Args:
+            texts: Input texts to chunk
+            **kwargs: Additional chunker-specific parameters
+
+        Returns:
+            Spans of the chunks of each text
+        """
+        return [self.chunk_spans(text, **kwargs) for text in texts]
+
+    def shard_cuts(self, text: str, shards: int) -> Optional[List[int]]:
+        """
+        Positions at which ``text`` can be cut into independently chunked pieces.
+
+        Chunking each piece and shifting its offsets by the piece's start
+        must give exactly the chunks of the whole text, so a cut may only
+        fall where a chunk always starts. Used to chunk very large texts in
+        parallel, see ``ShardExecutor``.
+
+        Args:
+            text: Input text to cut
+            shards: Number of pieces wanted, of about equal length
+
+        Returns:
+            Increasing cut positions inside the text, at most ``shards - 1``
+            and possibly none, or ``None`` if this chunker cannot be sharded
+        """
+        return None
+
+    def incremental(self, **kwargs) -> IncrementalChunker:
+        """
+        Create a stateful chunker for streamed text.
+
+        Args:
+            **kwargs: Chunker-specific parameters passed on to ``chunk``
+
+        Returns:
+            IncrementalChunker that emits chunks as they complete
+        """
+        return IncrementalChunker(self, **kwargs)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Effective parameters of this chunker, which together with the name identify its output."""
+        return {}
+
+    @property
+    def request_parameters(self) -> Dict[str, Any]:
+        """
+        Parameters a request may set for this chunker, by name.
+
+        Each maps to the type its value must have: ``int``, ``bool``,
+        ``str`` or ``List[str]``. Their current values are in ``params``.
+        """
+        return {}
+
+    def request_overrides(self, params: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Check parameters sent with a request against ``request_parameters``.
+
+        Returns:
+            The parameters whose value differs from this chunker's own
+
+        Raises:
+            ValueError: If a parameter is unknown or its value has the wrong type
+        """
+        schema = self.request_parameters
+        unknown = sorted(set(params) - set(schema))
+        if unknown:
+            raise ValueError(
+                f"{self.name} does not accept parameter(s) {', '.join(unknown)}; "
+                f"accepted: {', '.join(sorted(schema)) or 'none'}"
+            )
+        for name, value in params.items():
+            if not _has_type(value, schema[name]):
+                raise ValueError(f"{name} must be of type {_type_name(schema[name])}, got {value!r}")
+        current = self.params
+        return {name: value for name, value in params.items() if current.get(name) != value}
+
+    def configure(self, **params) -> "BaseChunker":
+        """
+        Create a chunker like this one with some of its parameters replaced.
+
+        Args:
+            **params: Values of ``request_parameters``, checked by ``request_overrides``
+
+        Raises:
+            UnsupportedParameters: If this chunker cannot be configured
+            ValueError: If a value is out of range
+        """
+        raise UnsupportedParameters(f"{self.name} takes no request parameters")
+
     @property
     @abstractmethod
     def name(self) -> str:
         """Return the name/identifier of this chunker."""
         pass
+
+    @classmethod
+    def registered_name(cls, name: Optional[str]) -> Optional[str]:
+        """
+        Name of a chunker of this class created with ``name``, without creating it.
+
+        Lets the registry list a chunker before it is loaded. Chunker
+        classes that do not override this are created when the
+        configuration is read.
+
+        Returns:
+            The name, or None if it is only known once the chunker is created
+        """
+        return None
+
+
+def _has_type(value: Any, expected: Any) -> bool:
+    """Whether a decoded JSON value has one of the ``request_parameters`` types."""
+    if typing.get_origin(expected) is list:
+        (item_type,) = typing.get_args(expected)
+        return isinstance(value, list) and all(_has_type(item, item_type) for item in value)
+    if expected is int and isinstance(value, bool):
+        return False
+    return isinstance(value, expected)
+
+
+def _type_name(expected: Any) -> str:
+    if typing.get_origin(expected) is list:
+        return f"list of {_type_name(typing.get_args(expected)[0])}"
+    return expected.__name__
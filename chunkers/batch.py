@@ -0,0 +1,136 @@
+"""
+Batch chunking with optional fan-out to a process pool.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent import futures
+from itertools import groupby
+from operator import itemgetter
+from typing import List, Optional, Sequence, Tuple
+
+from .spans import Spans
+
+logger = logging.getLogger(__name__)
+
+# (model_id, text)
+BatchItem = Tuple[str, str]
+# (chunks, seconds spent chunking)
+BatchItemResult = Tuple[Spans, float]
+
+
+def chunk_items(items: Sequence[BatchItem]) -> List[BatchItemResult]:
+    """
+    Chunk each item with the chunker registered under its model id.
+
+    Consecutive items for the same chunker are passed to ``chunk_batch``
+    together, and share the time it took in proportion to their length.
+    Runs in the server process for small batches and in pool workers for
+    large ones, which build their own registry on import.
+    """
+    from . import get_chunker_registry
+
+    registry = get_chunker_registry()
+    results = []
+    for model_id, group in groupby(items, key=itemgetter(0)):
+        texts = [text for _, text in group]
+        started = time.perf_counter()
+        chunk_lists = registry.get(model_id).chunk_batch(texts)
+        elapsed = time.perf_counter() - started
+        total = sum(len(text) for text in texts)
+        for text, chunks in zip(texts, chunk_lists):
+            share = len(text) / total if total else 1 / len(texts)
+            results.append((chunks, elapsed * share))
+    return results
+
+
+def _split(items: Sequence[BatchItem], parts: int) -> List[Tuple[int, int]]:
+    """Split items into up to ``parts`` contiguous ranges of similar text size."""
+    total = sum(len(text) for _, text in items)
+    target = total / parts
+    ranges = []
+    start = 0
+    size = 0
+    for index, (_, text) in enumerate(items):
+        size += len(text)
+        if size >= target and len(ranges) < parts - 1:
+            ranges.append((start, index + 1))
+            start = index + 1
+            size = 0
+    if start < len(items):
+        ranges.append((start, len(items)))
+    return ranges
+
+
+class BatchExecutor:
+    """
+    Runs batch chunking inline or split across a process pool.
+
+    Batches whose total text is shorter than ``min_parallel_chars`` are
+    chunked in the calling thread, where the cost of sending texts to other
+    processes would outweigh the gain. Larger batches are split into
+    contiguous parts of similar size, one per worker. The pool is started on
+    first use with the ``spawn`` method, since forking a process that already
+    runs gRPC threads is unsafe.
+
+    Args:
+        workers: Number of pool processes; 0 or 1 always chunks inline
+        min_parallel_chars: Smallest total batch size sent to the pool
+    """
+
+    def __init__(self, workers: int = 0, min_parallel_chars: int = 256 * 1024):
+        self._workers = workers
+        self._min_parallel_chars = min_parallel_chars
+        self._pool: Optional[futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"Starting batch pool with {self._workers} processes")
+                self._pool = futures.ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def run(self, items: Sequence[BatchItem]) -> List[BatchItemResult]:
+        """Chunk all items, returning results in the same order."""
+        if (
+            self._workers <= 1
+            or len(items) < 2
+            or sum(len(text) for _, text in items) < self._min_parallel_chars
+        ):
+            return chunk_items(items)
+
+        pool = self._get_pool()
+        parts = [
+            pool.submit(chunk_items, items[start:end])
+            for start, end in _split(items, self._workers)
+        ]
+        results = []
+        for part in parts:
+            results.extend(part.result())
+        return results
+
+    def restart(self) -> None:
+        """
+        Start a new pool on next use, such as after the chunker config changed.
+
+        The workers build their registry when they start, so only a new pool
+        sees the changed config. Work already submitted to the old pool
+        finishes there.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.info("Restarting batch pool")
+            pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -1,25 +1,150 @@
+import functools
 import importlib
 import logging
+import os
+import re
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
 
 import yaml
 
 from .base_chunker import BaseChunker
+from .incremental_chunker import IncrementalChunker
+from .stream_session import FlushPolicy
 
 logger = logging.getLogger(__name__)
 
+# Config file, absolute or relative to this module's directory
+CONFIG_PATH = os.environ.get("CHUNKER_CONFIG_PATH", "chunker_config.yaml")
+
+
+class _Split(str):
+    """A split that knows where it starts in the text being chunked."""
+
+    start: int
+
+
+class _PositionTracker:
+    """Positions of the splits and chunks produced by one ``split_text`` call."""
+
+    def __init__(self, text: str):
+        self.text = text
+        # End of the last split located; splits arrive in document order
+        self.cursor = 0
+        # Splits measured by a recursive splitter, with their start, that
+        # have not been merged yet
+        self.measured: Deque[tuple[str, int]] = deque()
+        # (chunk, start, end) for every chunk joined from located splits
+        self.spans: List[tuple[str, int, int]] = []
+        self.merging = False
+        self.failed = False
+
+    def locate(self, split: str) -> Optional[int]:
+        """Find the next split at or after the cursor and move past it."""
+        start = self.text.find(split, self.cursor)
+        if start == -1:
+            self.failed = True
+            return None
+        self.cursor = start + len(split)
+        return start
+
+    def position(self, split: str) -> Optional[int]:
+        """Start of a split about to be merged."""
+        while self.measured:
+            measured, start = self.measured.popleft()
+            if measured is split:
+                return start
+            self.emitted(measured, start)
+        return self.locate(split)
+
+    def emitted(self, split: str, start: int) -> None:
+        """Record a measured split that was emitted as a chunk of its own."""
+        self.spans.append((split, start, start + len(split)))
+
+    def finish(self) -> None:
+        """Record the splits emitted as chunks after the last merge."""
+        while self.measured:
+            self.emitted(*self.measured.popleft())
+
 
 class LangChainChunker(BaseChunker):
-    """Wrapper for LangChain text splitters."""
+    """
+    Wrapper for LangChain text splitters.
+
+    Splitters only return chunk texts, so positions are recovered afterwards.
+    Without overlap, chunks are disjoint substrings of the text and each one
+    is found by searching forward from the end of the previous one, a single
+    pass over the text. With overlap a chunk may also match inside its
+    predecessor, or further back in repetitive text, and splitters that drop
+    separators join splits that were apart, so for splitters built on
+    ``TextSplitter._merge_splits`` (the character and recursive splitters and
+    their language variants) the splitter's own split and merge steps are
+    hooked instead: every split is located with a forward-only search as it
+    is produced, and each chunk takes its position from the splits it was
+    joined from. Either way the cost is O(n + c * chunk_overlap) for n
+    characters and c chunks.
+
+    The hooks replace private methods of the splitter, which the pinned
+    ``langchain-text-splitters`` version calls as expected. If a splitter
+    does not have them, or its ``split_text`` returns chunks without going
+    through them, an error is logged and positions are searched for.
+    """
+
+    # Private splitter attributes that ``_track_positions`` replaces
+    HOOKED_ATTRIBUTES = ("_length_function", "_merge_splits", "_join_docs")
 
-    def __init__(self, name: str, class_path: str, **config):
+    def __init__(
+        self,
+        name: str,
+        class_path: str,
+        flush_policy: Optional[FlushPolicy] = None,
+        **config,
+    ):
         self._name = name
+        self.flush_policy = flush_policy
+        self._params = {"class": class_path, **config}
         self._splitter = self._create_splitter(class_path, config)
+        self._overlap = self._overlap_chars()
+        self._local = threading.local()
+        # Whether the splitter's steps are hooked, and whether an error was
+        # logged for hooks that did not fire
+        self._tracked = False
+        self._hooks_missed = False
+        if self._overlap != 0 or not getattr(self._splitter, "_keep_separator", True):
+            self._track_positions()
 
     @property
     def name(self) -> str:
-        return f"langchain_{self._name}"
+        return self.registered_name(self._name)
+
+    @classmethod
+    def registered_name(cls, name: Optional[str]) -> str:
+        return f"langchain_{name}"
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self._params
+
+    @property
+    def request_parameters(self) -> Dict[str, Any]:
+        parameters = {"chunk_size": int, "chunk_overlap": int}
+        if hasattr(self._splitter, "_separator"):
+            parameters["separator"] = str
+        if hasattr(self._splitter, "_separators"):
+            parameters["separators"] = List[str]
+        return parameters
+
+    def configure(self, **params) -> "LangChainChunker":
+        config = {key: value for key, value in self._params.items() if key != "class"}
+        config.update(params)
+        return LangChainChunker(
+            name=self._name,
+            class_path=self._params["class"],
+            flush_policy=self.flush_policy,
+            **config,
+        )
 
     def _create_splitter(self, class_path: str, config: Dict[str, Any]):
         """Create the text splitter instance."""
@@ -28,69 +153,391 @@ class LangChainChunker(BaseChunker):
         splitter_class = getattr(module, class_name)
         return splitter_class(**config)
 
+    def _track_positions(self) -> None:
+        """Hook the splitter's split and merge steps to record chunk positions."""
+        splitter = self._splitter
+        missing = [name for name in self.HOOKED_ATTRIBUTES if not hasattr(splitter, name)]
+        if missing:
+            logger.error(
+                f"{type(splitter).__name__} of {self.name} has no {', '.join(missing)}, "
+                "so chunk positions are searched for and may be wrong in repetitive "
+                "text; check the langchain-text-splitters version"
+            )
+            return
+        merge_splits = splitter._merge_splits
+        join_docs = splitter._join_docs
+        local = self._local
+
+        def active():
+            tracker = getattr(local, "tracker", None)
+            return None if tracker is None or tracker.failed else tracker
+
+        # RecursiveCharacterTextSplitter measures every split before merging
+        # it, emitting it alone or splitting it further if it is too long, so
+        # splits are located when they are measured. Those split further are
+        # dropped below, and those never merged were emitted alone.
+        length_function = splitter._length_function
+
+        def tracked_length_function(value):
+            # Splits being merged are _Split instances, which skips them here
+            if type(value) is str:
+                tracker = active()
+                if tracker is not None and not tracker.merging:
+                    start = tracker.locate(value)
+                    if start is not None:
+                        tracker.measured.append((value, start))
+            return length_function(value)
+
+        split_text = getattr(splitter, "_split_text", None)
+
+        def tracked_split_text(text, separators):
+            tracker = active()
+            if tracker is not None and tracker.measured and tracker.measured[-1][0] is text:
+                # Splitting a long split further: its pieces start at its start
+                _, tracker.cursor = tracker.measured.pop()
+            return split_text(text, separators)
+
+        def tracked_merge_splits(splits, separator):
+            tracker = active()
+            if tracker is None:
+                return merge_splits(splits, separator)
+            located = []
+            for split in splits:
+                start = tracker.position(split)
+                if start is None:
+                    return merge_splits(splits, separator)
+                split = _Split(split)
+                split.start = start
+                located.append(split)
+            tracker.merging = True
+            try:
+                return merge_splits(located, separator)
+            finally:
+                tracker.merging = False
+
+        def tracked_join_docs(docs, separator):
+            doc = join_docs(docs, separator)
+            tracker = active()
+            if doc is None or tracker is None:
+                return doc
+            if not isinstance(docs[0], _Split) or not isinstance(docs[-1], _Split):
+                return doc
+            start = docs[0].start
+            end = docs[-1].start + len(docs[-1])
+            if getattr(splitter, "_strip_whitespace", True):
+                raw = tracker.text[start:end]
+                start += len(raw) - len(raw.lstrip())
+                end -= len(raw) - len(raw.rstrip())
+            tracker.spans.append((doc, start, end))
+            return doc
+
+        splitter._length_function = tracked_length_function
+        if split_text is not None:
+            splitter._split_text = tracked_split_text
+        splitter._merge_splits = tracked_merge_splits
+        splitter._join_docs = tracked_join_docs
+        self._tracked = True
+
+    def incremental(self, **kwargs) -> IncrementalChunker:
+        """Create a stateful chunker for streamed text."""
+        return IncrementalLangChainChunker(self, **kwargs)
+
     def chunk(self, text: str, **kwargs) -> List[tuple[str, int, int]]:
         """Split text into chunks."""
         if not text.strip():
             return []
 
-        chunks = self._splitter.split_text(text)
-        return self._calculate_positions(text, chunks)
+        tracker = _PositionTracker(text)
+        self._local.tracker = tracker
+        try:
+            chunks = self._splitter.split_text(text)
+        finally:
+            self._local.tracker = None
+        tracker.finish()
+        spans = [] if tracker.failed else tracker.spans
+        if self._tracked and chunks and not tracker.failed and not spans:
+            self._report_hooks_missed()
+        return self._calculate_positions(text, chunks, spans)
+
+    def _report_hooks_missed(self) -> None:
+        """Log once that chunks did not come from the hooked splitter steps."""
+        if self._hooks_missed:
+            return
+        self._hooks_missed = True
+        logger.error(
+            f"{type(self._splitter).__name__} of {self.name} returned chunks that its "
+            "hooked split and merge steps did not record, so chunk positions are "
+            "searched for and may be wrong in repetitive text; check the "
+            "langchain-text-splitters version"
+        )
 
     def _calculate_positions(
-        self, text: str, chunks: List[str]
+        self,
+        text: str,
+        chunks: List[str],
+        spans: Sequence[tuple[str, int, int]] = (),
     ) -> List[tuple[str, int, int]]:
-        """Calculate start/end positions for chunks."""
+        """
+        Calculate start/end positions for chunks.
+
+        Chunks joined by the hooked merge step take their recorded span. The
+        rest are searched for from ``max(prev_start + 1, prev_end -
+        chunk_overlap)``, the earliest position a chunk may start at, which is
+        ``prev_end`` without overlap. A chunk that is not a substring of the
+        text, as CharacterTextSplitter produces when it collapses repeated
+        separators, is reported as the text it spans, never at a guessed
+        offset.
+        """
         result = []
-        search_start = 0
+        overlap = self._overlap
+        next_span = 0
+        prev_start = -1
+        prev_end = 0
 
         for chunk in chunks:
+            span = None
+            if next_span < len(spans) and spans[next_span][0] is chunk:
+                span = spans[next_span]
+                next_span += 1
             if not chunk.strip():
                 continue
 
-            start_pos = text.find(chunk, search_start)
-            if start_pos == -1:
-                start_pos = search_start
+            if span is not None:
+                _, start_pos, end_pos = span
+            else:
+                if overlap is None:
+                    lower = prev_start + 1
+                else:
+                    lower = max(prev_start + 1, prev_end - overlap)
+                start_pos = text.find(chunk, lower)
+                if start_pos != -1:
+                    end_pos = start_pos + len(chunk)
+                else:
+                    start_pos, end_pos = self._locate_pieces(text, chunk, lower)
 
-            end_pos = start_pos + len(chunk)
-            result.append((chunk, start_pos, end_pos))
-            search_start = start_pos + 1
+            result.append((text[start_pos:end_pos], start_pos, end_pos))
+            prev_start = start_pos
+            prev_end = end_pos
 
+        if next_span < len(spans):
+            self._report_hooks_missed()
         return result
 
+    def _overlap_chars(self) -> Optional[int]:
+        """Chunk overlap in characters, or None if it is measured otherwise."""
+        overlap = getattr(self._splitter, "_chunk_overlap", None)
+        if overlap == 0:
+            return 0
+        if getattr(self._splitter, "_length_function", len) is not len:
+            return None
+        return overlap
+
+    def _locate_pieces(self, text: str, chunk: str, lower: int) -> tuple[int, int]:
+        """Find the span covering the pieces of ``chunk`` between separators."""
+        pattern = r"\s+"
+        separator = getattr(self._splitter, "_separator", "")
+        if separator.strip() and not getattr(self._splitter, "_is_separator_regex", False):
+            pattern += "|" + re.escape(separator)
+
+        start_pos = end_pos = None
+        cursor = lower
+        for piece in re.split(pattern, chunk):
+            if not piece:
+                continue
+            found = text.find(piece, cursor)
+            if found == -1:
+                raise ValueError(f"Chunk not found in text after position {lower}")
+            if start_pos is None:
+                start_pos = found
+            cursor = end_pos = found + len(piece)
+        if start_pos is None:
+            raise ValueError(f"Chunk not found in text after position {lower}")
+        return start_pos, end_pos
+
+
+class IncrementalLangChainChunker(IncrementalChunker):
+    """
+    Incremental chunker for LangChain splitters.
+
+    A splitter can only return more than one chunk once the buffer is longer
+    than ``chunk_size`` and contains one of its separators, so the buffer is
+    only re-split when both hold. After each emission the buffer shrinks back
+    to roughly one chunk, which keeps the cost per feed bounded by
+    ``chunk_size`` plus the new text.
+    """
+
+    def __init__(self, chunker: LangChainChunker, **kwargs):
+        super().__init__(chunker, **kwargs)
+        splitter = chunker._splitter
+        self._chunk_size = getattr(splitter, "_chunk_size", None)
+        if getattr(splitter, "_length_function", len) is not len:
+            self._chunk_size = None
+
+        separators = getattr(splitter, "_separators", None)
+        if separators is None:
+            separators = [getattr(splitter, "_separator", "")]
+        if getattr(splitter, "_is_separator_regex", False) or "" in separators:
+            self._separators = None
+        else:
+            self._separators = separators
+        self._lookback = max((len(s) for s in self._separators or []), default=1) - 1
+        self._separator_seen = self._separators is None
+        self._tail = ""
+
+    def _complete_chunks(self, text: str) -> List[tuple[str, int, int]]:
+        if not self._separator_seen:
+            window = self._tail + text
+            self._separator_seen = any(s in window for s in self._separators)
+            self._tail = window[len(window) - self._lookback :] if self._lookback else ""
+        if not self._separator_seen:
+            return []
+        if self._chunk_size is not None and self._length <= self._chunk_size:
+            return []
+        return super()._complete_chunks(text)
+
+    def _consume(self, end: int) -> None:
+        super()._consume(end)
+        if self._separators is not None:
+            buffer = self._buffer()
+            self._separator_seen = any(s in buffer for s in self._separators)
+            self._tail = buffer[len(buffer) - self._lookback :] if self._lookback else ""
+
 
 class ChunkerFactory:
-    """Factory for creating LangChain chunkers."""
+    """Factory for creating chunkers from the config file."""
+
+    @classmethod
+    def create(cls, name: str, chunker_config: Dict[str, Any]) -> BaseChunker:
+        """
+        Create one chunker from its entry in the config file.
+
+        ``class`` names either a ``BaseChunker`` subclass, which is created
+        with the ``defaults`` as keyword arguments, or a LangChain splitter,
+        which is wrapped in a ``LangChainChunker``.
+        """
+        class_path = chunker_config["class"]
+        flush_policy = FlushPolicy.from_config(chunker_config.get("flush"))
+        admission_policy = None
+        if chunker_config.get("admission"):
+            # Only the server reads admission policies, so its metrics are
+            # not imported otherwise
+            from .admission import AdmissionPolicy
+
+            admission_policy = AdmissionPolicy.from_config(chunker_config["admission"])
+        defaults = chunker_config.get("defaults", {})
+
+        module_path, class_name = class_path.rsplit(".", 1)
+        chunker_class = getattr(importlib.import_module(module_path), class_name)
+        if isinstance(chunker_class, type) and issubclass(chunker_class, BaseChunker):
+            chunker = chunker_class(name=name, flush_policy=flush_policy, **defaults)
+        else:
+            chunker = LangChainChunker(
+                name=name, class_path=class_path, flush_policy=flush_policy, **defaults
+            )
+        if admission_policy is not None:
+            chunker.admission_policy = admission_policy
+        return chunker
+
+    @classmethod
+    def registered_name(cls, name: str, chunker_config: Dict[str, Any]) -> Optional[str]:
+        """
+        Name under which the chunker of a config entry registers, without creating it.
+
+        Modules whose top-level package starts with ``langchain`` are not
+        imported, as they load slowly, and their classes are taken to be
+        splitters for a ``LangChainChunker``. Other classes are imported
+        and asked for the name.
+
+        Returns:
+            The name, or None if the class only knows it once created
+        """
+        module_path, class_name = chunker_config["class"].rsplit(".", 1)
+        if module_path.startswith("langchain"):
+            return LangChainChunker.registered_name(name)
+        chunker_class = getattr(importlib.import_module(module_path), class_name)
+        if isinstance(chunker_class, type) and issubclass(chunker_class, BaseChunker):
+            return chunker_class.registered_name(name)
+        return LangChainChunker.registered_name(name)
 
     @classmethod
-    def create_from_config(
-        cls, config_path: str = "chunker_config.yaml"
-    ) -> List[BaseChunker]:
+    def loaders_from_config(
+        cls, config_path: str = CONFIG_PATH, strict: bool = False
+    ) -> List[Tuple[str, Callable[[], BaseChunker], Dict[str, Any]]]:
+        """
+        Read the YAML config file without creating any chunker.
+
+        Args:
+            config_path: Config file, see ``CONFIG_PATH``
+            strict: Raise if the file cannot be read or an entry is
+                invalid, instead of skipping what cannot be read
+
+        Returns:
+            (name, loader, entry) triples, one per config entry, where
+            calling the loader creates the chunker registered under the name
+            from the entry. Entries that cannot be named in advance are
+            created here and returned with a loader that returns them.
+        """
+        loaders = []
+        for name, chunker_config in cls._read_config(config_path, strict).items():
+            try:
+                registered_name = cls.registered_name(name, chunker_config)
+                if registered_name is not None:
+                    loader = functools.partial(cls.create, name, chunker_config)
+                else:
+                    chunker = cls.create(name, chunker_config)
+                    registered_name = chunker.name
+                    loader = functools.partial(lambda built: built, chunker)
+                loaders.append((registered_name, loader, chunker_config))
+            except Exception as e:
+                if strict:
+                    raise ValueError(f"Invalid config entry {name}: {e}") from e
+                logger.warning(f"Skipping {name}: {e}")
+        return loaders
+
+    @classmethod
+    def create_from_config(cls, config_path: str = CONFIG_PATH) -> List[BaseChunker]:
         """Create chunkers from YAML config file."""
         chunkers = []
-        config_path = Path(__file__).parent / config_path
+        for name, chunker_config in cls._read_config(config_path).items():
+            try:
+                chunker = cls.create(name, chunker_config)
+                chunkers.append(chunker)
+                logger.info(f"Created chunker: {chunker.name}")
+
+            except Exception as e:
+                logger.warning(f"Skipping {name}: {e}")
+
+        return chunkers
+
+    @staticmethod
+    def config_file(config_path: str = CONFIG_PATH) -> Path:
+        """Path of a config file given absolute or relative to this module's directory."""
+        return Path(__file__).parent / config_path
+
+    @classmethod
+    def _read_config(cls, config_path: str, strict: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Entries of a config file, or none if it cannot be read.
+
+        Raises:
+            OSError, ValueError, yaml.YAMLError: If ``strict`` is set and the
+                file cannot be read or holds no mapping of entries
+        """
+        config_path = cls.config_file(config_path)
 
-        if not config_path.exists():
+        if not strict and not config_path.exists():
             logger.warning(f"Config file not found: {config_path}")
-            return chunkers
+            return {}
 
         try:
             with open(config_path) as f:
-                config = yaml.safe_load(f)
-
-            for name, chunker_config in config.items():
-                try:
-                    chunker = LangChainChunker(
-                        name=name,
-                        class_path=chunker_config["class"],
-                        **chunker_config.get("defaults", {}),
-                    )
-                    chunkers.append(chunker)
-                    logger.info(f"Created chunker: {chunker.name}")
-
-                except Exception as e:
-                    logger.warning(f"Skipping {name}: {e}")
+                config = yaml.safe_load(f) or {}
+            if not isinstance(config, dict):
+                raise ValueError(f"{config_path} does not map names to chunker entries")
+            return config
 
         except Exception as e:
+            if strict:
+                raise
             logger.error(f"Failed to load config: {e}")
-
-        return chunkers
+            return {}
@@ -1,22 +1,255 @@
-from typing import Dict, List, Optional
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
 
 from .base_chunker import BaseChunker
 
+logger = logging.getLogger(__name__)
+
 
 class ChunkerRegistry:
-    """Registry for managing and accessing chunkers."""
+    """
+    Registry for managing and accessing chunkers.
+
+    Chunkers are registered either built, or lazily as a loader that builds
+    them when their name is first looked up or when they are warmed up.
+    Each is built once, with only the lookups of its name waiting for it,
+    and a chunker whose loader fails is dropped from the registry.
+
+    The lazily registered chunkers can be replaced while requests are
+    served, see ``reload``. The registry's tables are never changed in
+    place but replaced by updated copies, so lookups take no lock.
 
-    def __init__(self):
-        self._chunkers: Dict[str, BaseChunker] = {}
+    Variants of a chunker configured with request parameters are kept in a
+    least recently used cache of ``max_configured`` entries, keyed by the
+    chunker name and the parameters that differ from its own. Each entry
+    records the chunker it was configured from, so a variant of a chunker
+    that a reload replaced is never returned for its successor.
+
+    Args:
+        max_configured: Number of configured variants kept; 0 builds a new
+            one for every lookup with parameters
+    """
+
+    def __init__(self, max_configured: int = 64):
+        # None for chunkers registered lazily that are not built yet
+        self._chunkers: Dict[str, Optional[BaseChunker]] = {}
+        self._loaders: Dict[str, Callable[[], BaseChunker]] = {}
+        # What each lazily registered chunker is built from, such as its
+        # config entry, to tell which ones a reload changes
+        self._sources: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # Held while the chunker of each name is built by its loader
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._reload_lock = threading.Lock()
+        # Seconds each lazily registered chunker took to build
+        self.load_seconds: Dict[str, float] = {}
+        self._max_configured = max_configured
+        # (name, overrides) -> (chunker configured from, variant)
+        self._configured: "OrderedDict[Tuple[str, str], Tuple[BaseChunker, BaseChunker]]" = (
+            OrderedDict()
+        )
+        self._configured_lock = threading.Lock()
 
     def register(self, chunker: BaseChunker) -> None:
         """Register a chunker."""
-        self._chunkers[chunker.name] = chunker
+        with self._lock:
+            self._chunkers = {**self._chunkers, chunker.name: chunker}
+            self._loaders = {key: value for key, value in self._loaders.items() if key != chunker.name}
+            self._sources.pop(chunker.name, None)
+
+    def register_lazy(
+        self, name: str, loader: Callable[[], BaseChunker], source: Any = None
+    ) -> None:
+        """
+        Register a chunker under ``name``, to be built by ``loader`` on first use.
 
-    def get(self, name: str) -> Optional[BaseChunker]:
-        """Get a chunker by name. Returns None if not found."""
-        return self._chunkers.get(name)
+        Args:
+            source: What the loader builds the chunker from, compared by
+                ``reload`` to tell whether the chunker changed
+        """
+        with self._lock:
+            if self._chunkers.get(name) is None:
+                self._chunkers = {**self._chunkers, name: None}
+                self._loaders = {**self._loaders, name: loader}
+                self._sources[name] = source
+
+    def get(self, name: str, params: Optional[Mapping[str, Any]] = None) -> Optional[BaseChunker]:
+        """
+        Get a chunker by name, building it if needed. Returns None if not found.
+
+        Args:
+            name: Registered name of the chunker
+            params: Request parameters, see ``BaseChunker.request_parameters``;
+                a variant of the chunker configured with them is returned
+
+        Raises:
+            ValueError: If ``params`` are not valid for the chunker
+        """
+        chunker = self._chunkers.get(name)
+        if chunker is None and name in self._loaders:
+            chunker = self._load(name)
+        if chunker is None or not params:
+            return chunker
+        overrides = chunker.request_overrides(params)
+        if not overrides:
+            return chunker
+        return self._configure(name, chunker, overrides)
+
+    def is_loaded(self, name: str) -> bool:
+        """Whether the chunker registered under ``name`` is built."""
+        return self._chunkers.get(name) is not None
+
+    def warmup(self, names: Optional[Iterable[str]] = None) -> None:
+        """Build the named chunkers, by default all of them, ahead of their first use."""
+        for name in list(self._loaders) if names is None else names:
+            self.get(name)
 
     def list_names(self) -> List[str]:
         """List all registered chunker names."""
         return list(self._chunkers.keys())
+
+    def reload(
+        self, loaders: Iterable[Tuple[str, Callable[[], BaseChunker], Any]]
+    ) -> Dict[str, List[str]]:
+        """
+        Replace the lazily registered chunkers, such as after the config file changed.
+
+        Chunkers whose source is unchanged are kept as they are. New and
+        changed ones are built here, before the first of them is swapped in,
+        so no request waits for them; a changed chunker that fails to build
+        keeps its previous version. Chunkers no longer listed are removed,
+        while those registered with ``register`` are never touched. Requests
+        that already hold a chunker, such as running streams, finish with it.
+
+        Args:
+            loaders: (name, loader, source) of each chunker, see ``register_lazy``
+
+        Returns:
+            Names of the chunkers that were ``added``, ``changed`` or
+            ``removed``, or that ``failed`` to build
+        """
+        with self._reload_lock:
+            sources = dict(self._sources)
+            listed: Set[str] = set()
+            built: Dict[str, Tuple[BaseChunker, Any, float]] = {}
+            failed = []
+            for name, loader, source in loaders:
+                listed.add(name)
+                if name in sources and sources[name] == source:
+                    continue
+                if name not in sources and name in self._chunkers:
+                    logger.warning(f"Not reloading {name}, which is registered directly")
+                    continue
+                started = time.perf_counter()
+                try:
+                    chunker = loader()
+                except Exception as e:
+                    logger.warning(f"Keeping the previous version of {name}: {e}")
+                    failed.append(name)
+                    continue
+                built[name] = (chunker, source, time.perf_counter() - started)
+
+            with self._lock:
+                chunkers = dict(self._chunkers)
+                loaders_by_name = dict(self._loaders)
+                removed = [name for name in self._sources if name not in listed]
+                for name in removed:
+                    chunkers.pop(name, None)
+                    loaders_by_name.pop(name, None)
+                    del self._sources[name]
+                for name, (chunker, source, seconds) in built.items():
+                    chunkers[name] = chunker
+                    loaders_by_name.pop(name, None)
+                    self._sources[name] = source
+                    self.load_seconds[name] = seconds
+                self._chunkers = chunkers
+                self._loaders = loaders_by_name
+
+        replaced = set(removed) | set(built)
+        with self._configured_lock:
+            for key in [key for key in self._configured if key[0] in replaced]:
+                del self._configured[key]
+        return {
+            "added": sorted(name for name in built if name not in sources),
+            "changed": sorted(name for name in built if name in sources),
+            "removed": sorted(removed),
+            "failed": sorted(failed),
+        }
+
+    def _configure(self, name: str, chunker: BaseChunker, overrides: Dict[str, Any]) -> BaseChunker:
+        """
+        Variant of ``chunker`` with ``overrides``, from the cache if it was built before.
+
+        Variants are built outside the lock, so a slow one does not hold up
+        lookups of others; if two requests build the same variant, the
+        first one cached is kept.
+        """
+        key = (name, json.dumps(overrides, sort_keys=True))
+        with self._configured_lock:
+            entry = self._configured.get(key)
+            if entry is not None and entry[0] is chunker:
+                self._configured.move_to_end(key)
+                return entry[1]
+
+        configured = chunker.configure(**overrides)
+        if self._max_configured <= 0:
+            return configured
+        with self._configured_lock:
+            entry = self._configured.get(key)
+            if entry is not None and entry[0] is chunker:
+                self._configured.move_to_end(key)
+                return entry[1]
+            # A chunker replaced by a reload while this variant was built
+            # is not cached, as no later lookup starts from it
+            if self._chunkers.get(name) is chunker:
+                self._configured[key] = (chunker, configured)
+                if len(self._configured) > self._max_configured:
+                    self._configured.popitem(last=False)
+        return configured
+
+    def _load(self, name: str) -> Optional[BaseChunker]:
+        """
+        Build a lazily registered chunker, unless another thread did already.
+
+        Only lookups of the same name wait for the build; the registry lock
+        is taken just to swap the built chunker in.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            chunker = self._chunkers.get(name)
+            loader = self._loaders.get(name)
+            if chunker is not None or loader is None:
+                return chunker
+
+            started = time.perf_counter()
+            error = None
+            try:
+                chunker = loader()
+            except Exception as e:
+                chunker, error = None, e
+            seconds = time.perf_counter() - started
+
+            with self._lock:
+                self._load_locks.pop(name, None)
+                # A reload or ``register`` that replaced the loader meanwhile wins
+                if self._loaders.get(name) is not loader:
+                    return self._chunkers.get(name)
+                loaders = {key: value for key, value in self._loaders.items() if key != name}
+                if error is not None:
+                    logger.warning(f"Skipping {name}: {error}")
+                    self._chunkers = {key: value for key, value in self._chunkers.items() if key != name}
+                    self._loaders = loaders
+                    self._sources.pop(name, None)
+                    return None
+                self.load_seconds[name] = seconds
+                self._chunkers = {**self._chunkers, name: chunker}
+                self._loaders = loaders
+            if chunker.name != name:
+                logger.warning(f"Chunker {chunker.name} was registered as {name}")
+            logger.info(f"Loaded chunker {name} in {seconds * 1000:.1f} ms")
+            return chunker
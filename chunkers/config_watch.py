@@ -0,0 +1,77 @@
+"""
+Reloading of the chunker configuration when its file changes.
+
+The file is polled rather than watched with inotify, which misses the
+symlink swap by which Kubernetes updates a mounted ConfigMap. A change is
+only acted on once the file has looked the same for two polls in a row, so
+a file still being written is not read half way.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the config file for changes; 0 disables reloading
+CONFIG_RELOAD_INTERVAL = float(os.environ.get("CHUNKER_CONFIG_RELOAD_INTERVAL", 5))
+
+
+class ConfigWatcher:
+    """
+    Calls ``on_change`` from a background thread whenever ``path`` changes.
+
+    A file is taken to have changed when its modification time, size or
+    inode differ, the latter as editors and ConfigMap updates replace files
+    rather than write them in place. Errors raised by ``on_change`` are
+    logged and do not stop the watcher.
+
+    Args:
+        path: File to watch
+        on_change: Called without arguments after each settled change
+        interval: Seconds between checks of the file
+    """
+
+    def __init__(self, path: Path, on_change: Callable[[], None], interval: float = CONFIG_RELOAD_INTERVAL):
+        self.path = path
+        self._on_change = on_change
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="config-watch", daemon=True)
+        self._thread.start()
+        logger.info("Watching %s for changes every %s s", self.path, self._interval)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _run(self) -> None:
+        current = self._signature()
+        pending = current
+        while not self._stopped.wait(self._interval):
+            signature = self._signature()
+            if signature != pending:
+                # Wait for the file to settle
+                pending = signature
+                continue
+            if signature == current:
+                continue
+            current = signature
+            if signature is None:
+                logger.warning("Config file %s disappeared, keeping the current config", self.path)
+                continue
+            try:
+                self._on_change()
+            except Exception:
+                logger.exception("Handling the change of %s failed", self.path)
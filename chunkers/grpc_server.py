@@ -1,321 +1,908 @@
+import argparse
+import asyncio
+import contextlib
+import json
 import logging
-from concurrent import futures
+import math
+import os
+import queue
+import threading
+import time
 
 import grpc
 from grpc_health.v1 import health, health_pb2, health_pb2_grpc
 from grpc_reflection.v1alpha import reflection
 
-from . import (caikit_data_model_nlp_pb2, chunkers_pb2_grpc,
-               get_chunker_registry)
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+from . import (IMPORT_STARTED, caikit_data_model_nlp_pb2, chunkers_pb2,
+               chunkers_pb2_grpc, get_chunker_registry, reload_chunker_config)
+from .admission import RETRY_PUSHBACK_KEY, AdmissionController, Overloaded
+from .batch import BatchExecutor
+from .chunker_factory import CONFIG_PATH, ChunkerFactory
+from .config_watch import CONFIG_RELOAD_INTERVAL, ConfigWatcher
+from .metrics import (ACTIVE_STREAMS, CACHE_LOOKUPS, LOG_RECORDS_DROPPED,
+                      MIXED_MODELS, METRICS_PORT, MULTIPROC_DIR, STREAM_MESSAGES,
+                      STREAM_PEAK_BUFFERED, RequestStats,
+                      TimedThreadPoolExecutor, clear_multiprocess_dir,
+                      start_metrics_server)
+from .offset_index import OFFSET_UNITS, OffsetIndex
+from .prepared_text import PreparedText
+from .profiling import SESSION_MEMORY, install_signal_handlers
+from .result_cache import PreserializedResponseInterceptor, ResultCache
+from .server_logging import (configure_logging, log_event, next_request_id,
+                             sample_trace, trace_logger)
+from .sharding import ShardExecutor
+from .spans import Spans
+from .stream_session import FlushPolicy, StreamSession, UploadSession
+
+configure_logging(on_drop=LOG_RECORDS_DROPPED.inc)
 logger = logging.getLogger(__name__)
 
+# Characters a stream may buffer without reaching a chunk boundary before the
+# buffer is flushed as chunks; 0 disables the limit
+STREAM_MAX_BUFFERED = int(os.environ.get("CHUNKER_STREAM_MAX_BUFFERED", 1024 * 1024))
 
-class LoggingInterceptor(grpc.ServerInterceptor):
-    """Interceptor to log all gRPC requests."""
+# Chunking calls on at least this many characters run on their chunker's
+# lane, see ``AdmissionController``; smaller ones run in the request's thread
+OFFLOAD_CHARS = int(
+    os.environ.get("CHUNKER_OFFLOAD_CHARS", os.environ.get("CHUNKER_AIO_OFFLOAD_CHARS", 16 * 1024))
+)
 
-    def intercept_service(self, continuation, handler_call_details):
-        method = handler_call_details.method
-        logger.info(f"gRPC request received: {method}")
+# Size limit of the unary result cache in bytes; 0 disables the cache
+CACHE_MAX_BYTES = int(os.environ.get("CHUNKER_CACHE_MAX_BYTES", 0))
+# Seconds before a cached result expires; 0 keeps results until evicted
+CACHE_TTL_SECONDS = float(os.environ.get("CHUNKER_CACHE_TTL_SECONDS", 0))
+# Texts shorter than this are never cached
+CACHE_MIN_CHARS = int(os.environ.get("CHUNKER_CACHE_MIN_CHARS", 256))
+
+# Processes used to chunk large batches; 0 chunks every batch in the request thread
+BATCH_WORKERS = int(os.environ.get("CHUNKER_BATCH_WORKERS", 0))
+# Batches with less text than this are always chunked in the request thread
+BATCH_MIN_PARALLEL_CHARS = int(
+    os.environ.get("CHUNKER_BATCH_MIN_PARALLEL_CHARS", 256 * 1024)
+)
 
+# Processes used to chunk very large texts in shards; 0 chunks every text in
+# the request thread
+SHARD_WORKERS = int(os.environ.get("CHUNKER_SHARD_WORKERS", 0))
+# Texts shorter than this are never sharded
+SHARD_MIN_CHARS = int(os.environ.get("CHUNKER_SHARD_MIN_CHARS", 1024 * 1024))
+
+# Comma-separated chunkers built once the server is up, or before the workers
+# are forked; "*" builds all of them, and the others are built on first use
+WARMUP = os.environ.get("CHUNKER_WARMUP", "*")
+
+# Request metadata asking for chunk offsets without chunk text
+OFFSETS_ONLY_METADATA_KEY = "mm-offsets-only"
+# Stream request metadata asking for the chunks completed by one message to
+# be sent in a single response
+COALESCE_METADATA_KEY = "mm-coalesce-chunks"
+# Request metadata with a JSON object of parameters for the requested
+# chunker, see ``BaseChunker.request_parameters``
+CHUNKER_PARAMS_METADATA_KEY = "mm-chunker-params"
+# Error for chunker parameters sent with a request that may run several chunkers
+CHUNKER_PARAMS_UNSUPPORTED = f"{CHUNKER_PARAMS_METADATA_KEY} is only accepted by single-chunker requests"
+# Request metadata with the unit of the returned positions, see ``OFFSET_UNITS``
+OFFSET_UNIT_METADATA_KEY = "mm-offset-unit"
+
+
+def metadata_flag(metadata, key: str) -> bool:
+    """Whether a boolean request metadata entry is set."""
+    return metadata.get(key, "").lower() in ("1", "true")
+
+
+def chunker_params(metadata):
+    """
+    Chunker parameters sent with a request, or None if it sends none.
+
+    Raises:
+        ValueError: If the metadata entry is not a JSON object
+    """
+    value = metadata.get(CHUNKER_PARAMS_METADATA_KEY)
+    if not value:
+        return None
+    try:
+        params = json.loads(value)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{CHUNKER_PARAMS_METADATA_KEY} is not valid JSON: {e}")
+    if not isinstance(params, dict):
+        raise ValueError(f"{CHUNKER_PARAMS_METADATA_KEY} must be a JSON object")
+    return params
+
+
+def offset_unit(metadata):
+    """
+    Unit of the positions a request asks for, or None for code points.
+
+    Raises:
+        ValueError: If the unit is unknown
+    """
+    unit = metadata.get(OFFSET_UNIT_METADATA_KEY, "").lower() or "codepoint"
+    if unit not in OFFSET_UNITS:
+        raise ValueError(
+            f"{OFFSET_UNIT_METADATA_KEY} must be one of {', '.join(OFFSET_UNITS)}, got {unit!r}"
+        )
+    return None if OFFSET_UNITS[unit] is None else unit
+
+
+def _poll_requests(request_iterator, deadline):
+    """
+    Iterate over stream requests, yielding None whenever ``deadline()`` passes.
+
+    Requests are read on a separate thread so the caller can act on a flush
+    deadline while the client is idle.
+    """
+    requests = queue.Queue()
+    done = object()
+
+    def read():
         try:
-            response = continuation(handler_call_details)
-            logger.info(f"gRPC request completed: {method}")
-            return response
+            for request in request_iterator:
+                requests.put(request)
         except Exception as e:
-            logger.error(f"gRPC request failed: {method}, error: {e}")
-            raise
+            requests.put(e)
+        requests.put(done)
 
+    threading.Thread(target=read, daemon=True).start()
+    while True:
+        due = deadline()
+        timeout = None if due is None else max(due - time.monotonic(), 0)
+        try:
+            item = requests.get(timeout=timeout)
+        except queue.Empty:
+            yield None
+            continue
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
 
-class ChunkersServicer(chunkers_pb2_grpc.ChunkersServiceServicer):
-    """gRPC servicer for chunking operations."""
 
-    def __init__(self):
-        self.registry = get_chunker_registry()
-        logger.info(f"Initialized chunker registry with: {self.registry.list_names()}")
+class LoggingInterceptor(grpc.ServerInterceptor):
+    """
+    Interceptor to log all gRPC requests.
 
-    def ChunkerTokenizationTaskPredict(self, request, context):
-        """Unary chunking request."""
+    Chunking RPCs log a summary when they finish, so requests are only
+    logged here at DEBUG level.
+    """
+
+    def intercept_service(self, continuation, handler_call_details):
+        logger.debug("gRPC request received: %s", handler_call_details.method)
         try:
-            metadata = dict(context.invocation_metadata())
-            model_id = metadata.get("mm-model-id", "sentence")
+            return continuation(handler_call_details)
+        except Exception as e:
+            logger.error("gRPC request failed: %s, error: %s", handler_call_details.method, e)
+            raise
 
-            logger.info(
-                f"Received chunking request: model_id={model_id}, text_length={len(request.text)}"
-            )
 
-            chunker = self.registry.get(model_id)
-            if not chunker:
-                logger.error(
-                    f"Unknown chunker: {model_id}. Available: {self.registry.list_names()}"
-                )
-                context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown chunker: {model_id}")
+class RequestError(Exception):
+    """
+    Error ending an RPC with a status other than INTERNAL.
 
-            chunks = chunker.chunk(request.text)
+    Raised by the request helpers of ``ChunkersServicer``; both servers
+    abort the RPC with ``code`` and the error's message.
+    """
 
-            results = [
-                caikit_data_model_nlp_pb2.Token(start=start, end=end, text=text)
-                for text, start, end in chunks
-            ]
+    def __init__(self, code: grpc.StatusCode, details: str):
+        super().__init__(details)
+        self.code = code
 
-            logger.info(
-                f"Chunking complete: model_id={model_id}, chunks={len(results)}"
-            )
-            logger.debug(
-                f"Chunk details: {[(r.start, r.end, r.text[:50]) for r in results]}"
-            )
 
-            response = caikit_data_model_nlp_pb2.TokenizationResults(
-                results=results, token_count=len(results)
-            )
+@contextlib.contextmanager
+def invalid_argument():
+    """Report a ValueError raised in the block as an INVALID_ARGUMENT ``RequestError``."""
+    try:
+        yield
+    except ValueError as e:
+        raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, str(e)) from e
 
-            logger.info(f"Sending response: token_count={response.token_count}")
-            return response
 
-        except Exception as e:
-            logger.error(f"Chunking failed: {e}", exc_info=True)
-            context.abort(grpc.StatusCode.INTERNAL, str(e))
+class RpcCall:
+    """
+    One chunking RPC, as handled by either server.
 
-    def BidiStreamingChunkerTokenizationTaskPredict(self, request_iterator, context):
-        """Streaming chunking request with text accumulation."""
-        logger.info("="*80)
-        logger.info("STREAMING METHOD CALLED")
-        logger.info("="*80)
+    Holds the request's metadata and what its handler learns while serving
+    it, so that the handlers of the thread-pool and asyncio servicers share
+    the helpers of ``ChunkersServicer`` and differ only in how they wait.
 
-        try:
-            metadata = dict(context.invocation_metadata())
-            model_id = metadata.get("mm-model-id", "sentence")
+    Args:
+        method: Short name of the RPC, see ``RequestStats``
+        context: The RPC's servicer context
+    """
 
-            logger.info(f"[STREAM-INIT] model_id={model_id}")
-            logger.info(f"[STREAM-INIT] metadata={metadata}")
-            logger.info(f"[STREAM-INIT] context.peer()={context.peer()}")
+    def __init__(self, method: str, context):
+        self.metadata = dict(context.invocation_metadata())
+        self.stats = RequestStats(method, self.metadata)
+        self.model_id = self.metadata.get("mm-model-id", "sentence")
+        self.offsets_only = metadata_flag(self.metadata, OFFSETS_ONLY_METADATA_KEY)
+        self.coalesce = metadata_flag(self.metadata, COALESCE_METADATA_KEY)
+        # Unit of the returned positions, None for code points
+        self.unit = None
+        # StreamSession or UploadSession of a streaming RPC
+        self.session = None
+        # Request id of a traced stream, see ``_trace_stream_start``
+        self.trace = None
 
-            chunker = self.registry.get(model_id)
-            if not chunker:
-                logger.error(
-                    f"Unknown chunker: {model_id}. Available: {self.registry.list_names()}"
-                )
-                context.abort(grpc.StatusCode.NOT_FOUND, f"Unknown chunker: {model_id}")
 
-            logger.info(f"[STREAM-INIT] Chunker loaded: {chunker.name}")
+class ChunkersServicer(chunkers_pb2_grpc.ChunkersServiceServicer):
+    """
+    gRPC servicer for chunking operations.
 
-            # Accumulate text and track input indices
-            accumulated_text = ""
-            processed_offset = 0
-            input_index_tracker = []
-            chunk_count = 0
-            yielded_chunks = set()  # Track (start, end) to avoid duplicates
-            text_tracker = []  # Track text chunks for whitespace-only case
-            start_processing_counter = -1
-            end_processing_counter = -1
-            first_event = True
+    Each handler is a short sequence of shared helpers taking the RPC's
+    ``RpcCall``; ``AsyncChunkersServicer`` runs the same sequence, awaiting
+    the steps that may block.
+    """
 
-            request_count = 0
+    def __init__(self):
+        self.registry = get_chunker_registry()
+        self.batch = BatchExecutor(BATCH_WORKERS, BATCH_MIN_PARALLEL_CHARS)
+        self.shards = ShardExecutor(SHARD_WORKERS, SHARD_MIN_CHARS)
+        self.lanes = AdmissionController(self.registry)
+        self.cache = None
+        if CACHE_MAX_BYTES:
+            self.cache = ResultCache(
+                CACHE_MAX_BYTES, ttl=CACHE_TTL_SECONDS or None, min_chars=CACHE_MIN_CHARS
+            )
+        logger.info("Initialized chunker registry with: %s", self.registry.list_names())
+
+    def ChunkerTokenizationTaskPredict(self, request, context):
+        """Unary chunking request."""
+        with self._rpc("unary", context, "Chunking", request) as call:
+            chunker = self._find_chunker(call)
+            cache_key, cached = self._cache_lookup(call, chunker, request.text)
+            if cached is not None:
+                return cached
+            chunks = self._on_lane(
+                call.stats, call.model_id, len(request.text), self.shards.run, chunker, request.text
+            )
+            return self._unary_response(call, request.text, chunks, cache_key)
+
+    def BatchChunkerTokenizationTaskPredict(self, request, context):
+        """Unary chunking request for a batch of texts."""
+        with self._rpc("batch", context, "Batch chunking", request) as call:
+            items = self._batch_items(call, request)
+            self._find_chunkers(call, [model_id for model_id, _ in items])
+            return self._batch_response(call, items)
+
+    def MultiChunkerTokenizationTaskPredict(self, request, context):
+        """Unary request running several chunkers over one text."""
+        with self._rpc("multi", context, "Multi-chunker chunking", request) as call:
+            model_ids = self._multi_model_ids(call, request)
+            self._find_chunkers(call, model_ids)
+            return self._multi_response(call, model_ids, request.text)
 
-            logger.info("[STREAM-ITER] Entering iteration loop to consume stream...")
-            logger.info(f"[STREAM-ITER] Iterator type: {type(request_iterator)}")
+    def BidiStreamingChunkerTokenizationTaskPredict(self, request_iterator, context):
+        """Streaming chunking request with incremental chunking."""
+        with self._rpc("stream", context, "Stream chunking") as call:
+            chunker = self._find_chunker(call)
+            session = self._open_stream(call, chunker, context)
 
             # EXPERIMENTAL: Yield an initial empty response to establish the bidirectional stream
             # This prevents blocking if the client waits for first response before sending data
-            logger.info("[STREAM-INIT] Yielding initial empty response to unblock client")
-            yield caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
-                results=[],
-                input_start_index=0,
-                input_end_index=0,
-                start_index=0,
-                processed_index=0,
-                token_count=0,
-            )
-            logger.info("[STREAM-INIT] Initial response yielded, now entering iteration loop")
+            yield self._stream_opened()
 
+            if self._polls(session):
+                request_iterator = _poll_requests(request_iterator, session.deadline)
             for request in request_iterator:
-                logger.info(f"[STREAM-ITER-{request_count}] Received request from iterator")
-                request_count += 1
-                logger.info(
-                    f"[Stream #{request_count}] Received: input_index={request.input_index_stream}, text_length={len(request.text_stream)}, text='{request.text_stream[:50]}'"
-                )
-
-                # Accumulate text and track input index
-                logger.info(f"[STREAM-PROCESS-{request_count}] Accumulating text...")
-                accumulated_text += request.text_stream
-                text_tracker.append(request.text_stream)
-                logger.info(f"[STREAM-PROCESS-{request_count}] Total accumulated: {len(accumulated_text)} chars")
-
-                if request.input_index_stream != -1:
-                    input_index_tracker.append(request.input_index_stream)
-                    end_processing_counter += 1
-                    if start_processing_counter < 0:
-                        start_processing_counter = 0
-                    logger.info(f"[STREAM-PROCESS-{request_count}] Input index: {request.input_index_stream}, counters: start={start_processing_counter}, end={end_processing_counter}")
-
-                # Run chunker on the portion of text not yet processed
-                logger.info(f"[STREAM-CHUNK-{request_count}] Running chunker from offset {processed_offset}")
-                chunks = chunker.chunk(accumulated_text[processed_offset:])
-                logger.info(f"[STREAM-CHUNK-{request_count}] Chunker returned {len(chunks)} chunks")
-
-                # Only yield complete chunks (keep last one buffered)
-                if len(chunks) > 1:
-                    logger.info(f"[STREAM-YIELD-{request_count}] Multiple chunks detected, will yield {len(chunks)-1} chunks")
-                    # Clear text tracker when sentences are detected
-                    text_tracker = []
-
-                    # Yield all but the last chunk
-                    for idx, (text, start, end) in enumerate(chunks[:-1]):
-                        logger.info(f"[STREAM-YIELD-{request_count}-{idx}] Processing chunk: start={start}, end={end}")
-                        # Adjust positions to be absolute (add offset)
-                        abs_start = start + processed_offset
-                        abs_end = end + processed_offset
-
-                        # Skip if already yielded
-                        if (abs_start, abs_end) in yielded_chunks:
-                            continue
-
-                        # Handle leading whitespace for first event
-                        if first_event and abs_start != 0:
-                            abs_start = 0
-                            text = accumulated_text[abs_start:abs_end]
-                            first_event = False
-
-                        yielded_chunks.add((abs_start, abs_end))
-                        chunk_count += 1
-
-                        # Calculate input index range for this chunk
-                        if start_processing_counter >= len(input_index_tracker):
-                            start_processing_counter = len(input_index_tracker) - 1
-
-                        chunk_input_start = input_index_tracker[start_processing_counter] if start_processing_counter >= 0 else 0
-                        chunk_input_end = input_index_tracker[end_processing_counter - 1] if end_processing_counter > 0 else 0
-
-                        logger.info(
-                            f"[STREAM-YIELD-{request_count}-{idx}] → YIELDING chunk {chunk_count}: start={abs_start}, end={abs_end}, "
-                            f"input_range=[{chunk_input_start}:{chunk_input_end}], text='{text[:50]}'"
-                        )
-
-                        logger.info(f"[STREAM-YIELD-{request_count}-{idx}] Creating protobuf response...")
-                        yield caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
-                            results=[
-                                caikit_data_model_nlp_pb2.Token(
-                                    start=abs_start, end=abs_end, text=text
-                                )
-                            ],
-                            input_start_index=chunk_input_start,
-                            input_end_index=chunk_input_end,
-                            start_index=abs_start,
-                            processed_index=abs_end,
-                            token_count=1,
-                        )
-
-                        logger.info(f"[STREAM-YIELD-{request_count}-{idx}] Response yielded successfully")
-
-                        # Update processed offset and start counter
-                        processed_offset = abs_end
-                        start_processing_counter = end_processing_counter
-                else:
-                    logger.info(f"[STREAM-CHUNK-{request_count}] Only {len(chunks)} chunk(s), buffering (not yielding yet)")
-
-                logger.info(f"[STREAM-ITER-{request_count}] Completed processing, looping back for next message...")
-
-            # Stream iteration complete
-            logger.info("="*80)
-            logger.info(f"[STREAM-COMPLETE] Stream iteration complete!")
-            logger.info(f"[STREAM-COMPLETE] Total requests received: {request_count}")
-            logger.info(f"[STREAM-COMPLETE] Total accumulated text: {len(accumulated_text)} chars")
-            logger.info(f"[STREAM-COMPLETE] Chunks yielded so far: {chunk_count}")
-            logger.info("="*80)
+                chunks = self._on_stream_lane(call, *self._stream_step(call, request))
+                yield from self._stream_responses(call, chunks, request)
 
             # Yield any remaining chunks at the end of stream
-            remaining_chunks = chunker.chunk(accumulated_text[processed_offset:])
-            logger.info(f"Remaining chunks to process: {len(remaining_chunks)}")
-
-            if remaining_chunks:
-                for text, start, end in remaining_chunks:
-                    abs_start = start + processed_offset
-                    abs_end = end + processed_offset
-
-                    if (abs_start, abs_end) in yielded_chunks:
-                        continue
-
-                    # Handle leading whitespace for first event
-                    if first_event and abs_start != 0:
-                        abs_start = 0
-                        text = accumulated_text[abs_start:abs_end]
-                        first_event = False
-
-                    yielded_chunks.add((abs_start, abs_end))
-                    chunk_count += 1
-
-                    chunk_input_start = input_index_tracker[start_processing_counter] if start_processing_counter >= 0 else 0
-                    chunk_input_end = input_index_tracker[-1] if input_index_tracker else 0
-
-                    logger.debug(
-                        f"Yielding final chunk {chunk_count}: start={abs_start}, end={abs_end}, text={text[:50]}"
-                    )
-
-                    yield caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
-                        results=[
-                            caikit_data_model_nlp_pb2.Token(
-                                start=abs_start, end=abs_end, text=text
-                            )
-                        ],
-                        input_start_index=chunk_input_start,
-                        input_end_index=chunk_input_end,
-                        start_index=abs_start,
-                        processed_index=abs_end,
-                        token_count=1,
-                    )
-            else:
-                # Handle whitespace-only or no-chunk case
-                # Yield text chunks as-is when no sentences are detected
-                sentence_start = 0
-                chunk_input_start = input_index_tracker[start_processing_counter] if start_processing_counter >= 0 else 0
-                chunk_input_end = input_index_tracker[-1] if input_index_tracker else 0
-
-                for text_chunk in text_tracker:
-                    sentence_end = sentence_start + len(text_chunk)
-                    chunk_count += 1
-
-                    logger.debug(
-                        f"Yielding whitespace chunk {chunk_count}: start={sentence_start}, end={sentence_end}"
-                    )
-
-                    yield caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
-                        results=[
-                            caikit_data_model_nlp_pb2.Token(
-                                start=sentence_start, end=sentence_end, text=text_chunk
-                            )
-                        ],
-                        input_start_index=chunk_input_start,
-                        input_end_index=chunk_input_end,
-                        start_index=sentence_start,
-                        processed_index=sentence_end,
-                        token_count=1,
-                    )
-                    sentence_start = sentence_end
-
-            logger.info(
-                f"Streaming complete: model_id={model_id}, total_chunks={chunk_count}"
-            )
+            chunks = self._on_stream_lane(call, 0, session.finalize)
+            yield from self._stream_responses(call, chunks)
+            self._log_stream(call, context)
+
+    def UploadChunkerTokenizationTaskPredict(self, request_iterator, context):
+        """Chunking of one document uploaded in segments, with chunks streamed back as they complete."""
+        with self._rpc("upload", context, "Upload chunking") as call:
+            chunker = self._find_chunker(call)
+            session = self._open_upload(call, chunker)
 
+            # Each response carries the chunks completed by one segment
+            for request in request_iterator:
+                chunks = self._on_stream_lane(call, *self._upload_step(call, request))
+                yield from self._stream_responses(call, chunks)
+
+            chunks = self._on_stream_lane(call, 0, self._finalize_upload, session)
+            yield from self._stream_responses(call, chunks)
+            self._log_stream(call, context)
+
+    @contextlib.contextmanager
+    def _rpc(self, method, context, name, request=None):
+        """
+        Serve one RPC in the block, ending it with the status of any error raised.
+
+        Args:
+            method: Short name of the RPC, see ``RequestStats``
+            context: The RPC's servicer context
+            name: What the RPC does, for the log of unexpected errors
+            request: Request message of a unary RPC, counted in its stats
+        """
+        call = RpcCall(method, context)
+        if request is not None:
+            call.stats.request_bytes = request.ByteSize()
+        try:
+            yield call
+        except Exception as e:
+            context.abort(*self._error_status(call, e, name))
+        finally:
+            self._finish(call, context)
+
+    def _error_status(self, call, error, name):
+        """
+        Status code and details to end an RPC with after ``error``.
+
+        Rejected requests get the retry hint of ``_shed``, and errors that are
+        not a ``RequestError`` are logged as failures of ``name``.
+        """
+        if isinstance(error, RequestError):
+            return error.code, str(error)
+        if isinstance(error, Overloaded):
+            self._shed(call.stats, error)
+            return grpc.StatusCode.RESOURCE_EXHAUSTED, str(error)
+        logger.error("%s failed: %s", name, error, exc_info=True)
+        return grpc.StatusCode.INTERNAL, str(error)
+
+    def _find_chunker(self, call):
+        """
+        Look up the chunker of a single-chunker request, configured with its parameters.
+
+        Also reads the request's offset unit.
+
+        Raises:
+            RequestError: If the parameters or unit are invalid, or the chunker is unknown
+        """
+        with invalid_argument():
+            call.unit = offset_unit(call.metadata)
+            chunker = self.registry.get(call.model_id, chunker_params(call.metadata))
+        if not chunker:
+            self._log_unknown([call.model_id])
+            raise RequestError(grpc.StatusCode.NOT_FOUND, f"Unknown chunker: {call.model_id}")
+        call.stats.set_model(call.model_id)
+        return chunker
+
+    def _find_chunkers(self, call, model_ids):
+        """
+        Check that the chunkers of a request running several of them exist.
+
+        Also reads the request's offset unit, and rejects chunker parameters,
+        which do not apply to several chunkers.
+
+        Raises:
+            RequestError: If the metadata is invalid or a chunker is unknown
+        """
+        if CHUNKER_PARAMS_METADATA_KEY in call.metadata:
+            raise RequestError(grpc.StatusCode.INVALID_ARGUMENT, CHUNKER_PARAMS_UNSUPPORTED)
+        with invalid_argument():
+            call.unit = offset_unit(call.metadata)
+        unknown = sorted({model_id for model_id in model_ids if not self.registry.get(model_id)})
+        if unknown:
+            self._log_unknown(unknown)
+            raise RequestError(
+                grpc.StatusCode.NOT_FOUND, f"Unknown chunker(s): {', '.join(unknown)}"
+            )
+        call.stats.set_model(self._request_model(model_ids))
+
+    def _open_stream(self, call, chunker, context):
+        """
+        Create the StreamSession of a streaming request and start tracking it.
+
+        Raises:
+            Overloaded: If the chunker's lane is rejecting work
+            RequestError: If the request's flush metadata is invalid
+        """
+        self.lanes.lane(call.model_id).check(0)
+        with invalid_argument():
+            flush_policy = FlushPolicy.from_metadata(call.metadata, chunker.flush_policy)
+        call.session = StreamSession(
+            chunker,
+            max_buffered=STREAM_MAX_BUFFERED or None,
+            flush_policy=flush_policy,
+            offset_index=self._offset_index(call.unit),
+        )
+        self._start_stream(call)
+        call.trace = self._trace_stream_start(call, context)
+        return call.session
+
+    def _open_upload(self, call, chunker):
+        """
+        Create the UploadSession of an upload request and start tracking it.
+
+        Its chunks are always coalesced, one response per segment.
+
+        Raises:
+            Overloaded: If the chunker's lane is rejecting work
+        """
+        self.lanes.lane(call.model_id).check(0)
+        call.session = UploadSession(
+            chunker,
+            max_buffered=STREAM_MAX_BUFFERED or None,
+            offset_index=self._offset_index(call.unit),
+        )
+        call.coalesce = True
+        self._start_stream(call)
+        return call.session
+
+    @staticmethod
+    def _polls(session):
+        """Whether a stream's session must be polled while its client is idle."""
+        return session.flush_policy is not None and session.flush_policy.max_wait is not None
+
+    @staticmethod
+    def _stream_step(call, request):
+        """
+        Session call for one stream message, as (size, func, *args).
+
+        ``request`` is None when the flush wait limit passed with no new
+        message.
+        """
+        if request is None:
+            return 0, call.session.poll
+        call.stats.request_bytes += request.ByteSize()
+        text = request.text_stream
+        return len(text), call.session.feed, text, request.input_index_stream
+
+    @classmethod
+    def _upload_step(cls, call, request):
+        """Session call for one upload segment, as (size, func, *args)."""
+        call.stats.request_bytes += request.ByteSize()
+        size = len(request.text) + len(request.data)
+        return size, cls._feed_upload, call.session, request.text, request.data
+
+    @staticmethod
+    def _feed_upload(session, text, data):
+        """
+        Add a segment to an UploadSession, see ``UploadSession.feed``.
+
+        Raises:
+            RequestError: If the segment cannot be decoded or mixes text and data
+        """
+        with invalid_argument():
+            return session.feed(text, data)
+
+    @staticmethod
+    def _finalize_upload(session):
+        """
+        Finish an UploadSession, see ``UploadSession.finalize``.
+
+        Raises:
+            RequestError: If the data ends inside a character
+        """
+        with invalid_argument():
+            return session.finalize()
+
+    @staticmethod
+    def _offset_index(unit, text=""):
+        """Index converting positions in ``text`` to ``unit``, or None for code points."""
+        return None if unit is None else OffsetIndex(unit, text)
+
+    def _on_lane(self, stats, model_id, size, func, *args, check=True):
+        """
+        Make a timed chunking call for ``model_id`` on ``size`` characters.
+
+        Calls on at least ``OFFLOAD_CHARS`` characters run on the chunker's
+        lane, others in the calling thread.
+
+        Raises:
+            Overloaded: If ``check`` is set and the lane does not admit the call
+        """
+        if size < OFFLOAD_CHARS:
+            return self._chunk_timed(stats, func, *args)
+        lane = self.lanes.lane(model_id)
+        future = lane.submit(size, self._chunk_timed, stats, func, *args, check=check, stats=stats)
+        return future.result()
+
+    def _on_stream_lane(self, call, size, func, *args):
+        """
+        Make a timed call of a stream's session on ``size`` new characters.
+
+        The stream was admitted when it started, so the call is never
+        rejected. Its size includes the text the session still buffers.
+        """
+        return self._on_lane(
+            call.stats, call.model_id, call.session.buffered + size, func, *args, check=False
+        )
+
+    def _occupy_lanes(self, items):
+        """
+        Admit work of several chunkers that runs in the request's thread.
+
+        Chunkers with less than ``OFFLOAD_CHARS`` characters of the
+        (model_id, text) ``items`` are left out, see ``AdmissionController.occupy``.
+        """
+        sizes = {}
+        for model_id, text in items:
+            sizes[model_id] = sizes.get(model_id, 0) + len(text)
+        return self.lanes.occupy(
+            {model_id: size for model_id, size in sizes.items() if size >= OFFLOAD_CHARS}
+        )
+
+    @staticmethod
+    def _shed(stats, overloaded):
+        """Add the retry hint of a rejected request to its trailing metadata."""
+        retry_ms = math.ceil(overloaded.retry_after * 1000)
+        stats.trailing_metadata.append((RETRY_PUSHBACK_KEY, str(retry_ms)))
+
+    @staticmethod
+    def _chunk_timed(stats, func, *args, model_id=None):
+        """Call a chunking function, recording its duration in ``stats``."""
+        started = time.perf_counter()
+        result = func(*args)
+        stats.chunked(time.perf_counter() - started, model_id)
+        return result
+
+    @staticmethod
+    def _request_model(model_ids):
+        """Model id label of a request covering ``model_ids``."""
+        model_ids = set(model_ids)
+        return model_ids.pop() if len(model_ids) == 1 else MIXED_MODELS
+
+    @staticmethod
+    def _start_stream(call):
+        """Count a stream whose session was created, and trace its allocations if profiled."""
+        ACTIVE_STREAMS.labels(call.model_id).inc()
+        call.stats.memory_snapshot = SESSION_MEMORY.session_started()
+
+    @staticmethod
+    def _finish(call, context):
+        """Record the metrics of a finished RPC, and of its stream if it had one."""
+        stats, session = call.stats, call.session
+        if session is not None:
+            ACTIVE_STREAMS.labels(stats.model_id).dec()
+            STREAM_MESSAGES.labels(stats.model_id).observe(session.messages)
+            STREAM_PEAK_BUFFERED.labels(stats.model_id).observe(session.peak_buffered)
+            stats.chunks = session.chunks
+        if stats.memory_snapshot is not None:
+            SESSION_MEMORY.session_finished(stats.memory_snapshot, stats)
+        stats.finish(context)
+
+    def reload_config(self):
+        """
+        Reload the chunker config file, see ``reload_chunker_config``.
+
+        Requests that already hold a chunker finish with it. If the file
+        cannot be read, the current config stays in place.
+
+        Returns:
+            The chunkers that changed by kind, or None if the reload failed
+        """
+        started = time.perf_counter()
+        try:
+            changes = reload_chunker_config()
         except Exception as e:
-            logger.error(f"Stream chunking failed: {e}", exc_info=True)
-            context.abort(grpc.StatusCode.INTERNAL, str(e))
+            logger.error("Keeping the current chunker config, reload failed: %s", e)
+            return None
+        if changes["added"] or changes["changed"] or changes["removed"]:
+            # Pool workers read the config when they start
+            self.batch.restart()
+            self.shards.restart()
+        log_event(
+            logger,
+            logging.INFO,
+            "Reloaded chunker config",
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            **changes,
+        )
+        return changes
+
+    def _log_unknown(self, model_ids):
+        logger.error("Unknown chunker(s): %s. Available: %s", model_ids, self.registry.list_names())
+
+    @staticmethod
+    def _log_unary(call, text, chunks=None, **fields):
+        """Log the summary of a unary request, and its chunks if it is traced."""
+        if chunks is not None:
+            fields["chunks"] = len(chunks)
+        log_event(
+            logger,
+            logging.INFO,
+            "Chunking complete",
+            model_id=call.model_id,
+            text_length=len(text),
+            duration_ms=round((time.perf_counter() - call.stats.started) * 1000, 3),
+            **fields,
+        )
+        if chunks and sample_trace():
+            log_event(
+                trace_logger,
+                logging.DEBUG,
+                "Chunk details",
+                request=next_request_id(),
+                chunks=[(start, end, chunk[:50]) for chunk, start, end in chunks],
+            )
 
+    @staticmethod
+    def _log_batch(call, items, response):
+        log_event(
+            logger,
+            logging.INFO,
+            "Batch chunking complete",
+            batch_size=response.batch_size,
+            text_length=sum(len(text) for _, text in items),
+            chunks=sum(result.token_count for result in response.results),
+            duration_ms=round((time.perf_counter() - call.stats.started) * 1000, 3),
+        )
+
+    @staticmethod
+    def _log_multi(call, text, response):
+        log_event(
+            logger,
+            logging.INFO,
+            "Multi-chunker chunking complete",
+            text_length=len(text),
+            chunks={model_id: result.token_count for model_id, result in response.results.items()},
+            duration_ms=round((time.perf_counter() - call.stats.started) * 1000, 3),
+        )
+
+    @staticmethod
+    def _log_stream(call, context):
+        """Log the summary of a finished stream."""
+        session = call.session
+        log_event(
+            logger,
+            logging.INFO,
+            "Streaming complete",
+            model_id=call.model_id,
+            peer=context.peer(),
+            messages=session.messages,
+            chars=session.processed,
+            chunks=session.chunks,
+            peak_buffered=session.peak_buffered,
+            peak_memory=session.peak_memory,
+            forced_flushes=session.forced_flushes,
+            policy_flushes=session.policy_flushes,
+            duration_ms=round((time.perf_counter() - call.stats.started) * 1000, 3),
+        )
+
+    @staticmethod
+    def _trace_stream_start(call, context):
+        """
+        Decide whether to trace a new stream.
+
+        Returns:
+            The request id used in the stream's trace records, or None if the
+            stream is not traced
+        """
+        if not sample_trace():
+            return None
+        request = next_request_id()
+        log_event(
+            trace_logger,
+            logging.DEBUG,
+            "Stream started",
+            request=request,
+            model_id=call.model_id,
+            peer=context.peer(),
+            metadata=call.metadata,
+            flush_policy=call.session.flush_policy,
+        )
+        return request
+
+    @staticmethod
+    def _trace_stream_chunks(call, request, chunks):
+        """
+        Trace the chunks emitted for one stream message.
+
+        Args:
+            call: RpcCall of a stream traced by ``_trace_stream_start``
+            request: The stream message, or None for a flush without one
+            chunks: StreamChunk tuples emitted
+        """
+        fields = {}
+        if request is not None:
+            fields["input_index"] = request.input_index_stream
+            fields["text"] = request.text_stream[:50]
+        log_event(
+            trace_logger,
+            logging.DEBUG,
+            "Stream message",
+            request=call.trace,
+            messages=call.session.messages,
+            chunks=[(start, end, text[:50]) for text, start, end, _, _ in chunks],
+            buffered=call.session.buffered,
+            **fields,
+        )
+
+    def _cache_lookup(self, call, chunker, text):
+        """
+        Look up a unary request in the result cache.
+
+        The time taken is accounted to the ``cache`` stage of the call's
+        stats, and a hit is logged as the request's summary.
+
+        Returns:
+            (cache_key, cached_response_bytes); the key is None if the request
+            is not cacheable and the bytes are None on a miss
+        """
+        if self.cache is None:
+            return None, None
+        if not self.cache.accepts(text):
+            CACHE_LOOKUPS.labels("bypass").inc()
+            return None, None
+        started = time.perf_counter()
+        params = chunker.params
+        if call.offsets_only:
+            params = {**params, "offsets_only": True}
+        if call.unit is not None:
+            params = {**params, "offset_unit": call.unit}
+        cache_key = self.cache.key(chunker.name, params, text)
+        cached = self.cache.get(cache_key)
+        call.stats.add("cache", time.perf_counter() - started)
+        CACHE_LOOKUPS.labels("miss" if cached is None else "hit").inc()
+        if cached is not None:
+            call.stats.response_bytes = len(cached)
+            self._log_unary(call, text, cache="hit", response_bytes=len(cached))
+        return cache_key, cached
+
+    def _unary_response(self, call, text, chunks, cache_key):
+        """Build and log the response of a unary request, caching it if it is cacheable."""
+        response = self._tokenization_results(
+            chunks, call.offsets_only, self._offset_index(call.unit, text)
+        )
+        call.stats.chunks = response.token_count
+        call.stats.response_bytes = response.ByteSize()
+        self._log_unary(call, text, chunks=chunks)
+        if cache_key is None:
+            return response
+        serialized = response.SerializeToString()
+        self.cache.put(cache_key, serialized)
+        return serialized
+
+    @staticmethod
+    def _batch_items(call, request):
+        """(model_id, text) pairs of a batch request, with the default chunker filled in."""
+        return [(item.model_id or call.model_id, item.text) for item in request.items]
+
+    @staticmethod
+    def _multi_model_ids(call, request):
+        """Chunkers of a multi-chunker request, without duplicates."""
+        model_ids = list(request.model_ids)
+        if not model_ids:
+            model_ids = call.model_id.split(",")
+        return list(dict.fromkeys(model_id.strip() for model_id in model_ids if model_id.strip()))
+
+    def _batch_response(self, call, items):
+        """Chunk the (model_id, text) items of a batch request, and build and log its response."""
+        with self._occupy_lanes(items):
+            results = self.batch.run(items)
+        for (model_id, _), (_, seconds) in zip(items, results):
+            call.stats.chunked(seconds, model_id)
+        response = chunkers_pb2.BatchChunkerTokenizationResults(
+            results=[
+                self._tokenization_results(
+                    chunks, call.offsets_only, self._offset_index(call.unit, text)
+                )
+                for (_, text), (chunks, _) in zip(items, results)
+            ],
+            batch_size=len(results),
+            item_duration_us=[int(seconds * 1_000_000) for _, seconds in results],
+        )
+        call.stats.chunks = sum(result.token_count for result in response.results)
+        call.stats.response_bytes = response.ByteSize()
+        self._log_batch(call, items, response)
+        return response
+
+    def _multi_response(self, call, model_ids, text):
+        """Run each chunker over one shared text, and build and log the response keyed by chunker."""
+        prepared = PreparedText(text)
+        index = self._offset_index(call.unit, text)
+        results = {}
+        with self._occupy_lanes((model_id, text) for model_id in model_ids):
+            for model_id in model_ids:
+                chunks = self._chunk_timed(
+                    call.stats,
+                    self.registry.get(model_id).chunk_prepared,
+                    prepared,
+                    model_id=model_id,
+                )
+                results[model_id] = self._tokenization_results(chunks, call.offsets_only, index)
+        response = chunkers_pb2.MultiChunkerTokenizationResults(results=results)
+        call.stats.chunks = sum(result.token_count for result in response.results.values())
+        call.stats.response_bytes = response.ByteSize()
+        self._log_multi(call, text, response)
+        return response
+
+    @staticmethod
+    def _tokenization_results(chunks, offsets_only=False, index=None):
+        """
+        Build a unary response from (text, start, end) chunks, such as ``Spans``.
+
+        With ``offsets_only``, chunks carry only their start and end. With an
+        ``OffsetIndex`` of the chunked text, positions are in its unit.
+        """
+        response = caikit_data_model_nlp_pb2.TokenizationResults(token_count=len(chunks))
+        convert = None if index is None or index.identity else index.convert
+        # Each chunk's text is sliced only here, and copied straight into
+        # the response without an intermediate Token
+        add = response.results.add
+        if offsets_only:
+            if isinstance(chunks, Spans):
+                offsets = chunks.offsets()
+            else:
+                offsets = (chunk[1:] for chunk in chunks)
+            if convert is not None:
+                offsets = ((convert(start), convert(end)) for start, end in offsets)
+            for start, end in offsets:
+                add(start=start, end=end)
+        elif convert is not None:
+            for text, start, end in chunks:
+                add(start=convert(start), end=convert(end), text=text)
+        else:
+            for text, start, end in chunks:
+                add(start=start, end=end, text=text)
+        return response
+
+    @staticmethod
+    def _stream_opened():
+        """Empty first response of a stream, sent before any message is read."""
+        return caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
+            results=[],
+            input_start_index=0,
+            input_end_index=0,
+            start_index=0,
+            processed_index=0,
+            token_count=0,
+        )
+
+    @classmethod
+    def _stream_responses(cls, call, chunks, request=None):
+        """
+        Build the stream responses for StreamChunks emitted together.
+
+        Each chunk gets a response of its own, unless the call coalesces
+        them, in which case they share one. Traced streams also log them,
+        with the message that completed them if there was one.
+        """
+        if call.trace:
+            cls._trace_stream_chunks(call, request, chunks)
+        if not chunks:
+            return []
+        if call.coalesce:
+            return [cls._stream_result(chunks, call.stats, call.offsets_only)]
+        return [cls._stream_result([chunk], call.stats, call.offsets_only) for chunk in chunks]
+
+    @staticmethod
+    def _stream_result(chunks, stats, offsets_only):
+        """Build one stream response for StreamChunks, counting its size in ``stats``."""
+        result = caikit_data_model_nlp_pb2.ChunkerTokenizationStreamResult(
+            input_start_index=chunks[0][3],
+            input_end_index=chunks[-1][4],
+            start_index=chunks[0][1],
+            processed_index=chunks[-1][2],
+            token_count=len(chunks),
+        )
+        add = result.results.add
+        for text, start, end, _, _ in chunks:
+            if offsets_only:
+                add(start=start, end=end)
+            else:
+                add(start=start, end=end, text=text)
+        stats.response_bytes += result.ByteSize()
+        return result
 
-def serve():
-    """Start the gRPC server."""
-    interceptors = [LoggingInterceptor()]
 
-    options = [
+# Enable gRPC reflection
+SERVICE_NAMES = (
+    "caikit.runtime.Chunkers.ChunkersService",
+    "grpc.health.v1.Health",
+    reflection.SERVICE_NAME,
+)
+
+PORT = 8085
+
+
+def server_options(max_concurrent_streams: int = 100, reuse_port: bool = False):
+    """Channel options shared by the thread-pool and asyncio servers."""
+    return [
+        # Let several worker processes bind the same port
+        ('grpc.so_reuseport', 1 if reuse_port else 0),
         # Keepalive:
         ('grpc.http2.min_ping_interval_without_data_ms', 10000),
         ('grpc.keepalive_permit_without_calls', 1),
         ('grpc.keepalive_time_ms', 30000),
         ('grpc.keepalive_timeout_ms', 60000),
         # Resource limits
-        ('grpc.http2.max_concurrent_streams', 100),
+        ('grpc.http2.max_concurrent_streams', max_concurrent_streams),
         ('grpc.max_receive_message_length', 10 * 1024 * 1024),
         ('grpc.max_send_message_length', 10 * 1024 * 1024),
         # Connection lifecycle
@@ -323,41 +910,179 @@ def serve():
         ('grpc.max_connection_idle_ms', 10 * 60 * 1000),
     ]
 
+
+def log_startup(mode: str):
+    """Log the listening port, available chunkers and time since the package was imported."""
+    registry = get_chunker_registry()
+    available_chunkers = ", ".join(registry.list_names())
+
+    logger.info("=" * 80)
+    logger.info(
+        "gRPC server (%s) listening on port %s, %.0f ms after import",
+        mode,
+        PORT,
+        (time.perf_counter() - IMPORT_STARTED) * 1000,
+    )
+    logger.info("Available chunkers: %s", available_chunkers)
+    logger.info("Health check endpoint: grpc.health.v1.Health/Check")
+    logger.info("=" * 80)
+
+
+def warmup(names: str = WARMUP) -> None:
+    """Build the chunkers listed in ``names`` (see ``CHUNKER_WARMUP``) and log how long it took."""
+    names = [name.strip() for name in names.split(",") if name.strip()]
+    if not names:
+        return
+    registry = get_chunker_registry()
+    already_loaded = set(registry.load_seconds)
+    started = time.perf_counter()
+    registry.warmup(None if "*" in names else names)
+    loaded = {
+        name: round(seconds * 1000, 1)
+        for name, seconds in registry.load_seconds.items()
+        if name not in already_loaded
+    }
+    if loaded:
+        log_event(
+            logger,
+            logging.INFO,
+            "Warmup complete",
+            chunkers=loaded,
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            since_import_ms=round((time.perf_counter() - IMPORT_STARTED) * 1000, 3),
+        )
+
+
+def start_warmup() -> None:
+    """Build the ``CHUNKER_WARMUP`` chunkers on a background thread."""
+    threading.Thread(target=warmup, name="chunker-warmup", daemon=True).start()
+
+
+def start_config_watch(servicer):
+    """
+    Reload the chunker config whenever its file changes, unless disabled.
+
+    Each worker process watches the file itself, so all of them pick up a
+    change.
+
+    Returns:
+        The started ConfigWatcher, or None if ``CHUNKER_CONFIG_RELOAD_INTERVAL`` is 0
+    """
+    if CONFIG_RELOAD_INTERVAL <= 0:
+        return None
+    watcher = ConfigWatcher(
+        ChunkerFactory.config_file(CONFIG_PATH), servicer.reload_config, CONFIG_RELOAD_INTERVAL
+    )
+    watcher.start()
+    return watcher
+
+
+# Seconds between refreshes of the aggregated worker health status
+HEALTH_REFRESH_INTERVAL = 1.0
+
+
+def health_status(worker_health):
+    """Overall serving status, aggregated across workers when supervised."""
+    if worker_health is None or worker_health.all_ready():
+        return health_pb2.HealthCheckResponse.SERVING
+    return health_pb2.HealthCheckResponse.NOT_SERVING
+
+
+def _watch_worker_health(health_servicer, worker_health):
+    """Keep the overall health status in line with the other workers."""
+    status = None
+    while True:
+        current = health_status(worker_health)
+        if current != status:
+            health_servicer.set("", current)
+            status = current
+        time.sleep(HEALTH_REFRESH_INTERVAL)
+
+
+def serve(reuse_port: bool = False, worker_health=None):
+    """
+    Start the thread-pool gRPC server.
+
+    Args:
+        reuse_port: Bind with SO_REUSEPORT so other workers can share the port
+        worker_health: WorkerHealth of this worker when run under a WorkerPool
+    """
+    interceptors = [LoggingInterceptor()]
+    if CACHE_MAX_BYTES:
+        interceptors.append(PreserializedResponseInterceptor())
+
     server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=50),
+        TimedThreadPoolExecutor(max_workers=50, executor_name="server"),
         interceptors=interceptors,
-        options=options
+        options=server_options(reuse_port=reuse_port)
     )
 
-    chunkers_pb2_grpc.add_ChunkersServiceServicer_to_server(ChunkersServicer(), server)
+    servicer = ChunkersServicer()
+    chunkers_pb2_grpc.add_ChunkersServiceServicer_to_server(servicer, server)
 
     health_servicer = health.HealthServicer()
     health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
-    health_servicer.set("", health_pb2.HealthCheckResponse.SERVING)
+    health_servicer.set("", health_status(worker_health))
 
-    # Enable gRPC reflection
-    SERVICE_NAMES = (
-        "caikit.runtime.Chunkers.ChunkersService",
-        "grpc.health.v1.Health",
-        reflection.SERVICE_NAME,
-    )
     reflection.enable_server_reflection(SERVICE_NAMES, server)
 
-    server.add_insecure_port("[::]:8085")
-
-    # Get available chunkers from registry
-    from . import get_chunker_registry
-
-    registry = get_chunker_registry()
-    available_chunkers = ", ".join(registry.list_names())
+    server.add_insecure_port(f"[::]:{PORT}")
 
-    logger.info("=" * 80)
-    logger.info("gRPC server listening on port 8085")
-    logger.info(f"Available chunkers: {available_chunkers}")
-    logger.info("Health check endpoint: grpc.health.v1.Health/Check")
-    logger.info("=" * 80)
+    log_startup("thread")
+    if worker_health is None:
+        start_metrics_server()
+    install_signal_handlers()
     server.start()
+    start_warmup()
+    start_config_watch(servicer)
+    if worker_health is not None:
+        worker_health.mark_ready()
+        threading.Thread(
+            target=_watch_worker_health,
+            args=(health_servicer, worker_health),
+            daemon=True,
+        ).start()
     server.wait_for_termination()
 
+
+def main():
+    """Parse command line arguments and start the server."""
+    parser = argparse.ArgumentParser(description="Chunker gRPC server")
+    parser.add_argument(
+        "--mode",
+        choices=["thread", "aio"],
+        default=os.environ.get("CHUNKER_SERVER_MODE", "thread"),
+        help="thread: one pool thread per RPC; aio: asyncio event loop (grpc.aio)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.environ.get("CHUNKER_WORKERS", 1)),
+        help="number of server processes sharing the port (default: 1)",
+    )
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from .worker_pool import WorkerPool
+
+        if MULTIPROC_DIR:
+            clear_multiprocess_dir()
+            start_metrics_server()
+        elif METRICS_PORT:
+            logger.warning(
+                "Metrics are disabled with several workers unless PROMETHEUS_MULTIPROC_DIR is set"
+            )
+        # Workers share chunkers built before the fork copy-on-write
+        warmup()
+        logger.info("Starting %s %s workers on port %s", args.workers, args.mode, PORT)
+        WorkerPool(args.workers, mode=args.mode).run()
+    elif args.mode == "aio":
+        from .aio_server import serve_async
+
+        asyncio.run(serve_async())
+    else:
+        serve()
+
+
 if __name__ == "__main__":
-    serve()
+    main()
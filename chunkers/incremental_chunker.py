@@ -0,0 +1,124 @@
+"""
+Incremental chunking for text that arrives in pieces.
+"""
+
+import sys
+from typing import TYPE_CHECKING, List, Tuple
+
+if TYPE_CHECKING:
+    from .base_chunker import BaseChunker
+
+
+class IncrementalChunker:
+    """
+    Stateful chunker for streamed text.
+
+    Text is passed to ``feed`` as it arrives. Chunks are returned once they
+    are complete, with positions relative to the start of the stream, and
+    their text is dropped from the buffer. ``flush`` forces out whatever is
+    buffered and ``finalize`` flushes and closes the stream.
+
+    This base implementation re-chunks the unemitted text on every feed and
+    returns all but the last chunk, so it works with any ``BaseChunker``.
+    Subclasses override ``_complete_chunks`` to avoid rescanning text that
+    cannot contain a new boundary.
+    """
+
+    def __init__(self, chunker: "BaseChunker", **kwargs):
+        self._chunker = chunker
+        self._kwargs = kwargs
+        self._parts: List[str] = []
+        self._length = 0
+        # Sum of ``sys.getsizeof`` over the parts, kept as they change so
+        # that ``memory_usage`` does not walk them on every feed
+        self._parts_size = 0
+        self._base = 0
+        self._closed = False
+
+    @property
+    def base(self) -> int:
+        """Absolute position of the first buffered character."""
+        return self._base
+
+    @property
+    def end(self) -> int:
+        """Absolute position just past the last character fed."""
+        return self._base + self._length
+
+    @property
+    def buffered(self) -> int:
+        """Number of characters fed but not yet emitted."""
+        return self._length
+
+    def feed(self, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Add text to the stream.
+
+        Args:
+            text: Next piece of the stream
+
+        Returns:
+            List of (chunk_text, start_pos, end_pos) tuples that are complete
+        """
+        if self._closed:
+            raise RuntimeError("feed() called after finalize()")
+        if not text:
+            return []
+
+        self._parts.append(text)
+        self._length += len(text)
+        self._parts_size += sys.getsizeof(text)
+        chunks = self._complete_chunks(text)
+        if chunks:
+            self._consume(self._resume_at(chunks))
+        return chunks
+
+    def flush(self) -> List[Tuple[str, int, int]]:
+        """Emit all buffered text as chunks, including an incomplete last one."""
+        chunks = self._shift(self._chunker.chunk(self._buffer(), **self._kwargs))
+        if chunks:
+            self._consume(chunks[-1][2])
+        return chunks
+
+    def finalize(self) -> List[Tuple[str, int, int]]:
+        """Flush the buffer and close the stream."""
+        chunks = self.flush()
+        self._closed = True
+        return chunks
+
+    def discard(self) -> None:
+        """Drop all buffered text without chunking it."""
+        self._consume(self.end)
+
+    def memory_usage(self) -> int:
+        """Approximate size in bytes of the buffered text."""
+        return self._parts_size
+
+    def _complete_chunks(self, text: str) -> List[Tuple[str, int, int]]:
+        """Return the chunks that are complete after ``text`` was fed."""
+        chunks = self._chunker.chunk(self._buffer(), **self._kwargs)
+        return self._shift(chunks[:-1])
+
+    def _resume_at(self, chunks: List[Tuple[str, int, int]]) -> int:
+        """Absolute position before which text is no longer needed once ``chunks`` are emitted."""
+        return chunks[-1][2]
+
+    def _buffer(self) -> str:
+        """Return the unemitted text as a single string."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+            self._parts_size = sys.getsizeof(self._parts[0])
+        return self._parts[0] if self._parts else ""
+
+    def _shift(self, chunks: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+        """Convert buffer-relative chunk positions to absolute positions."""
+        base = self._base
+        return [(text, start + base, end + base) for text, start, end in chunks]
+
+    def _consume(self, end: int) -> None:
+        """Drop buffered text before absolute position ``end``."""
+        buffer = self._buffer()[end - self._base :]
+        self._parts = [buffer] if buffer else []
+        self._length = len(buffer)
+        self._parts_size = sys.getsizeof(buffer) if buffer else 0
+        self._base = end
@@ -0,0 +1,277 @@
+"""
+Prometheus metrics of the server.
+
+Every RPC records its outcome, duration, request and response size and
+chunk count, and the time spent in chunker calls is recorded per chunker.
+Metrics are served for scraping on ``CHUNKER_METRICS_PORT``.
+
+With several worker processes, each worker writes its metrics to files in
+``PROMETHEUS_MULTIPROC_DIR``, which must be set before the server starts,
+and the supervisor serves them aggregated.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import grpc
+from prometheus_client import (REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, multiprocess, start_http_server)
+
+from .profiling import SLOW_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Port of the HTTP scrape endpoint; 0 disables it
+METRICS_PORT = int(os.environ.get("CHUNKER_METRICS_PORT", 8086))
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Request metadata key asking for stage timings in the trailing metadata
+TIMING_METADATA_KEY = "mm-timing"
+# Trailing metadata key of the stage timings, in Server-Timing syntax
+SERVER_TIMING_KEY = "server-timing"
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+CHARS_BUCKETS = tuple(4 ** power for power in range(3, 12))
+
+REQUESTS = Counter(
+    "chunker_requests",
+    "RPCs handled",
+    ["method", "model_id", "code"],
+)
+REQUEST_SECONDS = Histogram(
+    "chunker_request_duration_seconds",
+    "Time from the start of an RPC handler to its end",
+    ["method", "model_id"],
+    buckets=LATENCY_BUCKETS,
+)
+CHUNK_SECONDS = Histogram(
+    "chunker_chunk_duration_seconds",
+    "Time spent in one chunker call",
+    ["method", "model_id"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "chunker_queue_wait_seconds",
+    "Time work waited for an executor thread",
+    ["executor"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_BYTES = Counter(
+    "chunker_request_bytes",
+    "Serialized size of received messages",
+    ["method", "model_id"],
+)
+RESPONSE_BYTES = Counter(
+    "chunker_response_bytes",
+    "Serialized size of sent messages",
+    ["method", "model_id"],
+)
+CHUNKS = Histogram(
+    "chunker_chunks_per_request",
+    "Chunks returned by one RPC",
+    ["method", "model_id"],
+    buckets=COUNT_BUCKETS,
+)
+STREAM_MESSAGES = Histogram(
+    "chunker_stream_messages",
+    "Messages received by one stream",
+    ["model_id"],
+    buckets=COUNT_BUCKETS,
+)
+STREAM_PEAK_BUFFERED = Histogram(
+    "chunker_stream_peak_buffered_chars",
+    "Most characters one stream held without emitting them",
+    ["model_id"],
+    buckets=CHARS_BUCKETS,
+)
+ACTIVE_STREAMS = Gauge(
+    "chunker_active_streams",
+    "Streams in progress",
+    ["model_id"],
+    multiprocess_mode="livesum",
+)
+LANE_QUEUED = Gauge(
+    "chunker_lane_queue_depth",
+    "Calls admitted to a chunker's lane that wait for one of its threads",
+    ["model_id"],
+    multiprocess_mode="livesum",
+)
+LANE_RUNNING = Gauge(
+    "chunker_lane_running",
+    "Calls admitted to a chunker's lane that are running",
+    ["model_id"],
+    multiprocess_mode="livesum",
+)
+SHED_REQUESTS = Counter(
+    "chunker_shed_requests",
+    "Requests rejected by admission control",
+    ["model_id", "reason"],
+)
+CACHE_LOOKUPS = Counter(
+    "chunker_cache_lookups",
+    "Result cache lookups of unary requests",
+    ["result"],
+)
+CACHE_EVICTIONS = Counter(
+    "chunker_cache_evictions",
+    "Entries removed from the result cache to make room (capacity) or on expiry (ttl)",
+    ["reason"],
+)
+LOG_RECORDS_DROPPED = Counter(
+    "chunker_log_records_dropped",
+    "Log records dropped because the log queue was full",
+)
+
+# Model id label of requests for chunkers that are not registered, so that
+# arbitrary client input does not create new label values
+UNKNOWN_MODEL = "unknown"
+# Model id label of batch and fan-out requests covering several chunkers
+MIXED_MODELS = "mixed"
+
+_queue_wait = threading.local()
+
+
+class TimedThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """
+    Thread pool recording how long submitted work waits for a thread.
+
+    The wait of the work running on a thread is available to it through
+    ``RequestStats``.
+    """
+
+    def __init__(self, *args, executor_name: str, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_seconds = QUEUE_WAIT_SECONDS.labels(executor_name)
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(self._timed, time.perf_counter(), fn, *args, **kwargs)
+
+    def _timed(self, submitted, fn, *args, **kwargs):
+        wait = time.perf_counter() - submitted
+        self._wait_seconds.observe(wait)
+        _queue_wait.seconds = wait
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _queue_wait.seconds = 0.0
+
+
+class RequestStats:
+    """
+    Measurements of one RPC, recorded as metrics when it finishes.
+
+    Time is accounted to named stages, such as ``chunk`` for chunker calls.
+    If the request metadata sets ``mm-timing``, the stage totals are returned
+    in the ``server-timing`` trailing metadata.
+
+    Args:
+        method: Short name of the RPC, used as the ``method`` label
+        metadata: Invocation metadata of the RPC
+    """
+
+    def __init__(self, method: str, metadata: Mapping[str, str]):
+        self.method = method
+        self.model_id = UNKNOWN_MODEL
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        wait = getattr(_queue_wait, "seconds", 0.0)
+        if wait:
+            self.stages["queue"] = wait
+        self.timing = metadata.get(TIMING_METADATA_KEY, "").lower() in ("1", "true")
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.chunks = 0
+        # Sent in the trailing metadata, along with the timings if asked for
+        self.trailing_metadata: List[Tuple[str, str]] = []
+        # Allocations when a stream session traced by ``SESSION_MEMORY`` started
+        self.memory_snapshot = None
+        self._chunk_seconds = None
+
+    def set_model(self, model_id: str) -> None:
+        """Label the request with the registered chunker it uses."""
+        self.model_id = model_id
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Account ``seconds`` to ``stage``."""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def chunked(self, seconds: float, model_id: Optional[str] = None) -> None:
+        """Record one chunker call, by default of the request's chunker."""
+        if model_id is None:
+            if self._chunk_seconds is None:
+                self._chunk_seconds = CHUNK_SECONDS.labels(self.method, self.model_id)
+            self._chunk_seconds.observe(seconds)
+        else:
+            CHUNK_SECONDS.labels(self.method, model_id).observe(seconds)
+        self.add("chunk", seconds)
+
+    def finish(self, context) -> None:
+        """Record the metrics of the finished RPC and send its timings if asked to."""
+        total = time.perf_counter() - self.started
+        code = context.code()
+        REQUESTS.labels(self.method, self.model_id, _code_name(code)).inc()
+        REQUEST_SECONDS.labels(self.method, self.model_id).observe(total)
+        REQUEST_BYTES.labels(self.method, self.model_id).inc(self.request_bytes)
+        RESPONSE_BYTES.labels(self.method, self.model_id).inc(self.response_bytes)
+        if code is None:
+            CHUNKS.labels(self.method, self.model_id).observe(self.chunks)
+        if SLOW_REQUESTS is not None:
+            SLOW_REQUESTS.record(self, total)
+        trailing_metadata = list(self.trailing_metadata)
+        if self.timing:
+            trailing_metadata.append((SERVER_TIMING_KEY, self.server_timing(total)))
+        if trailing_metadata:
+            context.set_trailing_metadata(tuple(trailing_metadata))
+
+    def server_timing(self, total: float) -> str:
+        """Stage durations in Server-Timing syntax, in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+def _code_name(code) -> str:
+    """Name of an RPC's status code, where None means the RPC has not failed."""
+    if code is None:
+        return grpc.StatusCode.OK.name
+    if isinstance(code, grpc.StatusCode):
+        return code.name
+    # grpc.aio reports the numeric code
+    for status in grpc.StatusCode:
+        if status.value[0] == code:
+            return status.name
+    return str(code)
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """Serve metrics for scraping, aggregated across workers if multi-process."""
+    if not port:
+        return
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(port, registry=registry)
+    logger.info("Metrics endpoint listening on port %s", port)
+
+
+def clear_multiprocess_dir() -> None:
+    """Remove metric files left behind by an earlier run."""
+    if MULTIPROC_DIR:
+        for path in Path(MULTIPROC_DIR).glob("*.db"):
+            path.unlink()
+
+
+def worker_exited(pid: int) -> None:
+    """Drop the live gauges of a worker process that exited."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,133 @@
+"""
+Chunk offsets in the units of other runtimes.
+
+Chunkers report positions in Python code points, while clients in other
+languages index text in UTF-8 bytes or UTF-16 code units. An ``OffsetIndex``
+converts positions without rescanning the text before each one.
+"""
+
+import re
+from array import array
+from typing import List, Optional
+
+# Units a request may ask for, mapped to the codec that counts them and the
+# bytes per unit; code points need no conversion
+OFFSET_UNITS = {
+    "codepoint": None,
+    "utf8": ("utf-8", 1),
+    "utf16": ("utf-16-le", 2),
+}
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+
+
+class OffsetIndex:
+    """
+    Maps code point positions in a text to positions in another unit.
+
+    Up to its first non-ASCII character, a text's positions are the same in
+    every unit, and are returned as they are; a text that is all ASCII needs
+    no index at all, see ``identity``. From that character on, the text is
+    kept in blocks of ``BLOCK`` code points, with the converted position at
+    the start of each block in an array, and a position is converted from
+    the checkpoint before it by encoding at most ``BLOCK`` characters.
+
+    Text can be added as a stream arrives, and text before a position no
+    longer asked for can be dropped, keeping the index as small as the
+    stream's buffer plus one array entry per block. Added text only joins
+    the last, incomplete block, so adding costs as much as the text added.
+
+    Args:
+        unit: ``utf8`` or ``utf16``, see ``OFFSET_UNITS``
+        text: Initial text
+    """
+
+    BLOCK = 128
+
+    def __init__(self, unit: str, text: str = ""):
+        if unit not in OFFSET_UNITS:
+            raise ValueError(
+                f"Unknown offset unit {unit!r}; expected one of {', '.join(OFFSET_UNITS)}"
+            )
+        codec = OFFSET_UNITS[unit]
+        if codec is None:
+            raise ValueError(f"Positions in {unit} units need no conversion")
+        self.unit = unit
+        self._encoding, self._width = codec
+        self._length = 0
+        # Position of the first non-ASCII character, from which blocks start
+        self._origin: Optional[int] = None
+        # Complete blocks from block ``_first_block`` on, and the text of the
+        # block after them, which is shorter than ``BLOCK``
+        self._blocks: List[str] = []
+        self._tail = ""
+        self._first_block = 0
+        # Converted position at the start of each kept block and of the tail
+        self._checkpoints = array("q")
+        self.extend(text)
+
+    @property
+    def identity(self) -> bool:
+        """Whether all text so far is ASCII, so positions need no conversion."""
+        return self._origin is None
+
+    def extend(self, text: str) -> None:
+        """Add text at the end."""
+        if not text:
+            return
+        if self._origin is None:
+            if text.isascii():
+                self._length += len(text)
+                return
+            self._origin = self._length + _NON_ASCII.search(text).start()
+            self._checkpoints.append(self._origin)
+            text = text[self._origin - self._length :]
+            self._length = self._origin
+        self._length += len(text)
+        tail = self._tail + text if self._tail else text
+        block = self.BLOCK
+        complete = len(tail) - len(tail) % block
+        if complete:
+            checkpoints, blocks = self._checkpoints, self._blocks
+            for start in range(0, complete, block):
+                piece = tail[start : start + block]
+                checkpoints.append(checkpoints[-1] + self._size(piece))
+                blocks.append(piece)
+            tail = tail[complete:]
+        self._tail = tail
+
+    def discard(self, before: int) -> None:
+        """Drop the text before position ``before``, which is no longer converted."""
+        if self._origin is None or before <= self._origin:
+            return
+        block = (min(before, self._length) - self._origin) // self.BLOCK
+        drop = block - self._first_block
+        if drop <= 0:
+            return
+        del self._blocks[:drop]
+        del self._checkpoints[:drop]
+        self._first_block = block
+
+    def convert(self, position: int) -> int:
+        """
+        Position ``position`` in code points, in this index's unit.
+
+        Raises:
+            ValueError: If the position is beyond the text or was discarded
+        """
+        origin = self._origin
+        if origin is None or position <= origin:
+            return position
+        if position > self._length:
+            raise ValueError(f"Position {position} is beyond the text of length {self._length}")
+        block, offset = divmod(position - origin, self.BLOCK)
+        index = block - self._first_block
+        if index < 0:
+            raise ValueError(f"Position {position} was discarded")
+        blocks = self._blocks
+        piece = blocks[index] if index < len(blocks) else self._tail
+        return self._checkpoints[index] + self._size(piece[:offset])
+
+    def _size(self, text: str) -> int:
+        """Length of ``text`` in this index's unit."""
+        return len(text.encode(self._encoding, "surrogatepass")) // self._width
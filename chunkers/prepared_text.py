@@ -0,0 +1,55 @@
+"""
+Input text shared by several chunkers in one request.
+"""
+
+import re
+from functools import cached_property
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_NON_SPACE = re.compile(r"\S")
+
+
+class PreparedText:
+    """
+    One input text together with data derived from it.
+
+    A fan-out request runs several chunkers over the same text. Each chunker
+    receives the same ``PreparedText`` and looks up derived data under a key
+    naming how it was derived, so whatever two chunkers have in common is
+    computed once: the bounds of the non-whitespace content, the matches of
+    a boundary pattern that sentence chunkers share (such as their ``!`` and
+    ``?`` scans) and a token chunker's tokenization.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._derived: Dict[Hashable, Any] = {}
+
+    @cached_property
+    def content_start(self) -> Optional[int]:
+        """Position of the first non-whitespace character, or None if there is none."""
+        match = _NON_SPACE.search(self.text)
+        return None if match is None else match.start()
+
+    @cached_property
+    def content_end(self) -> int:
+        """Position just past the last non-whitespace character."""
+        return len(self.text.rstrip())
+
+    @property
+    def blank(self) -> bool:
+        """Whether the text is empty or only whitespace."""
+        return self.content_start is None
+
+    def spans_of(self, pattern: "re.Pattern") -> List[Tuple[int, int]]:
+        """Start and end of every match of ``pattern``, scanned only once per pattern."""
+        return self.derive(
+            ("spans", pattern.pattern, pattern.flags),
+            lambda text: list(map(re.Match.span, pattern.finditer(text))),
+        )
+
+    def derive(self, key: Hashable, compute: Callable[[str], Any]) -> Any:
+        """Return ``compute(text)``, computed only once per ``key``."""
+        if key not in self._derived:
+            self._derived[key] = compute(self.text)
+        return self._derived[key]
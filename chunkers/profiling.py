@@ -0,0 +1,368 @@
+"""
+Diagnostics that can be switched on in a running server.
+
+- ``SIGUSR1`` takes a sampling CPU profile of all threads for
+  ``CHUNKER_PROFILE_SECONDS`` and writes it as folded stacks, which
+  flamegraph.pl, speedscope and inferno read.
+- ``SIGUSR2`` traces allocations with tracemalloc for the stream sessions
+  that start in the next ``CHUNKER_PROFILE_SECONDS``: each one's biggest
+  allocation sites are logged when it finishes, and snapshots from its start
+  and end are written for ``tracemalloc.Snapshot.load``.
+- Requests slower than ``CHUNKER_SLOW_REQUEST_MS`` are always logged and
+  written as Chrome trace events, one track per chunker, for Perfetto or
+  chrome://tracing.
+
+Files go to ``CHUNKER_PROFILE_DIR`` and are named after the process, so the
+workers of a ``--workers`` server, which the supervisor passes the signals
+on to, do not overwrite each other's.
+"""
+
+import itertools
+import json
+import logging
+import os
+import re
+import signal
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .server_logging import log_event
+
+if TYPE_CHECKING:
+    from .metrics import RequestStats
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = Path(
+    os.environ.get("CHUNKER_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "chunker-profiles"))
+)
+# Length of a profile started by a signal
+PROFILE_SECONDS = float(os.environ.get("CHUNKER_PROFILE_SECONDS", 30))
+# Milliseconds between the stack samples of a CPU profile
+SAMPLE_INTERVAL_MS = float(os.environ.get("CHUNKER_PROFILE_INTERVAL_MS", 5))
+# Stream sessions whose allocations one memory profile traces at most
+MEMORY_MAX_SESSIONS = int(os.environ.get("CHUNKER_PROFILE_MAX_SESSIONS", 20))
+# Requests that take at least this many milliseconds are traced; 0 disables tracing
+SLOW_REQUEST_MS = float(os.environ.get("CHUNKER_SLOW_REQUEST_MS", 0))
+
+# Frames kept per traced allocation
+MEMORY_FRAMES = 16
+# Allocation sites logged per stream session
+MEMORY_TOP_SITES = 10
+
+# Modules in which a thread's innermost Python frame means it is waiting
+_IDLE_MODULES = frozenset(
+    {"threading", "queue", "selectors", "concurrent.futures.thread", "socketserver"}
+)
+# Innermost frames that wait in native code, such as gRPC polling for events
+_IDLE_FRAMES = frozenset({"grpc._server:_serve"})
+# Numbered threads of one pool are merged, e.g. ``lane-sentence_0``
+_THREAD_NUMBER = re.compile(r"[-_]\d+$")
+
+
+def _output_path(kind: str, suffix: str) -> Path:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    return PROFILE_DIR / f"{kind}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}"
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of all threads at a fixed interval.
+
+    Sampling takes the GIL, so it sees pure Python chunking wherever it
+    runs, but adds some latency of its own; at the default interval of
+    5 ms this is a few percent. Threads waiting for work are left out
+    unless ``idle`` is set.
+
+    Args:
+        interval: Seconds between samples
+        idle: Whether to keep the stacks of waiting threads
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_MS / 1000, idle: bool = False):
+        self.interval = interval
+        self.idle = idle
+
+    def sample(self, seconds: float) -> Counter:
+        """
+        Sample for ``seconds``.
+
+        Returns:
+            Number of samples of each stack, as frame names from the thread
+            down to the innermost frame joined by ``;``
+        """
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        now = time.monotonic()
+        deadline = now + seconds
+        next_sample = now
+        while now < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if not self.idle and (
+                    frame.f_globals.get("__name__") in _IDLE_MODULES
+                    or _frame_name(frame) in _IDLE_FRAMES
+                ):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_name(frame))
+                    frame = frame.f_back
+                thread = _THREAD_NUMBER.sub("", names.get(ident, str(ident)))
+                frames.append(thread)
+                stacks[";".join(reversed(frames))] += 1
+            next_sample += self.interval
+            now = time.monotonic()
+            if next_sample > now:
+                time.sleep(next_sample - now)
+                now = time.monotonic()
+            else:
+                # Fell behind, e.g. while the GIL was held by a long call
+                next_sample = now
+        return stacks
+
+    def profile(self, seconds: float) -> Path:
+        """Sample for ``seconds`` and write the stacks in folded format."""
+        started = time.perf_counter()
+        stacks = self.sample(seconds)
+        path = _output_path("cpu", ".folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        log_event(
+            logger,
+            logging.INFO,
+            "CPU profile written",
+            path=str(path),
+            samples=sum(stacks.values()),
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+        )
+        return path
+
+
+class SessionMemoryProfiler:
+    """
+    Traces the allocations of stream sessions for a limited time.
+
+    Snapshots cover the whole process, so the allocations of a session
+    include those of requests running alongside it. tracemalloc slows every
+    allocation while it traces, and taking a snapshot stalls the request
+    taking it, so tracing stops once the window ends or ``max_sessions``
+    sessions were traced, and the last of them finished.
+
+    Args:
+        max_sessions: Sessions traced by one profile at most
+    """
+
+    def __init__(self, max_sessions: int = MEMORY_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # Monotonic time at which the profile ends, or None if none is running
+        self._deadline: Optional[float] = None
+        self._remaining = 0
+        self._open = 0
+        self._started_tracing = False
+        self._sessions = itertools.count(1)
+
+    def start(self, seconds: float) -> None:
+        """Trace the sessions that start in the next ``seconds``."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(MEMORY_FRAMES)
+                self._started_tracing = True
+            self._deadline = time.monotonic() + seconds
+            self._remaining = self.max_sessions
+        timer = threading.Timer(seconds, self._stop_if_done)
+        timer.daemon = True
+        timer.start()
+        logger.info("Tracing allocations of stream sessions for %s s", seconds)
+
+    def session_started(self) -> Optional[tracemalloc.Snapshot]:
+        """Snapshot of the allocations when a session starts, if it is traced."""
+        if self._deadline is None:
+            return None
+        with self._lock:
+            if self._deadline is None or self._remaining <= 0 or time.monotonic() > self._deadline:
+                return None
+            self._remaining -= 1
+            self._open += 1
+        return tracemalloc.take_snapshot()
+
+    def session_finished(self, snapshot: tracemalloc.Snapshot, stats: "RequestStats") -> None:
+        """Report the allocations of a traced session since ``snapshot``."""
+        try:
+            finished = tracemalloc.take_snapshot()
+        finally:
+            with self._lock:
+                self._open -= 1
+            self._stop_if_done()
+        threading.Thread(
+            target=self._report,
+            args=(next(self._sessions), snapshot, finished, stats.method, stats.model_id),
+            name="memory-report",
+            daemon=True,
+        ).start()
+
+    def _stop_if_done(self) -> None:
+        with self._lock:
+            if self._deadline is None or self._open:
+                return
+            if self._remaining > 0 and time.monotonic() <= self._deadline:
+                return
+            self._deadline = None
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+        logger.info("Stopped tracing allocations of stream sessions")
+
+    @staticmethod
+    def _report(number, started, finished, method, model_id) -> None:
+        own = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        started = started.filter_traces(own)
+        finished = finished.filter_traces(own)
+        growth = finished.compare_to(started, "lineno")
+        path = _output_path(f"memory-{number}", "")
+        started.dump(f"{path}-start.tracemalloc")
+        finished.dump(f"{path}-end.tracemalloc")
+        log_event(
+            logger,
+            logging.INFO,
+            "Stream allocations",
+            method=method,
+            model_id=model_id,
+            grown_kib=round(sum(stat.size_diff for stat in growth) / 1024, 1),
+            top=[
+                (str(stat.traceback[0]), round(stat.size_diff / 1024, 1), stat.count_diff)
+                for stat in growth[:MEMORY_TOP_SITES]
+            ],
+            snapshots=f"{path}-{{start,end}}.tracemalloc",
+        )
+
+
+class SlowRequestTracer:
+    """
+    Records requests that take at least ``threshold`` seconds.
+
+    Each is logged with its size and the time of each stage, and appended to
+    a trace file in the Chrome trace event format, where the events of each
+    chunker form their own track and a request's stages are laid out one
+    after another below it. The file is a JSON array left open at the end,
+    which the format allows, so events are appended as they come.
+
+    Args:
+        threshold: Seconds from which a request is slow
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._file = None
+        self._tracks: Dict[str, int] = {}
+
+    def record(self, stats: "RequestStats", total: float) -> None:
+        """Record a finished request that took ``total`` seconds, if it was slow."""
+        if total < self.threshold:
+            return
+        stages_ms = {stage: round(seconds * 1000, 3) for stage, seconds in stats.stages.items()}
+        log_event(
+            logger,
+            logging.WARNING,
+            "Slow request",
+            method=stats.method,
+            model_id=stats.model_id,
+            request_bytes=stats.request_bytes,
+            chunks=stats.chunks,
+            duration_ms=round(total * 1000, 3),
+            stages_ms=stages_ms,
+        )
+        try:
+            self._write(stats, total, stages_ms)
+        except OSError as e:
+            logger.warning("Cannot write slow request trace: %s", e)
+
+    def _write(self, stats: "RequestStats", total: float, stages_ms: Dict[str, float]) -> None:
+        pid = os.getpid()
+        start = stats.started * 1e6
+        with self._lock:
+            if self._file is None:
+                self._file = open(_output_path("slow", ".trace.json"), "w")
+                self._file.write("[\n")
+            events = []
+            track = self._tracks.get(stats.model_id)
+            if track is None:
+                track = self._tracks[stats.model_id] = len(self._tracks) + 1
+                events.append(
+                    {"name": "thread_name", "ph": "M", "pid": pid, "tid": track,
+                     "args": {"name": stats.model_id}}
+                )
+            events.append(
+                {
+                    "name": stats.method, "cat": "request", "ph": "X", "pid": pid, "tid": track,
+                    "ts": round(start, 1), "dur": round(total * 1e6, 1),
+                    "args": {
+                        "request_bytes": stats.request_bytes,
+                        "response_bytes": stats.response_bytes,
+                        "chunks": stats.chunks,
+                        "stages_ms": stages_ms,
+                    },
+                }
+            )
+            offset = start
+            for stage, seconds in stats.stages.items():
+                events.append(
+                    {"name": stage, "cat": "stage", "ph": "X", "pid": pid, "tid": track,
+                     "ts": round(offset, 1), "dur": round(seconds * 1e6, 1)}
+                )
+                offset += seconds * 1e6
+            for event in events:
+                self._file.write(json.dumps(event) + ",\n")
+            self._file.flush()
+
+
+SESSION_MEMORY = SessionMemoryProfiler()
+SLOW_REQUESTS = SlowRequestTracer(SLOW_REQUEST_MS / 1000) if SLOW_REQUEST_MS > 0 else None
+
+_cpu_profile_lock = threading.Lock()
+
+
+def profile_cpu(seconds: float = PROFILE_SECONDS) -> Optional[Path]:
+    """Take a CPU profile, unless one is running already."""
+    if not _cpu_profile_lock.acquire(blocking=False):
+        logger.warning("A CPU profile is already running")
+        return None
+    try:
+        logger.info("Taking a CPU profile for %s s", seconds)
+        return SamplingProfiler().profile(seconds)
+    finally:
+        _cpu_profile_lock.release()
+
+
+def _on_signal(signum, frame) -> None:
+    # Runs in the main thread between bytecodes, possibly while it holds a
+    # lock taken here, so the work is handed off
+    if signum == signal.SIGUSR1:
+        threading.Thread(target=profile_cpu, name="cpu-profile", daemon=True).start()
+    else:
+        threading.Thread(
+            target=SESSION_MEMORY.start, args=(PROFILE_SECONDS,), name="memory-profile", daemon=True
+        ).start()
+
+
+def install_signal_handlers() -> None:
+    """Start profiles on ``SIGUSR1`` and ``SIGUSR2``; call from the main thread."""
+    signal.signal(signal.SIGUSR1, _on_signal)
+    signal.signal(signal.SIGUSR2, _on_signal)
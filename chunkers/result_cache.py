@@ -0,0 +1,141 @@
+"""
+Content-addressed cache of serialized unary chunking responses.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Mapping, Optional
+
+import grpc
+
+from .metrics import CACHE_EVICTIONS
+
+# Rough per-entry bookkeeping cost on top of the key and value bytes
+ENTRY_OVERHEAD = 128
+
+
+class ResultCache:
+    """
+    LRU cache of serialized responses, bounded by total size and entry age.
+
+    Keys are digests of the chunker name, its effective parameters and the
+    input text, so identical requests map to the same entry regardless of
+    which client sent them. Texts shorter than ``min_chars`` bypass the cache
+    since hashing them costs about as much as chunking them. Entries removed
+    to make room or because they expired are counted by ``CACHE_EVICTIONS``.
+
+    Args:
+        max_bytes: Upper bound on the size of all cached entries
+        ttl: Seconds after which an entry expires, or None to keep entries
+            until they are evicted by size
+        min_chars: Shortest text that is cached
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None, min_chars: int = 0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.min_chars = min_chars
+        # key -> (value, expires_at)
+        self._entries: "OrderedDict[bytes, tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._evicted_capacity = CACHE_EVICTIONS.labels("capacity")
+        self._evicted_ttl = CACHE_EVICTIONS.labels("ttl")
+
+    def accepts(self, text: str) -> bool:
+        """Whether ``text`` is long enough to be cached."""
+        return len(text) >= self.min_chars
+
+    @staticmethod
+    def key(chunker_name: str, params: Mapping[str, Any], text: str) -> bytes:
+        """Digest identifying a request."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(chunker_name.encode())
+        digest.update(b"\0")
+        digest.update(repr(sorted(params.items())).encode())
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        """Return the cached value for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                self._remove(key)
+                self._evicted_ttl.inc()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: bytes) -> None:
+        """Cache ``value``, evicting least recently used entries to make room."""
+        size = len(key) + len(value) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evicted_capacity.inc()
+
+    def _remove(self, key: bytes) -> None:
+        value, _ = self._entries.pop(key)
+        self._size -= len(key) + len(value) + ENTRY_OVERHEAD
+
+
+def _passthrough(serializer):
+    """Wrap a response serializer so already serialized bytes are sent as is."""
+
+    def serialize(response):
+        if isinstance(response, bytes):
+            return response
+        return serializer(response)
+
+    return serialize
+
+
+def allow_preserialized(handler):
+    """Let a unary-unary handler return serialized response bytes."""
+    if handler is None or handler.request_streaming or handler.response_streaming:
+        return handler
+    return handler._replace(
+        response_serializer=_passthrough(handler.response_serializer)
+    )
+
+
+class PreserializedResponseInterceptor(grpc.ServerInterceptor):
+    """Interceptor that lets unary handlers return cached response bytes."""
+
+    def __init__(self):
+        self._handlers = {}
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        wrapped = self._handlers.get(handler)
+        if wrapped is None:
+            wrapped = self._handlers[handler] = allow_preserialized(handler)
+        return wrapped
+
+
+class AsyncPreserializedResponseInterceptor(grpc.aio.ServerInterceptor):
+    """Interceptor that lets unary handlers return cached response bytes."""
+
+    def __init__(self):
+        self._handlers = {}
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        wrapped = self._handlers.get(handler)
+        if wrapped is None:
+            wrapped = self._handlers[handler] = allow_preserialized(handler)
+        return wrapped
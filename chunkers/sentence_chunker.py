@@ -1,17 +1,129 @@
+import functools
+import os
 import re
-from typing import List, Tuple
+import sys
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from .base_chunker import BaseChunker
+from .incremental_chunker import IncrementalChunker
+from .prepared_text import PreparedText
+from .spans import Spans
+from .stream_session import FlushPolicy
+
+# Custom patterns arrive with requests, so their compiled form is cached here
+# rather than in the small, shared cache of the ``re`` module.
+_compile = functools.lru_cache(maxsize=128)(re.compile)
+
+# Whether requests may send their own ``pattern``: a regular expression of
+# the client's run over the text, whose cost the server cannot bound
+ALLOW_REQUEST_PATTERN = os.environ.get("CHUNKER_ALLOW_REQUEST_PATTERN", "").lower() in ("1", "true")
+
+_SPACE = re.compile(r"\s*")
+_NON_SPACE = re.compile(r"\S")
 
 
 class SentenceChunker(BaseChunker):
-    """Chunk text into sentences using regex pattern."""
+    """
+    Chunk text into sentences.
+
+    A sentence ends at a run of ``.!?`` followed by whitespace and an
+    uppercase letter, or by the end of the text. Numbers such as ``3.14``
+    are never split, as no whitespace follows their point.
+
+    The boundaries are found by one scan of the text per terminator
+    character; a pattern that starts with a single character is searched
+    much faster than one that starts with a character class such as
+    ``DEFAULT_PATTERN``. Abbreviations and ellipses are decided in the same
+    scan, by lookbehinds at the end of a run.
+
+    Args:
+        flush_policy: Default flush policy for streams using this chunker
+        name: Name under which the chunker is registered, prefixed with
+            ``sentence_``; ``None`` registers it as ``sentence``
+        abbreviations: Words, such as ``Dr`` or ``e.g``, whose trailing
+            ``.`` does not end a sentence. Matched case-sensitively.
+        split_ellipsis: Whether a run ending in ``..`` ends a sentence
+        pattern: Custom boundary regex used instead of these rules when no
+            ``pattern`` is passed to ``chunk``, see there
+    """
 
+    TERMINATORS = ".!?"
     DEFAULT_PATTERN = r"[.!?]+(?=\s+[A-Z]|$)"
 
+    def __init__(
+        self,
+        flush_policy: Optional[FlushPolicy] = None,
+        name: Optional[str] = None,
+        abbreviations: Iterable[str] = (),
+        split_ellipsis: bool = True,
+        pattern: Optional[str] = None,
+    ):
+        self._name = name
+        self.pattern = pattern if pattern and pattern != self.DEFAULT_PATTERN else None
+        if self.pattern is not None:
+            try:
+                _compile(self.pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern {self.pattern!r}: {e}")
+        self.abbreviations = tuple(sorted({word.rstrip(".") for word in abbreviations} - {""}))
+        for word in self.abbreviations:
+            # A sentence never starts inside an abbreviation, which keeps
+            # boundaries local enough for ``shard_cuts``
+            if any(map(str.isspace, word)):
+                raise ValueError(f"Abbreviation {word!r} contains whitespace")
+        self.split_ellipsis = split_ellipsis
+        self.flush_policy = flush_policy
+        self._scanners = _scanners(self.TERMINATORS, self.abbreviations, split_ellipsis)
+        self._any_terminator = re.compile(f"[{re.escape(self.TERMINATORS)}]")
+        # Characters before a terminator that the lookbehinds may inspect
+        self.lookbehind = max((len(word) + 1 for word in self.abbreviations), default=1)
+
     @property
     def name(self) -> str:
-        return "sentence"
+        return self.registered_name(self._name)
+
+    @classmethod
+    def registered_name(cls, name: Optional[str]) -> str:
+        return "sentence" if name is None else f"sentence_{name}"
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {
+            "pattern": self.pattern or self.DEFAULT_PATTERN,
+            "abbreviations": list(self.abbreviations),
+            "split_ellipsis": self.split_ellipsis,
+        }
+
+    @property
+    def request_parameters(self) -> Dict[str, Any]:
+        parameters = {"abbreviations": List[str], "split_ellipsis": bool}
+        if ALLOW_REQUEST_PATTERN:
+            parameters["pattern"] = str
+        return parameters
+
+    def request_overrides(self, params: Mapping[str, Any]) -> Dict[str, Any]:
+        if "pattern" in params and not ALLOW_REQUEST_PATTERN:
+            raise ValueError("pattern is only accepted if the server sets CHUNKER_ALLOW_REQUEST_PATTERN")
+        return super().request_overrides(params)
+
+    def configure(self, **params) -> "SentenceChunker":
+        settings = {
+            "abbreviations": self.abbreviations,
+            "split_ellipsis": self.split_ellipsis,
+            "pattern": self.pattern,
+        }
+        settings.update(params)
+        return SentenceChunker(flush_policy=self.flush_policy, name=self._name, **settings)
+
+    def incremental(self, pattern: str = None, **kwargs) -> IncrementalChunker:
+        """Create a stateful sentence chunker for streamed text."""
+        pattern = pattern or self.pattern
+        if not pattern or pattern == self.DEFAULT_PATTERN:
+            return IncrementalSentenceChunker(self, **kwargs)
+        # Custom patterns may look arbitrarily far ahead, so fall back to
+        # re-chunking the unemitted text.
+        return IncrementalChunker(self, pattern=pattern, **kwargs)
 
     def chunk(
         self, text: str, pattern: str = None, **kwargs
@@ -21,33 +133,212 @@ class SentenceChunker(BaseChunker):
 
         Args:
             text: Input text to split
-            pattern: Optional custom regex pattern
+            pattern: Optional custom regex pattern, by default the one this
+                chunker was created with; a sentence ends at the end of
+                each match. Abbreviations and ellipses are not treated
+                specially.
             **kwargs: Additional parameters (ignored)
 
         Returns:
             List of (sentence, start_pos, end_pos) tuples
         """
-        if not text.strip():
+        return self.chunk_spans(text, pattern).tuples()
+
+    def chunk_spans(self, text: str, pattern: str = None, **kwargs) -> Spans:
+        """Split text into sentences kept as offsets, see ``chunk``."""
+        pattern = pattern or self.pattern
+        if pattern and pattern != self.DEFAULT_PATTERN:
+            return _split_at(text, (match.end() for match in _compile(pattern).finditer(text)))
+
+        first = _NON_SPACE.search(text)
+        if first is None:
+            return Spans(text)
+        return _sentences(text, first.start(), len(text.rstrip()), self.boundaries(text))
+
+    def chunk_prepared(self, prepared: PreparedText, pattern: str = None, **kwargs) -> Spans:
+        """
+        Split a text into sentences, sharing scans with other sentence chunkers.
+
+        Chunkers whose terminators have the same lookbehinds, such as every
+        chunker's ``!`` and ``?``, find them in one scan of the text.
+        """
+        pattern = pattern or self.pattern
+        if prepared.blank or (pattern and pattern != self.DEFAULT_PATTERN):
+            return super().chunk_prepared(prepared, pattern=pattern)
+        boundaries = []
+        for scanner in self._scanners:
+            boundaries.extend(prepared.spans_of(scanner))
+        boundaries.sort()
+        return _sentences(
+            prepared.text, prepared.content_start, prepared.content_end, boundaries
+        )
+
+    def boundaries(self, text: str, pos: int = 0) -> List[Tuple[int, int]]:
+        """
+        Sentence boundaries in ``text`` at or after ``pos``, in order.
+
+        Returns:
+            List of (terminator, resume) tuples: the position of the last
+            character of the run of terminators that ends a sentence, and
+            where the next sentence starts, past the whitespace after it
+        """
+        boundaries = []
+        for scanner in self._scanners:
+            boundaries.extend(map(re.Match.span, scanner.finditer(text, pos)))
+        boundaries.sort()
+        return boundaries
+
+    def shard_cuts(self, text: str, shards: int) -> Optional[List[int]]:
+        """
+        Cut ``text`` at sentence starts near equally spaced positions.
+
+        A boundary only depends on the run of terminators before it, the
+        whitespace after it and the uppercase letter that starts the next
+        sentence, so the text before and after that letter chunk the same
+        on their own.
+        """
+        if self.pattern is not None:
+            # A custom pattern may look arbitrarily far around a boundary
+            return None
+        cuts = []
+        for shard in range(1, shards):
+            pos = max(len(text) * shard // shards, cuts[-1] if cuts else 0)
+            matches = [scanner.search(text, pos) for scanner in self._scanners]
+            matches = [match for match in matches if match]
+            if not matches:
+                break
+            resume = min(matches, key=re.Match.start).end()
+            if resume >= len(text):
+                break
+            if not cuts or resume > cuts[-1]:
+                cuts.append(resume)
+        return cuts
+
+
+@functools.lru_cache(maxsize=32)
+def _scanners(
+    terminators: str, abbreviations: Tuple[str, ...], split_ellipsis: bool
+) -> Tuple["re.Pattern", ...]:
+    """One compiled pattern per terminator, matching the last character of a boundary run."""
+    run_ends = f"(?![{re.escape(terminators)}])"
+    follows = r"(?:\s+(?=[A-Z])|$)"
+    by_length = defaultdict(list)
+    for word in abbreviations:
+        by_length[len(word)].append(re.escape(word))
+    # Lookbehinds must have a fixed width, so there is one per length
+    not_abbreviation = "".join(
+        rf"(?<!\b(?:{'|'.join(words)})\.)" for _, words in sorted(by_length.items())
+    )
+    scanners = []
+    for terminator in terminators:
+        lookbehinds = ""
+        if terminator == ".":
+            lookbehinds = not_abbreviation + ("" if split_ellipsis else r"(?<!\.\.)")
+        scanners.append(re.compile(re.escape(terminator) + run_ends + lookbehinds + follows))
+    return tuple(scanners)
+
+
+def _sentences(text: str, first: int, end: int, boundaries: List[Tuple[int, int]]) -> Spans:
+    """
+    Sentences of a text from its sentence boundaries.
+
+    Args:
+        first: Position of the first non-whitespace character
+        end: Position just past the last non-whitespace character
+        boundaries: (terminator, resume) tuples, see ``SentenceChunker.boundaries``
+    """
+    starts = [first]
+    starts += [resume for _, resume in boundaries]
+    ends = [terminator + 1 for terminator, _ in boundaries]
+    # After the last boundary, either the text ends or a sentence
+    # without a terminator follows
+    if end > starts[-1]:
+        ends.append(end)
+    else:
+        starts.pop()
+    return Spans(text, starts, ends)
+
+
+def _split_at(text: str, ends: Iterable[int]) -> Spans:
+    """Split text at the given positions, dropping whitespace around each piece."""
+    sentences = Spans(text)
+    last_end = 0
+    for end in [*ends, len(text)]:
+        start = _SPACE.match(text, last_end, end).end()
+        stop = end
+        while stop > start and text[stop - 1].isspace():
+            stop -= 1
+        if stop > start:
+            sentences.append(start, stop)
+        last_end = end
+    return sentences
+
+
+class IncrementalSentenceChunker(IncrementalChunker):
+    """
+    Incremental chunker for the boundaries of a ``SentenceChunker``.
+
+    A boundary is decided by the first non-whitespace character after a run
+    of ``.!?``, so only a trailing run of terminators and whitespace can
+    still change as text arrives. Each feed scans that trailing run plus the
+    new text; everything before it is never rescanned, except for the few
+    characters the abbreviation and ellipsis lookbehinds inspect.
+    """
+
+    def __init__(self, chunker: SentenceChunker, **kwargs):
+        super().__init__(chunker, **kwargs)
+        self._window = ""
+        self._window_start = 0
+        # Position in the window from which the next scan starts; the
+        # characters before it are context for the lookbehinds
+        self._scan_from = 0
+
+    def _complete_chunks(self, text: str) -> List[Tuple[str, int, int]]:
+        chunker = self._chunker
+        window = self._window + text
+        window_start = self._window_start
+        scan_from = self._scan_from
+
+        stripped = window.rstrip()
+        if stripped and stripped[-1] in chunker.TERMINATORS:
+            unsettled = max(len(stripped.rstrip(chunker.TERMINATORS)), scan_from)
+        else:
+            unsettled = len(window)
+
+        # Boundaries before the unsettled tail are followed by an uppercase
+        # letter, so each one closes a sentence with text after it. Most
+        # feeds add no terminator, and are checked for one in a single search.
+        boundaries = []
+        if chunker._any_terminator.search(window, scan_from, unsettled):
+            boundaries = [
+                (window_start + terminator + 1, window_start + resume)
+                for terminator, resume in chunker.boundaries(window, scan_from)
+                if terminator < unsettled
+            ]
+
+        keep = max(unsettled - chunker.lookbehind, 0)
+        self._window = window[keep:]
+        self._window_start = window_start + keep
+        self._scan_from = unsettled - keep
+        if not boundaries:
             return []
 
-        regex = re.compile(pattern or self.DEFAULT_PATTERN)
-        sentences = []
-        last_end = 0
-        for match in regex.finditer(text):
-            raw_sentence = text[last_end : match.end()]
-            stripped = raw_sentence.strip()
-            if stripped:
-                leading_spaces = len(raw_sentence) - len(raw_sentence.lstrip())
-                start_pos = last_end + leading_spaces
-                end_pos = start_pos + len(stripped)
-                sentences.append((stripped, start_pos, end_pos))
-            last_end = match.end()
-        if last_end < len(text):
-            raw_sentence = text[last_end:]
-            stripped = raw_sentence.strip()
-            if stripped:
-                leading_spaces = len(raw_sentence) - len(raw_sentence.lstrip())
-                start_pos = last_end + leading_spaces
-                end_pos = start_pos + len(stripped)
-                sentences.append((stripped, start_pos, end_pos))
-        return sentences or [(text.strip(), 0, len(text))] if text.strip() else []
+        buffer = self._buffer()
+        base = self._base
+        start = base + _SPACE.match(buffer).end()
+        chunks = []
+        for end, resume in boundaries:
+            chunks.append((buffer[start - base : end - base], start, end))
+            start = resume
+        return chunks
+
+    def memory_usage(self) -> int:
+        return super().memory_usage() + sys.getsizeof(self._window)
+
+    def _consume(self, end: int) -> None:
+        super()._consume(end)
+        if self._window_start < end:
+            cut = end - self._window_start
+            self._window = self._window[cut:]
+            self._window_start = end
+            self._scan_from = max(self._scan_from - cut, 0)
@@ -0,0 +1,155 @@
+"""
+Logging setup for the server.
+
+Request threads only put log records on a bounded queue. A listener thread
+formats and writes them, so a slow log sink never stalls chunking, and when
+the queue is full records are dropped rather than waited for. Each RPC logs
+one summary record with its figures as structured fields; detailed
+per-message traces are logged only for a sampled fraction of requests.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Optional
+
+LOG_LEVEL = os.environ.get("CHUNKER_LOG_LEVEL", "INFO").upper()
+# "text" or "json"
+LOG_FORMAT = os.environ.get("CHUNKER_LOG_FORMAT", "text")
+# Records waiting to be written beyond this many are dropped
+LOG_QUEUE_SIZE = int(os.environ.get("CHUNKER_LOG_QUEUE_SIZE", 10000))
+# Fraction of requests whose detailed trace is logged
+TRACE_SAMPLE_RATE = float(os.environ.get("CHUNKER_LOG_TRACE_SAMPLE_RATE", 0))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Detailed traces of sampled requests
+trace_logger = logging.getLogger("chunkers.trace")
+
+# Identifies the records of one request in sampled traces
+_request_ids = itertools.count(1)
+
+_handler: Optional["NonBlockingQueueHandler"] = None
+_listener: Optional[QueueListener] = None
+
+
+class TextFormatter(logging.Formatter):
+    """Formats a record's structured fields as ``key=value`` after the message."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the logging thread.
+
+    Unlike ``QueueHandler``, records are queued unformatted, so message
+    arguments are formatted on the listener thread; they must not be mutated
+    after they are logged. Records that do not fit in the queue are dropped,
+    calling ``on_drop`` for each.
+    """
+
+    def __init__(self, maxsize: int, on_drop: Optional[Callable[[], None]] = None):
+        super().__init__(queue.Queue(maxsize))
+        self._on_drop = on_drop
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self._on_drop is not None:
+                self._on_drop()
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """Log ``event`` with structured ``fields`` if ``level`` is enabled."""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields})
+
+
+def next_request_id() -> int:
+    """Process-unique id of a new request."""
+    return next(_request_ids)
+
+
+def sample_trace() -> bool:
+    """Whether to log a detailed trace of a new request."""
+    return (
+        TRACE_SAMPLE_RATE > 0
+        and random.random() < TRACE_SAMPLE_RATE
+        and trace_logger.isEnabledFor(logging.DEBUG)
+    )
+
+
+def configure_logging(on_drop: Optional[Callable[[], None]] = None) -> None:
+    """
+    Send all records through the queue to a listener writing to stderr.
+
+    Args:
+        on_drop: Called for each record dropped because the queue was full
+    """
+    global _handler, _listener
+    if _handler is not None:
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
+
+    _handler = NonBlockingQueueHandler(LOG_QUEUE_SIZE, on_drop)
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    if TRACE_SAMPLE_RATE > 0:
+        trace_logger.setLevel(logging.DEBUG)
+
+    _listener = QueueListener(_handler.queue, stream)
+    _listener.start()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _stop_listener() -> None:
+    """Write out queued records before the process exits."""
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass
+
+
+def _restart_listener() -> None:
+    """Give a forked child its own queue and listener thread."""
+    global _listener
+    # The parent's listener thread does not exist in the child, and its
+    # queue may have been copied while locked.
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = QueueListener(_handler.queue, *_listener.handlers)
+    _listener.start()
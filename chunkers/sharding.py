@@ -0,0 +1,152 @@
+"""
+Chunking of very large texts in shards on a process pool.
+"""
+
+import logging
+import multiprocessing
+import threading
+from array import array
+from concurrent import futures
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .spans import Spans
+
+if TYPE_CHECKING:
+    from .base_chunker import BaseChunker
+
+logger = logging.getLogger(__name__)
+
+# Fixed-width encodings by bytes per character. A text is shared in the
+# narrowest one that holds all its characters, so character offsets map to
+# byte offsets by a multiplication.
+_CODECS = {1: "latin-1", 2: "utf-16-le", 4: "utf-32-le"}
+
+# (starts, ends, texts) of one shard's chunks, with absolute offsets and
+# texts keyed by the chunk's index within the shard
+ShardResult = Tuple[array, array, Dict[int, str]]
+
+
+def _encode_fixed_width(text: str) -> Tuple[bytes, int]:
+    """Encode ``text`` in the narrowest fixed-width encoding, returning the bytes and the width."""
+    try:
+        return text.encode(_CODECS[1]), 1
+    except UnicodeEncodeError:
+        pass
+    data = text.encode(_CODECS[2], "surrogatepass")
+    if len(data) == 2 * len(text):
+        return data, 2
+    # Characters outside the BMP take two UTF-16 code units
+    return text.encode(_CODECS[4], "surrogatepass"), 4
+
+
+def chunk_shard(
+    model_id: str, params: Dict[str, Any], name: str, width: int, start: int, end: int
+) -> ShardResult:
+    """
+    Chunk characters ``start`` to ``end`` of a text in shared memory.
+
+    Runs in pool workers, which build their own registry on import and
+    configure the chunker there with the same request ``params``.
+    """
+    from . import get_chunker_registry
+
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        with memory.buf[start * width : end * width] as view:
+            text = str(view, _CODECS[width], "surrogatepass")
+    finally:
+        memory.close()
+    spans = get_chunker_registry().get(model_id, params).chunk_spans(text)
+    return (
+        array("q", map(start.__add__, spans.starts)),
+        array("q", map(start.__add__, spans.ends)),
+        spans._texts,
+    )
+
+
+class ShardExecutor:
+    """
+    Chunks very large texts in shards on a process pool.
+
+    A text of at least ``min_chars`` characters is cut where its chunker
+    says the pieces chunk independently (see ``BaseChunker.shard_cuts``),
+    one shard per worker. The text is placed in shared memory once, and
+    each worker decodes only its own shard from there, instead of receiving
+    a pickled copy. The shards' chunk offsets are shifted back by the
+    workers and joined in order, which gives exactly the chunks of the
+    whole text. Shorter texts, and texts whose chunker cannot be sharded,
+    are chunked in the calling thread.
+
+    As for batches, the pool is started on first use with the ``spawn``
+    method.
+
+    Args:
+        workers: Number of pool processes; 0 or 1 never shards
+        min_chars: Shortest text that is sharded
+    """
+
+    def __init__(self, workers: int = 0, min_chars: int = 1024 * 1024):
+        self._workers = workers
+        self._min_chars = min_chars
+        self._pool: Optional[futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"Starting shard pool with {self._workers} processes")
+                self._pool = futures.ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def run(self, chunker: "BaseChunker", text: str) -> Spans:
+        """Chunk ``text``, in shards if it is large enough and ``chunker`` supports it."""
+        if self._workers <= 1 or len(text) < self._min_chars:
+            return chunker.chunk_spans(text)
+        cuts = chunker.shard_cuts(text, self._workers)
+        if not cuts:
+            return chunker.chunk_spans(text)
+
+        data, width = _encode_fixed_width(text)
+        try:
+            memory = shared_memory.SharedMemory(create=True, size=len(data))
+        except OSError as e:
+            logger.warning("Chunking serially, shared memory unavailable: %s", e)
+            return chunker.chunk_spans(text)
+        try:
+            memory.buf[: len(data)] = data
+            del data
+            pool = self._get_pool()
+            # Workers look the chunker up by name, so one configured with
+            # request parameters is described by them
+            current = chunker.params
+            params = {key: current[key] for key in chunker.request_parameters if key in current}
+            bounds = zip([0, *cuts], [*cuts, len(text)])
+            shards = [
+                pool.submit(chunk_shard, chunker.name, params, memory.name, width, start, end)
+                for start, end in bounds
+            ]
+            spans = Spans(text)
+            for shard in shards:
+                spans.extend(*shard.result())
+            return spans
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def restart(self) -> None:
+        """Start a new pool on next use, see ``BatchExecutor.restart``."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            logger.info("Restarting shard pool")
+            pool.shutdown(wait=False)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,104 @@
+"""
+Chunks represented by their offsets into the chunked text.
+"""
+
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+
+class Spans(Sequence):
+    """
+    The chunks of one text, kept as start and end offsets into it.
+
+    Offsets are stored in two arrays of machine integers, and a chunk's text
+    is only sliced from the chunked text when the chunk is read, usually
+    while the response is built. Indexing or iterating a ``Spans`` yields
+    the same ``(chunk_text, start_pos, end_pos)`` tuples that
+    ``BaseChunker.chunk`` returns, so it can be read wherever a list of them
+    is expected; slicing returns such a list.
+
+    A chunk whose text is not the slice between its offsets, as some
+    splitters strip or join text, keeps its own text.
+
+    Args:
+        text: The chunked text
+        starts: Start offset of each chunk
+        ends: End offset of each chunk
+    """
+
+    def __init__(self, text: str, starts: Iterable[int] = (), ends: Iterable[int] = ()):
+        self.text = text
+        self.starts = array("q", starts)
+        self.ends = array("q", ends)
+        if len(self.starts) != len(self.ends):
+            raise ValueError(f"{len(self.starts)} starts but {len(self.ends)} ends")
+        # Chunk index -> text, for chunks that are not a slice of ``text``
+        self._texts: Dict[int, str] = {}
+
+    @classmethod
+    def from_chunks(cls, text: str, chunks: Iterable[Tuple[str, int, int]]) -> "Spans":
+        """Build spans from ``(chunk_text, start_pos, end_pos)`` tuples of ``text``."""
+        spans = cls(text)
+        for chunk, start, end in chunks:
+            spans.append(start, end, chunk)
+        return spans
+
+    def append(self, start: int, end: int, chunk: str = None) -> None:
+        """Add a chunk, with its text if that may differ from ``text[start:end]``."""
+        if chunk is not None:
+            if len(chunk) != end - start or not self.text.startswith(chunk, start):
+                self._texts[len(self.starts)] = chunk
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(
+        self, starts: Iterable[int], ends: Iterable[int], texts: Dict[int, str] = None
+    ) -> None:
+        """
+        Add chunks by their offsets, after the existing ones.
+
+        Args:
+            starts: Start offset of each added chunk
+            ends: End offset of each added chunk
+            texts: Own texts of added chunks, keyed by index among the added ones
+        """
+        offset = len(self.starts)
+        self.starts.extend(starts)
+        self.ends.extend(ends)
+        if len(self.starts) != len(self.ends):
+            raise ValueError(f"{len(self.starts)} starts but {len(self.ends)} ends")
+        for index, chunk in (texts or {}).items():
+            self._texts[offset + index] = chunk
+
+    def offsets(self) -> Iterator[Tuple[int, int]]:
+        """(start_pos, end_pos) of each chunk, without slicing any text."""
+        return zip(self.starts, self.ends)
+
+    def tuples(self) -> List[Tuple[str, int, int]]:
+        """The chunks as a list of ``(chunk_text, start_pos, end_pos)`` tuples."""
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(len(self))[index]]
+        start, end = self.starts[index], self.ends[index]
+        chunk = self._texts.get(index % len(self))
+        return (self.text[start:end] if chunk is None else chunk), start, end
+
+    def __iter__(self) -> Iterator[Tuple[str, int, int]]:
+        if self._texts:
+            return (self[index] for index in range(len(self)))
+        text = self.text
+        return zip(map(text.__getitem__, map(slice, self.starts, self.ends)), self.starts, self.ends)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Spans, list, tuple)):
+            return self.tuples() == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Spans({self.tuples()!r})"
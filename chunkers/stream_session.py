@@ -0,0 +1,474 @@
+"""
+Per-stream state for the streaming RPCs.
+"""
+
+import bisect
+import codecs
+import sys
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .base_chunker import BaseChunker
+from .offset_index import OffsetIndex
+
+# (chunk_text, start_pos, end_pos, input_start_index, input_end_index)
+StreamChunk = Tuple[str, int, int, int, int]
+
+
+class FlushPolicy:
+    """
+    Limits on how long text may wait for a chunk boundary in a stream.
+
+    When any limit is reached, everything buffered is emitted, including an
+    incomplete last chunk.
+
+    Args:
+        max_chars: Flush once more than this many characters are buffered
+        max_messages: Flush once this many messages arrived since the last emission
+        max_wait: Flush once buffered text has waited this many seconds
+    """
+
+    METADATA_KEYS = {
+        "max_chars": "mm-flush-max-chars",
+        "max_messages": "mm-flush-max-messages",
+        "max_wait_ms": "mm-flush-max-wait-ms",
+    }
+
+    def __init__(
+        self,
+        max_chars: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        max_wait: Optional[float] = None,
+    ):
+        for name, value in (
+            ("max_chars", max_chars),
+            ("max_messages", max_messages),
+            ("max_wait", max_wait),
+        ):
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be positive, got {value}")
+        self.max_chars = max_chars
+        self.max_messages = max_messages
+        self.max_wait = max_wait
+
+    def __repr__(self) -> str:
+        return (
+            f"FlushPolicy(max_chars={self.max_chars}, "
+            f"max_messages={self.max_messages}, max_wait={self.max_wait})"
+        )
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["FlushPolicy"]:
+        """Create a policy from a ``flush`` block in chunker_config.yaml."""
+        if not config:
+            return None
+        unknown = set(config) - set(cls.METADATA_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown flush settings: {sorted(unknown)}")
+        max_wait_ms = config.get("max_wait_ms")
+        return cls(
+            max_chars=config.get("max_chars"),
+            max_messages=config.get("max_messages"),
+            max_wait=max_wait_ms / 1000 if max_wait_ms is not None else None,
+        )
+
+    @classmethod
+    def from_metadata(
+        cls, metadata: Mapping[str, str], default: Optional["FlushPolicy"] = None
+    ) -> Optional["FlushPolicy"]:
+        """
+        Apply per-request ``mm-flush-*`` metadata on top of a default policy.
+
+        Raises:
+            ValueError: If a value is not a positive integer
+        """
+        overrides = {}
+        for name, key in cls.METADATA_KEYS.items():
+            if key in metadata:
+                try:
+                    overrides[name] = int(metadata[key])
+                except ValueError:
+                    raise ValueError(f"{key} must be an integer, got {metadata[key]!r}")
+        if not overrides:
+            return default
+
+        config = {}
+        if default is not None:
+            config = {
+                "max_chars": default.max_chars,
+                "max_messages": default.max_messages,
+                "max_wait_ms": default.max_wait * 1000 if default.max_wait else None,
+            }
+        config.update(overrides)
+        return cls.from_config(config)
+
+
+class StreamSession:
+    """
+    Chunks one stream of text messages in bounded memory.
+
+    Only text that has not been emitted is kept, as the tail of an
+    ``IncrementalChunker`` whose positions stay absolute from the start of the
+    stream. Input indices are tracked as the range of messages since the last
+    emission rather than as a list of every index seen.
+
+    If ``max_buffered`` is set and more than that many characters are waiting
+    for a boundary, the buffer is flushed as chunks right away. A
+    ``flush_policy`` flushes earlier, to bound latency rather than memory.
+
+    With an ``offset_index``, chunk positions are returned in its unit
+    instead of in code points.
+    """
+
+    def __init__(
+        self,
+        chunker: BaseChunker,
+        max_buffered: Optional[int] = None,
+        flush_policy: Optional[FlushPolicy] = None,
+        offset_index: Optional[OffsetIndex] = None,
+        **kwargs,
+    ):
+        self._stream = chunker.incremental(**kwargs)
+        self._max_buffered = max_buffered
+        self._policy = flush_policy
+        self._offsets = offset_index
+        # Input indices of the first message since the last emission, of the
+        # message before the latest one and of the latest one
+        self._range_start: Optional[int] = None
+        self._previous_index: Optional[int] = None
+        self._last_index: Optional[int] = None
+        # Raw messages received before the first chunk is emitted. Used to
+        # extend the first chunk back to position 0 and to echo
+        # whitespace-only streams; dropped after the first emission.
+        self._head_texts: Optional[List[str]] = []
+        self._head_size = 0
+        # When the oldest text still buffered arrived, and how many messages
+        # arrived since the last emission
+        self._pending_since: Optional[float] = None
+        self._pending_messages = 0
+        self.messages = 0
+        self.chunks = 0
+        self.forced_flushes = 0
+        self.policy_flushes = 0
+        self.peak_buffered = 0
+        self.peak_memory = 0
+
+    @property
+    def flush_policy(self) -> Optional[FlushPolicy]:
+        """The flush policy in effect for this stream."""
+        return self._policy
+
+    @property
+    def buffered(self) -> int:
+        """Number of characters received but not yet emitted."""
+        return self._stream.buffered
+
+    @property
+    def processed(self) -> int:
+        """Total number of characters received."""
+        return self._stream.end
+
+    def memory_usage(self) -> int:
+        """Approximate size in bytes of the text held by this session."""
+        size = self._stream.memory_usage()
+        if self._head_texts is not None:
+            size += self._head_size
+        return size
+
+    def deadline(self) -> Optional[float]:
+        """Monotonic time at which buffered text must be flushed, if any."""
+        if self._policy is None or self._policy.max_wait is None:
+            return None
+        if self._pending_since is None:
+            return None
+        return self._pending_since + self._policy.max_wait
+
+    def feed(
+        self, text: str, input_index: int = -1, now: Optional[float] = None
+    ) -> List[StreamChunk]:
+        """
+        Add one stream message.
+
+        Args:
+            text: Message text
+            input_index: Input index of the message, or -1 if it has none
+            now: Current ``time.monotonic()`` value, looked up if not given
+
+        Returns:
+            List of StreamChunk tuples completed by this message
+        """
+        now = time.monotonic() if now is None else now
+        self.messages += 1
+        self._pending_messages += 1
+        if self._head_texts is not None:
+            self._head_texts.append(text)
+            self._head_size += sys.getsizeof(text)
+        if input_index != -1:
+            self._previous_index = self._last_index
+            self._last_index = input_index
+            if self._range_start is None:
+                self._range_start = input_index
+        if self._pending_since is None and text:
+            self._pending_since = now
+        if self._offsets is not None:
+            self._offsets.extend(text)
+
+        chunks = self._stream.feed(text)
+        self.peak_buffered = max(self.peak_buffered, self._stream.buffered)
+        self.peak_memory = max(self.peak_memory, self.memory_usage())
+        # Chunks completed by a message without an index end in the
+        # messages up to the latest indexed one
+        input_end = self._previous_index if input_index != -1 else self._last_index
+        results = self._results(chunks, input_end, now)
+
+        if self._max_buffered is not None and self._stream.buffered > self._max_buffered:
+            self.forced_flushes += 1
+            results += self._flush(now, discard=True)
+        elif self._policy_due(now):
+            self.policy_flushes += 1
+            results += self._flush(now)
+        return self._in_units(results)
+
+    def poll(self, now: Optional[float] = None) -> List[StreamChunk]:
+        """Flush buffered text if the flush policy's wait limit has passed."""
+        now = time.monotonic() if now is None else now
+        deadline = self.deadline()
+        if deadline is None or now < deadline:
+            return []
+        self.policy_flushes += 1
+        return self._in_units(self._flush(now))
+
+    def finalize(self) -> List[StreamChunk]:
+        """Emit everything still buffered at the end of the stream."""
+        chunks = self._stream.finalize()
+        input_start = self._range_start or 0
+        input_end = self._last_index or 0
+
+        if not chunks and self._head_texts is not None:
+            return self._in_units(self._echo_head(input_start, input_end))
+
+        results = []
+        for text, start, end in chunks:
+            text, start = self._extend_first(text, start, end)
+            results.append((text, start, end, input_start, input_end))
+        self.chunks += len(results)
+        return self._in_units(results)
+
+    def _policy_due(self, now: float) -> bool:
+        """Whether the flush policy requires flushing now."""
+        policy = self._policy
+        if policy is None or not self._stream.buffered:
+            return False
+        if policy.max_chars is not None and self._stream.buffered > policy.max_chars:
+            return True
+        if policy.max_messages is not None and self._pending_messages >= policy.max_messages:
+            return True
+        deadline = self.deadline()
+        return deadline is not None and now >= deadline
+
+    def _flush(self, now: float, discard: bool = False) -> List[StreamChunk]:
+        """
+        Emit everything buffered, including an incomplete last chunk.
+
+        The emitted text covers all messages received so far, so the input
+        range ends at the latest message.
+        """
+        chunks = self._stream.flush()
+        if not chunks:
+            # Only whitespace is buffered, so there is nothing to chunk
+            self._pending_since = None
+            self._pending_messages = 0
+            if discard:
+                self._stream.discard()
+                if self._head_texts is not None:
+                    return self._echo_head(self._range_start, self._last_index)
+            return []
+
+        results = self._results(chunks, self._last_index, now)
+        self._range_start = None
+        return results
+
+    def _results(
+        self, chunks: List[Tuple[str, int, int]], input_end: Optional[int], now: float
+    ) -> List[StreamChunk]:
+        """
+        Attach input index ranges to newly emitted chunks.
+
+        A range never ends before it starts, such as for a chunk that a
+        message both starts and completes.
+        """
+        results = []
+        for text, start, end in chunks:
+            text, start = self._extend_first(text, start, end)
+            input_start = self._range_start or 0
+            results.append((text, start, end, input_start, max(input_end or 0, input_start)))
+            self._range_start = self._last_index
+        if results:
+            self.chunks += len(results)
+            self._pending_since = now if self._stream.buffered else None
+            self._pending_messages = 0
+        return results
+
+    def _in_units(self, results: List[StreamChunk]) -> List[StreamChunk]:
+        """Convert the positions of emitted chunks to the offset index's unit."""
+        index = self._offsets
+        if index is None:
+            return results
+        if not index.identity:
+            convert = index.convert
+            results = [
+                (text, convert(start), convert(end), input_start, input_end)
+                for text, start, end, input_start, input_end in results
+            ]
+        # Later chunks start at the buffer, or at 0 while the first one may
+        # still be extended back over leading whitespace
+        index.discard(0 if self._head_texts is not None else self._stream.base)
+        return results
+
+    def _extend_first(self, text: str, start: int, end: int) -> Tuple[str, int]:
+        """Give the first emitted chunk any leading whitespace."""
+        if self._head_texts is not None:
+            if start != 0:
+                text = "".join(self._head_texts)[:end]
+                start = 0
+            self._head_texts = None
+        return text, start
+
+    def _echo_head(
+        self, input_start: Optional[int], input_end: Optional[int]
+    ) -> List[StreamChunk]:
+        """Return the raw messages received so far as chunks."""
+        results = []
+        start = 0
+        for text in self._head_texts:
+            end = start + len(text)
+            results.append((text, start, end, input_start or 0, input_end or 0))
+            start = end
+        self._head_texts = None
+        self.chunks += len(results)
+        return results
+
+
+class UploadSession:
+    """
+    Chunks one document uploaded as a stream of segments.
+
+    The chunks are those a unary request for the whole document would
+    return: there is no flush policy, and no chunk is extended to cover
+    leading whitespace. Only if more than ``max_buffered`` characters wait
+    for a boundary is the buffer emitted early, as in a ``StreamSession``.
+
+    Segments are text or UTF-8 bytes, and a character may be split across
+    byte segments. Segments are numbered from 0 in the order they arrive,
+    and each chunk's input range is the segments its text came from. With
+    an ``offset_index``, chunk positions are in its unit.
+    """
+
+    flush_policy = None
+    policy_flushes = 0
+
+    def __init__(
+        self,
+        chunker: BaseChunker,
+        max_buffered: Optional[int] = None,
+        offset_index: Optional[OffsetIndex] = None,
+    ):
+        self._stream = chunker.incremental()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._max_buffered = max_buffered
+        self._offsets = offset_index
+        # Absolute end positions of the segments that still have text
+        # buffered, and the number of the first of them
+        self._segment_ends: List[int] = []
+        self._first_segment = 0
+        self.messages = 0
+        self.chunks = 0
+        self.forced_flushes = 0
+        self.peak_buffered = 0
+        self.peak_memory = 0
+
+    @property
+    def buffered(self) -> int:
+        """Number of characters received but not yet emitted."""
+        return self._stream.buffered
+
+    @property
+    def processed(self) -> int:
+        """Total number of characters received."""
+        return self._stream.end
+
+    def memory_usage(self) -> int:
+        """Approximate size in bytes of the text held by this session."""
+        return self._stream.memory_usage()
+
+    def feed(self, text: str = "", data: bytes = b"") -> List[StreamChunk]:
+        """
+        Add one segment, given either as ``text`` or as UTF-8 ``data``.
+
+        Returns:
+            List of StreamChunk tuples completed by this segment
+
+        Raises:
+            ValueError: If ``data`` is not valid UTF-8, or ``text`` follows
+                bytes that ended inside a character
+        """
+        if text:
+            self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(data)
+        self.messages += 1
+        self._segment_ends.append(self._stream.end + len(text))
+        if self._offsets is not None:
+            self._offsets.extend(text)
+
+        chunks = self._stream.feed(text)
+        self.peak_buffered = max(self.peak_buffered, self._stream.buffered)
+        self.peak_memory = max(self.peak_memory, self.memory_usage())
+        if self._max_buffered is not None and self._stream.buffered > self._max_buffered:
+            self.forced_flushes += 1
+            flushed = self._stream.flush()
+            if not flushed:
+                # Only whitespace is buffered, so there is nothing to chunk
+                self._stream.discard()
+            chunks += flushed
+        return self._results(chunks)
+
+    def finalize(self) -> List[StreamChunk]:
+        """
+        Emit everything still buffered at the end of the upload.
+
+        Raises:
+            ValueError: If the last bytes received ended inside a character
+        """
+        self._decoder.decode(b"", final=True)
+        return self._results(self._stream.finalize())
+
+    def _results(self, chunks: List[Tuple[str, int, int]]) -> List[StreamChunk]:
+        """Attach the segments they came from to newly emitted chunks."""
+        ends = self._segment_ends
+        first = self._first_segment
+        results = [
+            (
+                text,
+                start,
+                end,
+                first + bisect.bisect_right(ends, start),
+                first + bisect.bisect_left(ends, end),
+            )
+            for text, start, end in chunks
+        ]
+        self.chunks += len(results)
+        # Forget the segments that were emitted entirely
+        emitted = bisect.bisect_right(ends, self._stream.base)
+        del ends[:emitted]
+        self._first_segment += emitted
+        index = self._offsets
+        if index is not None:
+            if not index.identity:
+                convert = index.convert
+                results = [
+                    (text, convert(start), convert(end), input_start, input_end)
+                    for text, start, end, input_start, input_end in results
+                ]
+            index.discard(self._stream.base)
+        return results
@@ -0,0 +1,300 @@
+"""
+Chunking into windows of a fixed number of tiktoken tokens.
+"""
+
+import functools
+import os
+import re
+import sys
+import threading
+from bisect import bisect_left
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import tiktoken
+
+from .base_chunker import BaseChunker
+from .incremental_chunker import IncrementalChunker
+from .prepared_text import PreparedText
+from .spans import Spans
+from .stream_session import FlushPolicy
+
+# Encoding files shipped with the service. tiktoken looks encodings up in
+# this directory before downloading them, so a directory filled at build
+# time lets encodings load without network access. A TIKTOKEN_CACHE_DIR set
+# in the environment is used instead.
+ENCODINGS_DIR = Path(__file__).parent / "encodings"
+CACHE_DIR_VARIABLE = "TIKTOKEN_CACHE_DIR"
+# Held while an encoding loads with CACHE_DIR_VARIABLE set by ``get_encoding``
+_load_lock = threading.Lock()
+
+# UTF-8 continuation bytes, which do not start a character
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+_NON_SPACE = re.compile(r"\S")
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(name: str, cache_dir: Path = ENCODINGS_DIR) -> tiktoken.Encoding:
+    """
+    Load a tiktoken encoding once per process, looking it up in ``cache_dir`` first.
+
+    tiktoken only takes its cache directory from the environment, so unless
+    ``TIKTOKEN_CACHE_DIR`` is set, it is set to ``cache_dir`` while the
+    encoding loads and removed again.
+    """
+    with _load_lock:
+        if CACHE_DIR_VARIABLE in os.environ:
+            return tiktoken.get_encoding(name)
+        os.environ[CACHE_DIR_VARIABLE] = str(cache_dir)
+        try:
+            return tiktoken.get_encoding(name)
+        finally:
+            del os.environ[CACHE_DIR_VARIABLE]
+
+
+class TokenChunker(BaseChunker):
+    """
+    Chunk text into windows of at most ``chunk_size`` tokens.
+
+    Consecutive windows share ``chunk_overlap`` tokens. Chunk positions are
+    character offsets into the input; a character whose UTF-8 bytes are
+    split across tokens belongs to the token holding its first byte.
+
+    Args:
+        name: Name under which the chunker is registered, prefixed with ``tiktoken_``
+        encoding: tiktoken encoding name
+        chunk_size: Maximum number of tokens per chunk
+        chunk_overlap: Number of tokens shared by consecutive chunks
+        flush_policy: Default flush policy for streams using this chunker
+    """
+
+    def __init__(
+        self,
+        name: str,
+        encoding: str = "cl100k_base",
+        chunk_size: int = 512,
+        chunk_overlap: int = 0,
+        flush_policy: Optional[FlushPolicy] = None,
+    ):
+        if chunk_size <= 0:
+            raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError(
+                f"chunk_overlap must be at least 0 and less than chunk_size, got {chunk_overlap}"
+            )
+        self._name = name
+        self._encoding_name = encoding
+        self._encoding = get_encoding(encoding)
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.flush_policy = flush_policy
+
+    @property
+    def name(self) -> str:
+        return self.registered_name(self._name)
+
+    @classmethod
+    def registered_name(cls, name: Optional[str]) -> str:
+        return f"tiktoken_{name}"
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return {
+            "encoding": self._encoding_name,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+    @property
+    def request_parameters(self) -> Dict[str, Any]:
+        # Other encodings may not be available offline
+        return {"chunk_size": int, "chunk_overlap": int}
+
+    def configure(self, **params) -> "TokenChunker":
+        settings = {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+        settings.update(params)
+        return TokenChunker(
+            name=self._name,
+            encoding=self._encoding_name,
+            flush_policy=self.flush_policy,
+            **settings,
+        )
+
+    def incremental(self, **kwargs) -> IncrementalChunker:
+        """Create a stateful chunker for streamed text."""
+        return IncrementalTokenChunker(self, **kwargs)
+
+    def chunk(self, text: str, **kwargs) -> List[Tuple[str, int, int]]:
+        """Split text into token windows."""
+        return self.chunk_spans(text).tuples()
+
+    def chunk_spans(self, text: str, **kwargs) -> Spans:
+        """Split text into token windows kept as offsets."""
+        if not text.strip():
+            return Spans(text)
+        return self.window_spans(text, self._encode_offsets(text))
+
+    def chunk_prepared(self, prepared: PreparedText, **kwargs) -> Spans:
+        """Split a shared text, encoding it once for all chunkers with this encoding."""
+        if prepared.blank:
+            return Spans(prepared.text)
+        offsets = prepared.derive(("tiktoken", self._encoding_name), self._encode_offsets)
+        return self.window_spans(prepared.text, offsets)
+
+    def chunk_batch(self, texts: Sequence[str], **kwargs) -> List[Spans]:
+        """Split several texts, encoding them together on tiktoken's thread pool."""
+        batch = self._encoding.encode_ordinary_batch(list(texts))
+        return [
+            self.window_spans(text, self.token_offsets(text, tokens))
+            if text.strip()
+            else Spans(text)
+            for text, tokens in zip(texts, batch)
+        ]
+
+    def _encode_offsets(self, text: str) -> List[int]:
+        """Token start offsets of ``text``, see ``token_offsets``."""
+        return self.token_offsets(text, self._encoding.encode_ordinary(text))
+
+    def token_offsets(self, text: str, tokens: Sequence[int], start: int = 0) -> List[int]:
+        """
+        Character offset of the start of each token, followed by the end.
+
+        Args:
+            text: Text that encodes to ``tokens``
+            tokens: Tokens of ``text``
+            start: Offset of ``text`` itself
+        """
+        pieces = self._encoding.decode_tokens_bytes(tokens)
+        if text.isascii():
+            lengths = map(len, pieces)
+        else:
+            lengths = (len(piece.translate(None, _CONTINUATION_BYTES)) for piece in pieces)
+        return list(accumulate(lengths, initial=start))
+
+    def windows(
+        self, text: str, offsets: List[int], final: bool, base: int = 0
+    ) -> List[Tuple[str, int, int]]:
+        """
+        Chunks for the token windows over ``offsets``.
+
+        Args:
+            text: Text the offsets point into, starting at offset ``base``
+            offsets: Token start offsets as returned by ``token_offsets``
+            final: Whether the last tokens are final, so that an incomplete
+                last window is returned as well
+            base: Offset of ``text``
+        """
+        return [
+            (text[start - base : end - base], start, end)
+            for start, end in self._window_bounds(text, offsets, final, base)
+        ]
+
+    def window_spans(self, text: str, offsets: List[int]) -> Spans:
+        """All token windows over the ``offsets`` of the whole ``text``, see ``windows``."""
+        spans = Spans(text)
+        for start, end in self._window_bounds(text, offsets, final=True):
+            spans.append(start, end)
+        return spans
+
+    def _window_bounds(
+        self, text: str, offsets: List[int], final: bool, base: int = 0
+    ) -> Iterator[Tuple[int, int]]:
+        """(start, end) of the token windows that are not only whitespace, see ``windows``."""
+        count = len(offsets) - 1
+        stride = self.chunk_size - self.chunk_overlap
+        for first in range(0, count, stride):
+            last = first + self.chunk_size
+            if last > count:
+                if not final:
+                    break
+                last = count
+            start, end = offsets[first], offsets[last]
+            if _NON_SPACE.search(text, start - base, end - base):
+                yield start, end
+            if last == count:
+                break
+
+
+def _last_cut(text: str, start: int) -> int:
+    """
+    Last position at or after ``start`` where tokenization can be split.
+
+    The encodings' pre-tokenizers end a run of letters or digits at the next
+    space and start a new piece with a space followed by letters, so a single
+    space between the two always starts a piece, however the text continues.
+    Returns 0 if there is no such position.
+    """
+    cut = text.rfind(" ", max(start, 1), len(text) - 1)
+    while cut > 0:
+        if text[cut - 1].isalnum() and text[cut + 1].isalpha():
+            return cut
+        cut = text.rfind(" ", max(start, 1), cut)
+    return 0
+
+
+class IncrementalTokenChunker(IncrementalChunker):
+    """
+    Incremental chunker for ``TokenChunker``.
+
+    Text is encoded up to the last position where tokenization cannot change
+    as more text arrives (see ``_last_cut``), and only the text after that
+    position is kept unencoded. Each character is therefore encoded once,
+    and a window is emitted as soon as ``chunk_size`` tokens are settled.
+    Buffered tokens are kept as their start offsets, so a window that
+    overlaps the next one is never re-encoded from its middle.
+    """
+
+    def __init__(self, chunker: TokenChunker, **kwargs):
+        super().__init__(chunker, **kwargs)
+        # Start offsets of the settled tokens, followed by the end of the
+        # settled text
+        self._offsets: List[int] = [0]
+
+    def flush(self) -> List[Tuple[str, int, int]]:
+        buffer = self._buffer()
+        self._settle(buffer[self._offsets[-1] - self._base :])
+        chunks = self._chunker.windows(buffer, self._offsets, final=True, base=self._base)
+        self._offsets = [self.end]
+        self._consume(self.end)
+        return chunks
+
+    def memory_usage(self) -> int:
+        return super().memory_usage() + sys.getsizeof(self._offsets)
+
+    def _complete_chunks(self, text: str) -> List[Tuple[str, int, int]]:
+        buffer = self._buffer()
+        unsettled = buffer[self._offsets[-1] - self._base :]
+        # Earlier positions were already searched when their text arrived
+        cut = _last_cut(unsettled, len(unsettled) - len(text) - 1)
+        if cut:
+            self._settle(unsettled[:cut])
+
+        chunk_size = self._chunker.chunk_size
+        count = len(self._offsets) - 1
+        if count < chunk_size:
+            return []
+        chunks = self._chunker.windows(buffer, self._offsets, final=False, base=self._base)
+        # Drop the tokens before the first window that is not complete yet
+        stride = chunk_size - self._chunker.chunk_overlap
+        del self._offsets[: ((count - chunk_size) // stride + 1) * stride]
+        return chunks
+
+    def _resume_at(self, chunks: List[Tuple[str, int, int]]) -> int:
+        # Overlapping tokens stay buffered for the next window
+        return self._offsets[0]
+
+    def _settle(self, text: str) -> None:
+        """Encode ``text``, which follows the settled tokens."""
+        if not text:
+            return
+        tokens = self._chunker._encoding.encode_ordinary(text)
+        self._offsets[-1:] = self._chunker.token_offsets(text, tokens, self._offsets[-1])
+
+    def _consume(self, end: int) -> None:
+        super()._consume(end)
+        if end > self._offsets[-1]:
+            self._offsets = [end]
+        else:
+            del self._offsets[: bisect_left(self._offsets, end)]
@@ -0,0 +1,163 @@
+"""
+Multi-process serving.
+
+Chunking is pure Python, so a single server process is bound to one core by
+the GIL. The supervisor here forks several workers that each run a full gRPC
+server on the same port with SO_REUSEPORT, letting the kernel spread
+connections across them. The chunker registry is built on import of the
+``chunkers`` package, and the chunkers in ``CHUNKER_WARMUP`` are loaded
+before the fork, so workers share them copy-on-write instead of each
+loading them again.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from typing import List, Optional
+
+from .metrics import worker_exited
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker must stay up before a crash no longer counts towards backoff
+STABLE_AFTER = 30
+MAX_BACKOFF = 30
+# Signals that start profiles in the workers, see ``profiling``
+PROFILING_SIGNALS = (signal.SIGUSR1, signal.SIGUSR2)
+
+
+class WorkerHealth:
+    """
+    Readiness of all workers, shared between processes.
+
+    Each worker marks its own slot once its server has started and the
+    supervisor clears the slot when the worker exits. Every worker reports the
+    aggregate, so a health check answered by any of them reflects the pool.
+    """
+
+    def __init__(self, ready, index: int):
+        self._ready = ready
+        self.index = index
+
+    def mark_ready(self) -> None:
+        """Mark this worker's server as started."""
+        self._ready[self.index] = 1
+
+    def ready_count(self) -> int:
+        """Number of workers currently serving."""
+        return sum(self._ready)
+
+    def all_ready(self) -> bool:
+        """Whether every worker is serving."""
+        return self.ready_count() == len(self._ready)
+
+
+def _worker_main(mode: str, health: WorkerHealth) -> None:
+    """Entry point of a forked worker process."""
+    from .grpc_server import serve
+
+    # Handlers installed by the supervisor are inherited across fork; the
+    # profiling signals are ignored until the server installs its handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    for signum in PROFILING_SIGNALS:
+        signal.signal(signum, signal.SIG_IGN)
+
+    logger.info(f"Worker {health.index} starting ({mode})")
+    if mode == "aio":
+        from .aio_server import serve_async
+
+        asyncio.run(serve_async(reuse_port=True, worker_health=health))
+    else:
+        serve(reuse_port=True, worker_health=health)
+
+
+class WorkerPool:
+    """Supervisor that forks server workers and restarts them if they exit."""
+
+    def __init__(self, workers: int, mode: str = "thread"):
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self._context = multiprocessing.get_context("fork")
+        self._workers = workers
+        self._mode = mode
+        self._ready = self._context.Array("b", workers)
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._started_at = [0.0] * workers
+        self._failures = [0] * workers
+        self._restart_at = [0.0] * workers
+        self._stopping = False
+
+    def _start(self, index: int) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self._mode, WorkerHealth(self._ready, index)),
+            name=f"chunker-worker-{index}",
+            daemon=False,
+        )
+        process.start()
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        logger.info(f"Started worker {index} (pid={process.pid})")
+
+    def _check(self, index: int, now: float) -> None:
+        """Restart worker ``index`` if it has exited, with crash backoff."""
+        process = self._processes[index]
+        if process is not None:
+            if process.is_alive():
+                return
+            self._ready[index] = 0
+            worker_exited(process.pid)
+            if now - self._started_at[index] >= STABLE_AFTER:
+                self._failures[index] = 0
+            self._failures[index] += 1
+            backoff = min(2 ** (self._failures[index] - 1), MAX_BACKOFF)
+            logger.error(
+                f"Worker {index} (pid={process.pid}) exited with code "
+                f"{process.exitcode}, restarting in {backoff}s"
+            )
+            self._processes[index] = None
+            self._restart_at[index] = now + backoff
+        if now >= self._restart_at[index]:
+            self._start(index)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _forward(self, signum, frame) -> None:
+        """Pass a profiling signal on to every running worker."""
+        for process in self._processes:
+            if process is not None:
+                try:
+                    os.kill(process.pid, signum)
+                except ProcessLookupError:
+                    pass
+
+    def run(self) -> None:
+        """Start all workers and supervise them until SIGTERM or SIGINT."""
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for signum in PROFILING_SIGNALS:
+            signal.signal(signum, self._forward)
+
+        for index in range(self._workers):
+            self._start(index)
+
+        while not self._stopping:
+            now = time.monotonic()
+            for index in range(self._workers):
+                self._check(index, now)
+            time.sleep(0.5)
+
+        logger.info("Stopping workers")
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.kill()
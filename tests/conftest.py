@@ -0,0 +1,93 @@
+"""
+In-process chunking servers for the gRPC tests, one of each mode.
+"""
+
+import asyncio
+import threading
+from concurrent import futures
+
+import grpc
+import pytest
+
+from chunkers import chunkers_pb2_grpc
+from chunkers.aio_server import AsyncChunkersServicer
+from chunkers.grpc_server import ChunkersServicer
+from chunkers.metrics import TimedThreadPoolExecutor
+from chunkers.result_cache import (AsyncPreserializedResponseInterceptor,
+                                   PreserializedResponseInterceptor)
+
+SERVER_MODES = ["thread", "aio"]
+
+
+class ThreadServer:
+    """Thread-pool server listening on a free local port."""
+
+    def __init__(self):
+        self.servicer = ChunkersServicer()
+        self._server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=8),
+            interceptors=[PreserializedResponseInterceptor()],
+        )
+        chunkers_pb2_grpc.add_ChunkersServiceServicer_to_server(self.servicer, self._server)
+        self.port = self._server.add_insecure_port("127.0.0.1:0")
+        self._server.start()
+
+    def stop(self):
+        self._server.stop(None)
+        self.servicer.lanes.shutdown()
+
+
+class AioServer:
+    """asyncio server listening on a free local port, with its loop on a thread of its own."""
+
+    def __init__(self):
+        self._executor = TimedThreadPoolExecutor(max_workers=4, executor_name="test")
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self.port = self._call(self._start())
+
+    async def _start(self):
+        self.servicer = AsyncChunkersServicer(self._executor)
+        self._server = grpc.aio.server(interceptors=[AsyncPreserializedResponseInterceptor()])
+        chunkers_pb2_grpc.add_ChunkersServiceServicer_to_server(self.servicer, self._server)
+        port = self._server.add_insecure_port("127.0.0.1:0")
+        await self._server.start()
+        return port
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def stop(self):
+        self._call(self._server.stop(None))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown()
+        self.servicer.lanes.shutdown()
+
+
+class Client:
+    """Stub of a test server, along with the server's servicer."""
+
+    def __init__(self, server):
+        self.servicer = server.servicer
+        self._channel = grpc.insecure_channel(f"127.0.0.1:{server.port}")
+        self.stub = chunkers_pb2_grpc.ChunkersServiceStub(self._channel)
+
+    def close(self):
+        self._channel.close()
+
+
+@pytest.fixture(scope="session")
+def servers():
+    """Client of each server mode, by mode."""
+    started = {"thread": ThreadServer(), "aio": AioServer()}
+    clients = {mode: Client(server) for mode, server in started.items()}
+    yield clients
+    for mode, server in started.items():
+        clients[mode].close()
+        server.stop()
+
+
+@pytest.fixture(params=SERVER_MODES)
+def client(request, servers):
+    """Client of one server mode; tests using it run against each mode."""
+    return servers[request.param]
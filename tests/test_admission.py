@@ -0,0 +1,143 @@
+"""
+Lanes admit work while it fits their queue and latency budget, and the
+servers shed the rest with a retry hint.
+"""
+
+import threading
+
+import grpc
+import pytest
+from prometheus_client import REGISTRY
+
+from chunkers import chunkers_pb2 as pb
+from chunkers.admission import (RETRY_PUSHBACK_KEY, AdmissionController, AdmissionPolicy, Lane,
+                                Overloaded)
+from chunkers.chunker_registry import ChunkerRegistry
+from chunkers.grpc_server import OFFLOAD_CHARS
+from chunkers.sentence_chunker import SentenceChunker
+
+
+def shed(model_id, reason):
+    return REGISTRY.get_sample_value("chunker_shed_requests_total", {"model_id": model_id, "reason": reason}) or 0.0
+
+
+@pytest.fixture
+def lane():
+    lanes = []
+
+    def create(**policy):
+        lanes.append(Lane(f"test_{len(lanes)}", AdmissionPolicy(**policy)))
+        return lanes[-1]
+
+    yield create
+    for created in lanes:
+        created.shutdown()
+
+
+def test_full_queue_rejects(lane):
+    lane = lane(concurrency=1, max_queued=1, budget=None)
+    release = threading.Event()
+    before = shed(lane.model_id, "queue_full")
+
+    running = lane.submit(10, release.wait, 5)
+    queued = lane.submit(10, lambda: "done")
+    with pytest.raises(Overloaded) as rejected:
+        lane.submit(10, lambda: "rejected")
+    release.set()
+
+    assert running.result(timeout=5)
+    assert queued.result(timeout=5) == "done"
+    assert rejected.value.reason == "queue_full"
+    # Nothing finished before the rejection to measure a wait by
+    assert rejected.value.retry_after == 1.0
+    assert shed(lane.model_id, "queue_full") == before + 1
+    assert lane.submit(10, lambda: "admitted again").result(timeout=5) == "admitted again"
+
+
+def test_budget_counts_admitted_characters(lane):
+    lane = lane(concurrency=1, max_queued=10, budget=1.0)
+    lane.seconds_per_char = 0.001
+
+    with lane.occupy(600):
+        lane.check(400)
+        with pytest.raises(Overloaded) as rejected:
+            lane.check(401)
+    lane.check(1000)
+
+    assert rejected.value.reason == "budget"
+    assert rejected.value.retry_after == pytest.approx(0.6)
+
+
+def test_free_threads_always_admit(lane):
+    lane = lane(concurrency=2, max_queued=0, budget=0.001)
+    lane.seconds_per_char = 1.0
+
+    with lane.occupy(10_000):
+        lane.check(10_000)
+        with lane.occupy(10_000):
+            with pytest.raises(Overloaded):
+                lane.check(1)
+
+
+def test_rate_is_measured_on_large_calls(lane):
+    lane = lane(concurrency=1, max_queued=1, budget=None)
+
+    lane.submit(Lane.RATE_MIN_CHARS - 1, lambda: None).result(timeout=5)
+    assert lane.seconds_per_char is None
+    lane.submit(Lane.RATE_MIN_CHARS, lambda: None).result(timeout=5)
+    assert lane.seconds_per_char is not None
+
+
+def test_controller_admits_all_lanes_or_none():
+    registry = ChunkerRegistry()
+    registry.register(SentenceChunker())
+    english = SentenceChunker(name="english")
+    english.admission_policy = AdmissionPolicy(concurrency=1, max_queued=0, budget=None)
+    registry.register(english)
+    controller = AdmissionController(registry)
+
+    with controller.lane("sentence_english").occupy(1):
+        with pytest.raises(Overloaded):
+            with controller.occupy({"sentence": 10, "sentence_english": 10}):
+                pass
+        assert controller.lane("sentence")._admitted == 0
+    with controller.occupy({"sentence": 10, "sentence_english": 10}):
+        assert controller.lane("sentence_english")._admitted == 1
+    controller.shutdown()
+
+
+def test_policy_from_config():
+    assert AdmissionPolicy.from_config(None) is None
+    assert AdmissionPolicy.from_config({"concurrency": 1, "budget_ms": 0}) == AdmissionPolicy(
+        concurrency=1, budget=None
+    )
+    with pytest.raises(ValueError, match="Unknown admission settings"):
+        AdmissionPolicy.from_config({"threads": 1})
+    with pytest.raises(ValueError, match="concurrency must be positive"):
+        AdmissionPolicy.from_config({"concurrency": 0})
+
+
+@pytest.fixture
+def busy_lane(client, monkeypatch):
+    """Sentence lane of the client's server, holding its one thread and queueing nothing."""
+    chunker = client.servicer.registry.get("sentence")
+    monkeypatch.setattr(chunker, "admission_policy", AdmissionPolicy(concurrency=1, max_queued=0, budget=None))
+    with client.servicer.lanes.lane("sentence").occupy(0):
+        yield
+
+
+def test_overloaded_requests_are_shed_with_pushback(client, busy_lane):
+    metadata = (("mm-model-id", "sentence"),)
+    large = "Large text. " * (OFFLOAD_CHARS // 12 + 1)
+
+    with pytest.raises(grpc.RpcError) as unary:
+        client.stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text=large), metadata=metadata)
+    with pytest.raises(grpc.RpcError) as stream:
+        list(client.stub.BidiStreamingChunkerTokenizationTaskPredict(iter(()), metadata=metadata))
+    small = client.stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text="Small."), metadata=metadata)
+
+    for rejected in (unary.value, stream.value):
+        assert rejected.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        assert dict(rejected.trailing_metadata())[RETRY_PUSHBACK_KEY] == "1000"
+    # Calls below the offload size run in the request's thread
+    assert [token.text for token in small.results] == ["Small."]
@@ -0,0 +1,171 @@
+"""
+Lazily registered chunkers are built once, holding up only lookups of
+the same name, and config entries are registered by name before they are
+built where their class allows. Variants configured with request
+parameters are cached by the parameters that differ.
+"""
+
+import threading
+import time
+from concurrent import futures
+
+import pytest
+
+from chunkers import sentence_chunker
+from chunkers.base_chunker import BaseChunker
+from chunkers.chunker_factory import ChunkerFactory
+from chunkers.chunker_registry import ChunkerRegistry
+from chunkers.sentence_chunker import SentenceChunker
+
+
+def blocked_loader(release, builds):
+    """Loader that waits for ``release`` and counts its builds."""
+
+    def load():
+        builds.append(threading.current_thread().name)
+        release.wait(5)
+        return SentenceChunker(name="slow")
+
+    return load
+
+
+def test_slow_load_does_not_block_other_names():
+    registry = ChunkerRegistry()
+    release, builds = threading.Event(), []
+    registry.register_lazy("sentence_slow", blocked_loader(release, builds))
+    registry.register_lazy("sentence", SentenceChunker)
+
+    with futures.ThreadPoolExecutor(max_workers=4) as pool:
+        slow = [pool.submit(registry.get, "sentence_slow") for _ in range(3)]
+        while not builds:
+            time.sleep(0.001)
+        fast = pool.submit(registry.get, "sentence")
+        assert fast.result(timeout=2).name == "sentence"
+        assert not any(future.done() for future in slow)
+        release.set()
+        chunkers = {id(future.result(timeout=5)) for future in slow}
+
+    assert len(builds) == 1
+    assert len(chunkers) == 1
+    assert registry.is_loaded("sentence_slow")
+
+
+def test_failed_load_drops_the_chunker():
+    registry = ChunkerRegistry()
+
+    def fail():
+        raise RuntimeError("no model")
+
+    registry.register_lazy("broken", fail)
+
+    assert registry.get("broken") is None
+    assert "broken" not in registry.list_names()
+
+
+def test_reload_during_load_wins():
+    registry = ChunkerRegistry()
+    release, builds = threading.Event(), []
+    registry.register_lazy("sentence_slow", blocked_loader(release, builds), source=1)
+
+    with futures.ThreadPoolExecutor(max_workers=1) as pool:
+        loading = pool.submit(registry.get, "sentence_slow")
+        while not builds:
+            time.sleep(0.001)
+        replacement = SentenceChunker(name="slow")
+        registry.reload([("sentence_slow", lambda: replacement, 2)])
+        release.set()
+
+        assert loading.result(timeout=5) is replacement
+    assert registry.get("sentence_slow") is replacement
+
+
+class CreatedToBeNamed(SentenceChunker):
+    """Chunker class that does not know its registered name in advance."""
+
+    registered_name = BaseChunker.registered_name
+
+    @property
+    def name(self):
+        return f"created_{self._name}"
+
+
+def test_config_entries_named_once_created(tmp_path):
+    config = tmp_path / "chunkers.yaml"
+    config.write_text(
+        f"eager:\n  class: {__name__}.CreatedToBeNamed\n"
+        "lazy:\n  class: chunkers.sentence_chunker.SentenceChunker\n"
+    )
+
+    loaders = {name: loader for name, loader, _ in ChunkerFactory.loaders_from_config(str(config))}
+
+    assert sorted(loaders) == ["created_eager", "sentence_lazy"]
+    assert isinstance(loaders["created_eager"](), CreatedToBeNamed)
+    assert loaders["created_eager"]() is loaders["created_eager"]()
+
+
+def english():
+    return SentenceChunker(name="english", abbreviations=["Dr"])
+
+
+def test_variants_are_cached_least_recently_used():
+    registry = ChunkerRegistry(max_configured=2)
+    registry.register(english())
+    base = registry.get("sentence_english")
+
+    short = registry.get("sentence_english", {"abbreviations": ["Mr"]})
+    no_ellipsis = registry.get("sentence_english", {"split_ellipsis": False})
+    assert registry.get("sentence_english", {"abbreviations": ["Mr"]}) is short
+    registry.get("sentence_english", {"abbreviations": ["St"]})
+
+    assert short.abbreviations == ("Mr",)
+    assert registry.get("sentence_english", {"abbreviations": ["Mr"]}) is short
+    assert registry.get("sentence_english", {"split_ellipsis": False}) is not no_ellipsis
+    # Parameters equal to the chunker's own need no variant
+    assert registry.get("sentence_english", {"abbreviations": ["Dr"], "split_ellipsis": True}) is base
+
+
+def test_variants_are_not_cached_without_room():
+    registry = ChunkerRegistry(max_configured=0)
+    registry.register(english())
+
+    first = registry.get("sentence_english", {"split_ellipsis": False})
+
+    assert registry.get("sentence_english", {"split_ellipsis": False}) is not first
+    assert not first.split_ellipsis
+
+
+def test_reload_drops_variants_of_replaced_chunkers():
+    registry = ChunkerRegistry()
+    registry.register_lazy("sentence_english", english, source=1)
+    variant = registry.get("sentence_english", {"split_ellipsis": False})
+
+    registry.reload([("sentence_english", english, 2)])
+
+    fresh = registry.get("sentence_english", {"split_ellipsis": False})
+    assert fresh is not variant
+    assert registry.get("sentence_english", {"split_ellipsis": False}) is fresh
+
+
+def test_invalid_parameters_are_rejected():
+    registry = ChunkerRegistry()
+    registry.register(english())
+
+    with pytest.raises(ValueError, match="does not accept parameter"):
+        registry.get("sentence_english", {"chunk_size": 10})
+    with pytest.raises(ValueError, match="split_ellipsis must be of type"):
+        registry.get("sentence_english", {"split_ellipsis": "no"})
+    with pytest.raises(ValueError, match="abbreviations must be of type"):
+        registry.get("sentence_english", {"abbreviations": ["Dr", 1]})
+
+
+def test_request_patterns_need_the_server_to_allow_them(monkeypatch):
+    registry = ChunkerRegistry()
+    registry.register(english())
+
+    monkeypatch.setattr(sentence_chunker, "ALLOW_REQUEST_PATTERN", False)
+    with pytest.raises(ValueError, match="CHUNKER_ALLOW_REQUEST_PATTERN"):
+        registry.get("sentence_english", {"pattern": r"[;]"})
+
+    monkeypatch.setattr(sentence_chunker, "ALLOW_REQUEST_PATTERN", True)
+    variant = registry.get("sentence_english", {"pattern": r"[;]"})
+    assert [text for text, _, _ in variant.chunk("a; b")] == ["a;", "b"]
@@ -0,0 +1,162 @@
+"""
+Config reloads swap in new and changed chunkers, keep the rest, and are
+triggered by the config file settling after a change.
+"""
+
+import threading
+import time
+
+import pytest
+
+from chunkers import grpc_server
+from chunkers.chunker_factory import ChunkerFactory
+from chunkers.chunker_registry import ChunkerRegistry
+from chunkers.config_watch import ConfigWatcher
+from chunkers.sentence_chunker import SentenceChunker
+
+CONFIG = """
+english:
+  class: chunkers.sentence_chunker.SentenceChunker
+  defaults:
+    abbreviations: [Dr]
+lenient:
+  class: chunkers.sentence_chunker.SentenceChunker
+  defaults:
+    split_ellipsis: false
+"""
+
+
+def reload(registry, path, config):
+    path.write_text(config)
+    return registry.reload(ChunkerFactory.loaders_from_config(str(path), strict=True))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    path = tmp_path / "chunker_config.yaml"
+    path.write_text(CONFIG)
+    registry = ChunkerRegistry()
+    registry.register(SentenceChunker())
+    for name, loader, source in ChunkerFactory.loaders_from_config(str(path)):
+        registry.register_lazy(name, loader, source)
+    return registry
+
+
+def test_reload_swaps_only_what_changed(registry, tmp_path):
+    english = registry.get("sentence_english")
+    lenient = registry.get("sentence_lenient")
+    config = CONFIG.replace("[Dr]", "[Dr, Mr]").replace("lenient:", "strict:")
+
+    changes = reload(registry, tmp_path / "chunker_config.yaml", config)
+
+    assert changes == {
+        "added": ["sentence_strict"],
+        "changed": ["sentence_english"],
+        "removed": ["sentence_lenient"],
+        "failed": [],
+    }
+    assert registry.get("sentence_english").abbreviations == ("Dr", "Mr")
+    assert registry.is_loaded("sentence_strict")
+    assert registry.get("sentence_lenient") is None
+    # Requests holding the previous chunkers finish with them
+    assert english.abbreviations == ("Dr",)
+    assert [text for text, _, _ in lenient.chunk("One... Two")] == ["One... Two"]
+
+
+def test_unchanged_chunkers_are_kept(registry, tmp_path):
+    english = registry.get("sentence_english")
+
+    changes = reload(registry, tmp_path / "chunker_config.yaml", CONFIG)
+
+    assert changes == {"added": [], "changed": [], "removed": [], "failed": []}
+    assert registry.get("sentence_english") is english
+    # Not loaded before the reload, and not built by it either
+    assert not registry.is_loaded("sentence_lenient")
+
+
+def test_failed_builds_keep_the_previous_version(registry, tmp_path):
+    english = registry.get("sentence_english")
+    config = CONFIG.replace("abbreviations: [Dr]", "abbreviations: [Dr]\n    pattern: '['")
+
+    changes = reload(registry, tmp_path / "chunker_config.yaml", config)
+
+    assert changes["failed"] == ["sentence_english"]
+    assert registry.get("sentence_english") is english
+
+
+def test_directly_registered_chunkers_are_not_reloaded(tmp_path):
+    registry = ChunkerRegistry()
+    english = SentenceChunker(name="english")
+    registry.register(english)
+
+    changes = reload(registry, tmp_path / "chunker_config.yaml", CONFIG)
+
+    assert changes["added"] == ["sentence_lenient"]
+    assert registry.get("sentence_english") is english
+
+
+def test_unreadable_config_changes_nothing(registry, tmp_path):
+    with pytest.raises(ValueError):
+        reload(registry, tmp_path / "chunker_config.yaml", "- not a mapping")
+
+    assert sorted(registry.list_names()) == ["sentence", "sentence_english", "sentence_lenient"]
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """Watched file, the list of calls of the watcher's callback and the event of each."""
+    path = tmp_path / "watched.yaml"
+    path.write_text("a: 1\n")
+    calls = []
+    changed = threading.Event()
+
+    def on_change():
+        calls.append(path.read_text())
+        changed.set()
+        if "fail" in calls[-1]:
+            raise RuntimeError("cannot apply")
+
+    watcher = ConfigWatcher(path, on_change, interval=0.01)
+    watcher.start()
+    # Let the watcher read the file's initial state
+    time.sleep(0.05)
+    yield path, calls, changed
+    watcher.stop()
+
+
+def test_watcher_calls_back_once_per_settled_change(watched):
+    path, calls, changed = watched
+
+    path.write_text("a: 2\n")
+    assert changed.wait(2)
+    time.sleep(0.05)
+
+    assert calls == ["a: 2\n"]
+
+
+def test_watcher_survives_errors_and_missing_files(watched):
+    path, calls, changed = watched
+
+    path.write_text("fail: 1\n")
+    assert changed.wait(2)
+    changed.clear()
+    path.unlink()
+    time.sleep(0.05)
+    # A file written again counts as changed, even with the same content
+    path.write_text("a: 1\n")
+    assert changed.wait(2)
+
+    assert calls == ["fail: 1\n", "a: 1\n"]
+
+
+def test_server_reload_keeps_the_config_on_errors(servers, monkeypatch):
+    servicer = servers["thread"].servicer
+
+    assert servicer.reload_config() == {"added": [], "changed": [], "removed": [], "failed": []}
+
+    def unreadable():
+        raise OSError("config missing")
+
+    monkeypatch.setattr(grpc_server, "reload_chunker_config", unreadable)
+    assert servicer.reload_config() is None
+    assert servicer.registry.get("sentence_english") is not None
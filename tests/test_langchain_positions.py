@@ -0,0 +1,185 @@
+"""
+Chunk positions recovered by ``LangChainChunker`` for overlapping chunks of
+repetitive text, where a chunk's text occurs at many positions.
+"""
+
+import logging
+
+import pytest
+
+from chunkers.chunker_factory import ChunkerFactory, LangChainChunker
+
+# Each LangChain splitter class in the shipped configuration, by entry name
+SPLITTER_ENTRIES = {
+    name: entry
+    for name, entry in ChunkerFactory._read_config(
+        str(ChunkerFactory.config_file())
+    ).items()
+    if entry["class"].startswith("langchain")
+}
+
+REPETITIVE_TEXTS = {
+    "words": "word " * 400,
+    "letters": "a a a a aa a " * 150,
+    "paragraphs": "Same line here.\nSame line here.\n\n" * 60,
+    "sentences": "It is. It is. It is not.  " * 80 + "\n\n" + "x y " * 100,
+    "no_separators": "abcabcabc" * 100,
+}
+
+
+# (splitter class, parameters, text, expected (start, end) of each chunk);
+# searching for each chunk from the previous one would find "b" inside the
+# chunk before it in the first two
+HAND_BUILT = [
+    ("CharacterTextSplitter", {"separator": " ", "chunk_size": 3, "chunk_overlap": 2}, "aab b", [(0, 3), (4, 5)]),
+    ("RecursiveCharacterTextSplitter", {"chunk_size": 4, "chunk_overlap": 2}, " bb b", [(1, 3), (4, 5)]),
+    (
+        "CharacterTextSplitter",
+        {"separator": " ", "chunk_size": 7, "chunk_overlap": 4},
+        "ab ab ab ab ab",
+        [(0, 5), (3, 8), (6, 11), (9, 14)],
+    ),
+    (
+        "RecursiveCharacterTextSplitter",
+        {"chunk_size": 10, "chunk_overlap": 5},
+        "aaa aaa aaa\n\naaa aaa aaa",
+        [(0, 7), (4, 11), (13, 20), (17, 24)],
+    ),
+]
+
+
+def chunker_for(entry, **overrides):
+    config = {**entry.get("defaults", {}), **overrides}
+    return LangChainChunker(name="test", class_path=entry["class"], **config)
+
+
+def marked(text):
+    """
+    ``text`` with each non-whitespace character replaced by a different one.
+
+    The configured splitters only split at whitespace or between any two
+    characters, and measure chunks in characters, so they cut the marked
+    text at the same positions. Each of its chunks occurs in it only once.
+    """
+    markers = iter(range(0x4E00, 0xA000))
+    return "".join(char if char.isspace() else chr(next(markers)) for char in text)
+
+
+def hooked_chunks(chunker, text, monkeypatch):
+    """Chunk ``text``, checking that every chunk took its position from the hooks."""
+    calls = []
+    calculate_positions = chunker._calculate_positions
+
+    def record(text, chunks, spans=()):
+        calls.append((chunks, spans))
+        return calculate_positions(text, chunks, spans)
+
+    monkeypatch.setattr(chunker, "_calculate_positions", record)
+    result = chunker.chunk(text)
+
+    ((chunks, spans),) = calls
+    assert len(spans) == len(chunks)
+    assert all(span[0] is chunk for span, chunk in zip(spans, chunks))
+    return result
+
+
+def assert_positions(text, chunks):
+    starts = [start for _, start, _ in chunks]
+    for chunk, start, end in chunks:
+        assert text[start:end] == chunk
+    # Not strictly increasing: with a large overlap, a splitter may emit a
+    # chunk and then a longer one from the same split
+    assert starts == sorted(starts)
+
+
+@pytest.mark.parametrize("class_name, config, text, expected", HAND_BUILT)
+def test_hand_built_positions(class_name, config, text, expected, monkeypatch):
+    chunker = LangChainChunker(
+        name="test", class_path=f"langchain_text_splitters.{class_name}", **config
+    )
+
+    chunks = hooked_chunks(chunker, text, monkeypatch)
+
+    assert [(start, end) for _, start, end in chunks] == expected
+    assert_positions(text, chunks)
+
+
+@pytest.mark.parametrize("entry_name", sorted(SPLITTER_ENTRIES))
+@pytest.mark.parametrize("text_name", sorted(REPETITIVE_TEXTS))
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(40, 10), (100, 60), (25, 24)])
+def test_overlapping_chunks_of_repetitive_text(
+    entry_name, text_name, chunk_size, chunk_overlap, monkeypatch
+):
+    text = REPETITIVE_TEXTS[text_name]
+    chunker = chunker_for(
+        SPLITTER_ENTRIES[entry_name], chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    chunks = hooked_chunks(chunker, text, monkeypatch)
+
+    assert [chunk for chunk, _, _ in chunks] == [
+        chunk for chunk in chunker._splitter.split_text(text) if chunk.strip()
+    ]
+    assert_positions(text, chunks)
+    # Each chunk of the marked text can only be at one position
+    unique = marked(text)
+    assert [(start, end) for _, start, end in chunks] == [
+        (unique.index(chunk), unique.index(chunk) + len(chunk))
+        for chunk in chunker._splitter.split_text(unique)
+        if chunk.strip()
+    ]
+
+
+@pytest.mark.parametrize("entry_name", sorted(SPLITTER_ENTRIES))
+def test_positions_come_from_hooks(entry_name, caplog):
+    chunker = chunker_for(SPLITTER_ENTRIES[entry_name], chunk_size=40, chunk_overlap=20)
+
+    with caplog.at_level(logging.ERROR, logger="chunkers.chunker_factory"):
+        chunker.chunk(REPETITIVE_TEXTS["paragraphs"])
+
+    assert chunker._tracked
+    assert not caplog.records
+
+
+@pytest.mark.parametrize("entry_name", sorted(SPLITTER_ENTRIES))
+def test_search_fallback_when_hooks_do_not_fire(entry_name, caplog):
+    text = REPETITIVE_TEXTS["paragraphs"]
+    chunker = chunker_for(SPLITTER_ENTRIES[entry_name], chunk_size=40, chunk_overlap=20)
+    expected = chunker.chunk(text)
+    # A splitter version whose split_text no longer calls the hooked steps
+    chunker._splitter.split_text = lambda value: [chunk for chunk, _, _ in expected]
+
+    with caplog.at_level(logging.ERROR, logger="chunkers.chunker_factory"):
+        chunks = chunker.chunk(text)
+        chunker.chunk(text)
+
+    assert [record.levelno for record in caplog.records] == [logging.ERROR]
+    assert "did not record" in caplog.records[0].getMessage()
+    assert [chunk for chunk, _, _ in chunks] == [chunk for chunk, _, _ in expected]
+    assert_positions(text, chunks)
+
+
+class BareSplitter:
+    """Splitter without the private steps of LangChain's ``TextSplitter``."""
+
+    def __init__(self, chunk_size, chunk_overlap):
+        self._chunk_overlap = chunk_overlap
+        self._chunk_size = chunk_size
+
+    def split_text(self, text):
+        step = self._chunk_size - self._chunk_overlap
+        return [text[start : start + self._chunk_size] for start in range(0, len(text), step)]
+
+
+def test_search_fallback_without_hook_attributes(caplog):
+    text = REPETITIVE_TEXTS["no_separators"]
+
+    with caplog.at_level(logging.ERROR, logger="chunkers.chunker_factory"):
+        chunker = LangChainChunker(
+            name="bare", class_path=f"{__name__}.BareSplitter", chunk_size=30, chunk_overlap=10
+        )
+    chunks = chunker.chunk(text)
+
+    assert not chunker._tracked
+    assert "has no _length_function, _merge_splits, _join_docs" in caplog.records[0].getMessage()
+    assert [chunk for chunk, _, _ in chunks] == chunker._splitter.split_text(text)
+    assert_positions(text, chunks)
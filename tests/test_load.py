@@ -0,0 +1,32 @@
+"""
+Chunk latencies measured by the load generator for paced streams.
+"""
+
+import statistics
+
+from benchmarks.corpus import llm_tokens
+from benchmarks.load import _stream
+from chunkers import chunkers_pb2
+
+TEXT = "The first sentence is short. Then comes another one! Does a third follow? It does. " * 2
+INTERVAL = 0.02
+
+
+def test_paced_latency_excludes_the_token_interval(client):
+    tokens = llm_tokens(TEXT)
+
+    stream = _stream(
+        client.stub,
+        chunkers_pb2.BidiStreamingChunkerTokenizationTaskRequest,
+        tokens,
+        INTERVAL,
+        (("mm-model-id", "sentence"),),
+    )
+
+    # One chunk per sentence
+    assert len(stream["latencies"]) == 8
+    assert min(stream["latencies"]) >= 0
+    # Chunks arrive within one pause of the message that completed them; timed
+    # from the message before it, each would take at least one interval
+    assert statistics.median(stream["latencies"]) < INTERVAL / 2
+    assert stream["duration"] >= INTERVAL * (len(tokens) - 1)
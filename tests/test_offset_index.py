@@ -0,0 +1,108 @@
+"""
+Offset indexes convert code point positions to UTF-8 and UTF-16 units,
+however their text arrives, in time linear in the text.
+"""
+
+import pytest
+
+from chunkers import chunkers_pb2 as pb
+from chunkers.offset_index import OffsetIndex
+
+WIDTHS = {"utf8": ("utf-8", 1), "utf16": ("utf-16-le", 2)}
+# ASCII first, then 2-, 3- and 4-byte characters, the last ones two UTF-16
+# units each, and a lone surrogate as Python strings can hold them
+TEXT = "Plain ASCII start. " + ("Ünïcödé 中文文本 😀👍🏽. " * 30) + "\ud800 end"
+
+
+def expected(unit, text, position):
+    encoding, width = WIDTHS[unit]
+    return len(text[:position].encode(encoding, "surrogatepass")) // width
+
+
+def pieces(text, size):
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, OffsetIndex.BLOCK - 1, OffsetIndex.BLOCK, OffsetIndex.BLOCK + 1, len(TEXT)])
+@pytest.mark.parametrize("unit", WIDTHS)
+def test_positions_convert_however_text_arrives(unit, size):
+    index = OffsetIndex(unit)
+    for piece in pieces(TEXT, size):
+        index.extend(piece)
+
+    assert not index.identity
+    assert [index.convert(position) for position in range(len(TEXT) + 1)] == [
+        expected(unit, TEXT, position) for position in range(len(TEXT) + 1)
+    ]
+
+
+def test_ascii_needs_no_conversion():
+    index = OffsetIndex("utf16", "all ascii")
+    index.extend(" still ascii")
+
+    assert index.identity
+    assert index.convert(5) == 5
+
+
+@pytest.mark.parametrize("unit", WIDTHS)
+def test_discarded_positions_are_rejected(unit):
+    index = OffsetIndex(unit, TEXT)
+    before = 19 + 3 * OffsetIndex.BLOCK + 5
+
+    index.discard(before)
+
+    # Positions in the ASCII prefix and from the block holding ``before`` on stay
+    assert index.convert(10) == 10
+    for position in range(before - 5, len(TEXT) + 1):
+        assert index.convert(position) == expected(unit, TEXT, position)
+    with pytest.raises(ValueError, match="discarded"):
+        index.convert(before - 6)
+    with pytest.raises(ValueError, match="beyond the text"):
+        index.convert(len(TEXT) + 1)
+
+
+def test_extending_encodes_each_character_once(monkeypatch):
+    index = OffsetIndex("utf8")
+    encoded = []
+    size = index._size
+    monkeypatch.setattr(index, "_size", lambda text: encoded.append(len(text)) or size(text))
+
+    for piece in pieces(TEXT * 10, 3):
+        index.extend(piece)
+
+    # Only complete blocks after the ASCII prefix are encoded as text arrives
+    assert sum(encoded) == len(TEXT * 10) - TEXT.index("Ü") - len(index._tail)
+    assert set(encoded) == {OffsetIndex.BLOCK}
+
+
+def test_unknown_units_are_rejected():
+    with pytest.raises(ValueError, match="Unknown offset unit"):
+        OffsetIndex("bytes")
+    with pytest.raises(ValueError, match="need no conversion"):
+        OffsetIndex("codepoint")
+
+
+def spans(results):
+    return [(token.start, token.end) for token in results]
+
+
+@pytest.mark.parametrize("unit", WIDTHS)
+def test_rpcs_return_offsets_in_the_requested_unit(client, unit):
+    text = TEXT.replace("\ud800", "")
+    metadata = (("mm-model-id", "sentence"),)
+    plain = client.stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text=text), metadata=metadata)
+    metadata += (("mm-offset-unit", unit),)
+
+    unary = client.stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text=text), metadata=metadata)
+    streamed = client.stub.BidiStreamingChunkerTokenizationTaskPredict(
+        (
+            pb.BidiStreamingChunkerTokenizationTaskRequest(text_stream=piece, input_index_stream=index)
+            for index, piece in enumerate(pieces(text, 5))
+        ),
+        metadata=metadata,
+    )
+
+    converted = [(expected(unit, text, start), expected(unit, text, end)) for start, end in spans(plain.results)]
+    assert spans(unary.results) == converted
+    assert [token.text for token in unary.results] == [token.text for token in plain.results]
+    assert [span for response in streamed for span in spans(response.results)] == [(0, converted[0][1]), *converted[1:]]
@@ -0,0 +1,129 @@
+"""
+The result cache evicts by size and age, and serves repeated unary
+requests with the response the first one got.
+"""
+
+import pytest
+from prometheus_client import REGISTRY
+
+from chunkers import chunkers_pb2 as pb
+from chunkers import result_cache
+from chunkers.result_cache import ENTRY_OVERHEAD, ResultCache
+
+TEXT = "A sentence to cache. And another one! " * 4
+
+
+def counted(name, **labels):
+    return REGISTRY.get_sample_value(f"{name}_total", labels) or 0.0
+
+
+def entry(name, size=100):
+    """Key and value of a cache entry taking ``size`` bytes plus the overhead."""
+    key = name.encode().ljust(16, b"\0")
+    return key, b"v" * (size - len(key))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic time seen by the cache, advanced by assigning ``clock.now``."""
+
+    class Clock:
+        now = 1000.0
+
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: Clock.now)
+    return Clock
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_bytes=2 * (100 + ENTRY_OVERHEAD))
+    a, b, c = entry("a"), entry("b"), entry("c")
+    evicted = counted("chunker_cache_evictions", reason="capacity")
+
+    cache.put(*a)
+    cache.put(*b)
+    assert cache.get(a[0]) == a[1]
+    cache.put(*c)
+
+    assert cache.get(b[0]) is None
+    assert cache.get(a[0]) == a[1]
+    assert cache.get(c[0]) == c[1]
+    assert counted("chunker_cache_evictions", reason="capacity") == evicted + 1
+
+
+def test_replacing_an_entry_keeps_the_size():
+    cache = ResultCache(max_bytes=2 * (100 + ENTRY_OVERHEAD))
+    a, b = entry("a"), entry("b")
+
+    for _ in range(3):
+        cache.put(*a)
+    cache.put(*b)
+
+    assert cache.get(a[0]) == a[1]
+    assert cache.get(b[0]) == b[1]
+
+
+def test_oversized_values_are_not_cached():
+    cache = ResultCache(max_bytes=100 + ENTRY_OVERHEAD)
+    small, large = entry("small"), entry("large", 101)
+
+    cache.put(*small)
+    cache.put(*large)
+
+    assert cache.get(large[0]) is None
+    assert cache.get(small[0]) == small[1]
+
+
+def test_entries_expire(clock):
+    cache = ResultCache(max_bytes=10_000, ttl=5)
+    key, value = entry("a")
+    expired = counted("chunker_cache_evictions", reason="ttl")
+
+    cache.put(key, value)
+    clock.now += 4.9
+    assert cache.get(key) == value
+    clock.now += 0.1
+
+    assert cache.get(key) is None
+    assert counted("chunker_cache_evictions", reason="ttl") == expired + 1
+
+
+def test_short_texts_bypass_the_cache():
+    cache = ResultCache(max_bytes=10_000, min_chars=10)
+
+    assert not cache.accepts("too short")
+    assert cache.accepts("long enough")
+
+
+def test_keys_identify_the_request():
+    key = ResultCache.key("sentence", {"a": 1, "b": [2]}, TEXT)
+
+    assert ResultCache.key("sentence", {"b": [2], "a": 1}, TEXT) == key
+    assert ResultCache.key("sentence_english", {"a": 1, "b": [2]}, TEXT) != key
+    assert ResultCache.key("sentence", {"a": 2, "b": [2]}, TEXT) != key
+    assert ResultCache.key("sentence", {"a": 1, "b": [2]}, TEXT + " ") != key
+    # Lone surrogates can arrive in Python strings and are hashed as they are
+    assert ResultCache.key("sentence", {}, "\ud800") != ResultCache.key("sentence", {}, "\ud801")
+
+
+def lookups():
+    return {result: counted("chunker_cache_lookups", result=result) for result in ("hit", "miss", "bypass")}
+
+
+def test_repeated_requests_are_served_from_the_cache(client, monkeypatch):
+    monkeypatch.setattr(client.servicer, "cache", ResultCache(max_bytes=1 << 20, min_chars=20))
+    plain = (("mm-model-id", "sentence"),)
+    offsets_only = (*plain, ("mm-offsets-only", "1"))
+
+    def predict(text, metadata):
+        return client.stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text=text), metadata=metadata)
+
+    before = lookups()
+    first = predict(TEXT, plain)
+    again = predict(TEXT, plain)
+    offsets = predict(TEXT, offsets_only)
+    predict("Too short.", plain)
+    after = lookups()
+
+    assert again == first
+    assert [token.text for token in offsets.results] == [""] * len(first.results)
+    assert {result: after[result] - before[result] for result in after} == {"hit": 1, "miss": 2, "bypass": 1}
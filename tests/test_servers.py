@@ -0,0 +1,163 @@
+"""
+The thread-pool and asyncio servers answer every RPC the same way.
+"""
+
+import grpc
+import pytest
+from google.protobuf import json_format
+
+from chunkers import chunkers_pb2 as pb
+from chunkers.base_chunker import BaseChunker
+from chunkers.sentence_chunker import SentenceChunker
+
+TEXT = "Dr. Smith arrived. Ünïcode text 😀 follows!  Then a question? Yes.\n\nNew paragraph. " * 3
+MODELS = ("mm-model-id", "sentence")
+
+
+def unary(text=TEXT):
+    return lambda stub, metadata: [
+        stub.ChunkerTokenizationTaskPredict(pb.ChunkerTokenizationTaskRequest(text=text), metadata=metadata)
+    ]
+
+
+def batch(*items):
+    request = pb.BatchChunkerTokenizationTaskRequest(
+        items=[pb.BatchChunkerTokenizationTaskItem(model_id=model_id, text=text) for model_id, text in items]
+    )
+    return lambda stub, metadata: [stub.BatchChunkerTokenizationTaskPredict(request, metadata=metadata)]
+
+
+def multi(*model_ids):
+    request = pb.MultiChunkerTokenizationTaskRequest(text=TEXT, model_ids=model_ids)
+    return lambda stub, metadata: [stub.MultiChunkerTokenizationTaskPredict(request, metadata=metadata)]
+
+
+def stream(size=7):
+    def call(stub, metadata):
+        requests = (
+            pb.BidiStreamingChunkerTokenizationTaskRequest(text_stream=TEXT[start : start + size], input_index_stream=index)
+            for index, start in enumerate(range(0, len(TEXT), size))
+        )
+        return list(stub.BidiStreamingChunkerTokenizationTaskPredict(requests, metadata=metadata))
+
+    return call
+
+
+def upload(data=TEXT.encode(), size=5):
+    def call(stub, metadata):
+        requests = (
+            pb.UploadChunkerTokenizationTaskRequest(data=data[start : start + size])
+            for start in range(0, len(data), size)
+        )
+        return list(stub.UploadChunkerTokenizationTaskPredict(requests, metadata=metadata))
+
+    return call
+
+
+# (RPC, request metadata, expected status)
+MATRIX = {
+    "unary": (unary(), (MODELS,), grpc.StatusCode.OK),
+    "unary_offsets_only": (unary(), (MODELS, ("mm-offsets-only", "1")), grpc.StatusCode.OK),
+    "unary_utf16": (unary(), (MODELS, ("mm-offset-unit", "utf16")), grpc.StatusCode.OK),
+    "unary_langchain": (unary(), (("mm-model-id", "langchain_recursive_character"),), grpc.StatusCode.OK),
+    "unary_params": (
+        unary(),
+        (("mm-model-id", "sentence_english"), ("mm-chunker-params", '{"abbreviations": ["Dr"]}')),
+        grpc.StatusCode.OK,
+    ),
+    "unary_bad_params": (unary(), (MODELS, ("mm-chunker-params", "[1]")), grpc.StatusCode.INVALID_ARGUMENT),
+    "unary_unknown_param": (
+        unary(),
+        (MODELS, ("mm-chunker-params", '{"nope": 1}')),
+        grpc.StatusCode.INVALID_ARGUMENT,
+    ),
+    "unary_pattern_not_allowed": (
+        unary(),
+        (MODELS, ("mm-chunker-params", '{"pattern": "[;]"}')),
+        grpc.StatusCode.INVALID_ARGUMENT,
+    ),
+    "unary_bad_unit": (unary(), (MODELS, ("mm-offset-unit", "bytes")), grpc.StatusCode.INVALID_ARGUMENT),
+    "unary_unknown": (unary(), (("mm-model-id", "nope"),), grpc.StatusCode.NOT_FOUND),
+    "batch": (
+        batch(("", TEXT), ("langchain_character", TEXT), ("sentence_english", "é. b.")),
+        (MODELS, ("mm-offset-unit", "utf8")),
+        grpc.StatusCode.OK,
+    ),
+    "batch_params": (
+        batch(("", TEXT)),
+        (MODELS, ("mm-chunker-params", "{}")),
+        grpc.StatusCode.INVALID_ARGUMENT,
+    ),
+    "batch_unknown": (batch(("nope", TEXT), ("", TEXT), ("also_nope", TEXT)), (MODELS,), grpc.StatusCode.NOT_FOUND),
+    "multi": (
+        multi("sentence", "langchain_recursive_character"),
+        (("mm-offsets-only", "true"), ("mm-offset-unit", "utf16")),
+        grpc.StatusCode.OK,
+    ),
+    "multi_from_metadata": (multi(), (("mm-model-id", "sentence, sentence_english"),), grpc.StatusCode.OK),
+    "multi_unknown": (multi("sentence", "nope"), (), grpc.StatusCode.NOT_FOUND),
+    "stream": (stream(), (MODELS,), grpc.StatusCode.OK),
+    "stream_coalesced_offsets": (
+        stream(),
+        (MODELS, ("mm-coalesce-chunks", "1"), ("mm-offsets-only", "1"), ("mm-offset-unit", "utf8")),
+        grpc.StatusCode.OK,
+    ),
+    "stream_flush": (stream(), (MODELS, ("mm-flush-max-chars", "20")), grpc.StatusCode.OK),
+    "stream_bad_flush": (stream(), (MODELS, ("mm-flush-max-chars", "many")), grpc.StatusCode.INVALID_ARGUMENT),
+    "stream_unknown": (stream(), (("mm-model-id", "nope"),), grpc.StatusCode.NOT_FOUND),
+    "upload": (upload(), (MODELS, ("mm-offset-unit", "utf16")), grpc.StatusCode.OK),
+    "upload_offsets_only": (upload(), (MODELS, ("mm-offsets-only", "1")), grpc.StatusCode.OK),
+    "upload_bad_data": (upload(b"ok. \xff\xfe bad."), (MODELS,), grpc.StatusCode.INVALID_ARGUMENT),
+    "upload_truncated": (upload("fine. é".encode()[:-1]), (MODELS,), grpc.StatusCode.INVALID_ARGUMENT),
+}
+
+
+def outcome(client, rpc, metadata):
+    """Status, details and responses of one RPC, without timings that differ between calls."""
+    try:
+        responses = rpc(client.stub, metadata)
+    except grpc.RpcError as e:
+        return e.code(), e.details(), None
+    for response in responses:
+        if isinstance(response, pb.BatchChunkerTokenizationResults):
+            del response.item_duration_us[:]
+    return grpc.StatusCode.OK, "", [json_format.MessageToDict(response) for response in responses]
+
+
+@pytest.mark.parametrize("case", sorted(MATRIX))
+def test_servers_answer_alike(servers, case):
+    rpc, metadata, expected = MATRIX[case]
+    outcomes = {mode: outcome(client, rpc, metadata) for mode, client in servers.items()}
+
+    assert outcomes["thread"][0] == expected
+    assert outcomes["aio"] == outcomes["thread"]
+    if expected == grpc.StatusCode.OK:
+        assert outcomes["thread"][2]
+
+
+def test_timing_trailer(client):
+    _, call = client.stub.ChunkerTokenizationTaskPredict.with_call(
+        pb.ChunkerTokenizationTaskRequest(text=TEXT), metadata=(MODELS, ("mm-timing", "1"))
+    )
+    trailers = dict(call.trailing_metadata())
+    assert "chunk;dur=" in trailers["server-timing"]
+    assert "total;dur=" in trailers["server-timing"]
+
+
+class Unconfigurable(SentenceChunker):
+    """Chunker that lists request parameters but is not configured with them."""
+
+    configure = BaseChunker.configure
+
+
+def test_unsupported_parameters_are_invalid(servers):
+    servers["thread"].servicer.registry.register(Unconfigurable(name="unconfigurable"))
+    metadata = (("mm-model-id", "sentence_unconfigurable"), ("mm-chunker-params", '{"split_ellipsis": false}'))
+
+    outcomes = {mode: outcome(client, unary(), metadata) for mode, client in servers.items()}
+
+    assert outcomes["thread"][:2] == (
+        grpc.StatusCode.INVALID_ARGUMENT,
+        "sentence_unconfigurable takes no request parameters",
+    )
+    assert outcomes["aio"] == outcomes["thread"]
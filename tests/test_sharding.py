@@ -0,0 +1,73 @@
+"""
+Sharded chunking must return exactly the chunks of chunking the text in one
+piece, whatever the cuts land on.
+"""
+
+import pytest
+
+from chunkers import get_chunker_registry
+from chunkers.sharding import ShardExecutor
+
+SENTENCE_CHUNKERS = ["sentence", "sentence_english"]
+
+# Sentences with abbreviations, ellipses, runs of terminators, numbers and
+# non-Latin-1 text, so that cuts fall on or next to each of them
+UNIT = (
+    "Dr. Smith met Mr. Jones at 3.14 p.m. on the U.S. coast. "
+    "Wait... Really?! Yes!!! e.g. Apples and i.e. Pears are fruit. "
+    "Price: $5.00.   Next line follows.\n\nNew paragraph here? "
+    "Ünïcode sentence. 中文句子。 Emoji 😀 ends it. "
+)
+
+
+@pytest.fixture(scope="module")
+def shards():
+    executor = ShardExecutor(workers=4, min_chars=0)
+    yield executor
+    executor.shutdown()
+
+
+def texts():
+    """Texts whose equally spaced cut positions move across every character of ``UNIT``."""
+    for shift in range(0, len(UNIT), 7):
+        yield "x " * shift + UNIT * 8
+
+
+@pytest.mark.parametrize("model_id", SENTENCE_CHUNKERS)
+def test_cuts_are_sentence_starts(model_id):
+    chunker = get_chunker_registry().get(model_id)
+    for text in texts():
+        starts = set(chunker.chunk_spans(text).starts)
+        for shards in (2, 3, 4, 7):
+            cuts = chunker.shard_cuts(text, shards)
+            assert cuts
+            assert cuts == sorted(set(cuts))
+            assert set(cuts) <= starts
+
+
+@pytest.mark.parametrize("model_id", SENTENCE_CHUNKERS)
+def test_sharded_chunks_equal_serial_chunks(model_id, shards):
+    chunker = get_chunker_registry().get(model_id)
+    for text in texts():
+        assert shards.run(chunker, text).tuples() == chunker.chunk_spans(text).tuples()
+
+
+def test_configured_chunker_shards_like_serial(shards):
+    chunker = get_chunker_registry().get(
+        "sentence_english", {"abbreviations": ["Dr", "p.m", "Apples"], "split_ellipsis": True}
+    )
+    for text in texts():
+        assert shards.run(chunker, text).tuples() == chunker.chunk_spans(text).tuples()
+
+
+def test_custom_pattern_is_not_sharded(shards):
+    chunker = get_chunker_registry().get("sentence").configure(pattern=r"[.!?]\s")
+    text = UNIT * 8
+    assert chunker.shard_cuts(text, 4) is None
+    assert shards.run(chunker, text).tuples() == chunker.chunk_spans(text).tuples()
+
+
+def test_langchain_chunkers_are_not_sharded():
+    registry = get_chunker_registry()
+    for model_id in ("langchain_recursive_character", "langchain_character"):
+        assert registry.get(model_id).shard_cuts(UNIT * 8, 4) is None
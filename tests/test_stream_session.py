@@ -0,0 +1,245 @@
+"""
+Streams chunk text as it arrives into the chunks one call would return,
+with the range of messages each chunk came from, holding only the text
+not yet emitted. Flush policies emit text that waits too long for a
+boundary.
+"""
+
+import logging
+import queue
+import sys
+import time
+
+import pytest
+
+from benchmarks.corpus import SHAPES, generate, llm_tokens
+from chunkers import chunkers_pb2 as pb
+from chunkers import get_chunker_registry
+from chunkers.stream_session import FlushPolicy, StreamSession
+
+CHUNKERS = ["sentence", "sentence_english", "langchain_recursive_character", "langchain_character"]
+
+
+def run(session, messages, start_index=0):
+    """Feed ``messages`` with consecutive input indices, then finalize."""
+    results = []
+    for index, text in enumerate(messages, start_index):
+        results += session.feed(text, index)
+    return results + session.finalize()
+
+
+def pieces(text, size):
+    return [text[start : start + size] for start in range(0, len(text), size)]
+
+
+@pytest.fixture(autouse=True)
+def quiet_langchain(caplog):
+    # LangChain splitters warn about every oversized chunk
+    caplog.set_level(logging.ERROR)
+
+
+@pytest.mark.parametrize("size", [1, 3, 17, 500])
+@pytest.mark.parametrize("shape", SHAPES)
+@pytest.mark.parametrize("name", CHUNKERS)
+def test_stream_matches_one_call(name, shape, size):
+    chunker = get_chunker_registry().get(name)
+    text = "  " + generate(shape, 3000)
+    expected = [(start, end) for _, start, end in chunker.chunk(text)]
+    # Leading whitespace belongs to the first streamed chunk
+    expected[0] = (0, expected[0][1])
+
+    results = run(StreamSession(chunker), pieces(text, size))
+
+    assert [(start, end) for _, start, end, _, _ in results] == expected
+    assert [chunk for chunk, *_ in results] == [text[start:end] for start, end in expected]
+
+
+def test_input_index_ranges():
+    chunker = get_chunker_registry().get("sentence")
+    messages = ["Hello there.", " How", " are you?", " Fine", "!", " ok"]
+
+    results = run(StreamSession(chunker), messages, start_index=10)
+
+    assert results == [
+        # Completed by " How", which shows the next sentence starting
+        ("Hello there.", 0, 12, 10, 10),
+        ("How are you?", 13, 25, 11, 12),
+        ("Fine! ok", 26, 34, 13, 15),
+    ]
+
+
+def test_whitespace_only_stream_is_echoed():
+    chunker = get_chunker_registry().get("sentence")
+
+    results = run(StreamSession(chunker), [" ", "\n", ""])
+
+    assert results == [(" ", 0, 1, 0, 2), ("\n", 1, 2, 0, 2), ("", 2, 2, 0, 2)]
+
+
+def test_messages_without_index_keep_the_range():
+    chunker = get_chunker_registry().get("sentence")
+    session = StreamSession(chunker)
+
+    results = session.feed("One. ", 4) + session.feed("Two", -1) + session.finalize()
+
+    assert results == [("One.", 0, 4, 4, 4), ("Two", 5, 8, 4, 4)]
+
+
+@pytest.mark.parametrize("name", CHUNKERS)
+def test_parts_size_tracks_the_buffer(name):
+    stream = get_chunker_registry().get(name).incremental()
+
+    def held():
+        return sum(sys.getsizeof(part) for part in stream._parts)
+
+    for token in llm_tokens(generate("prose", 2000)):
+        stream.feed(token)
+        assert stream._parts_size == held()
+    stream.flush()
+    assert stream._parts_size == held()
+    stream.feed("no boundary yet")
+    stream.discard()
+    assert stream._parts_size == held() == 0
+
+
+def test_emitted_text_is_dropped():
+    session = StreamSession(get_chunker_registry().get("sentence"))
+    text = generate("prose", 200_000)
+
+    run(session, llm_tokens(text))
+
+    assert session.processed == len(text)
+    assert session.peak_buffered < 2000
+    assert session.peak_memory < 10_000
+    assert session.buffered == 0
+    assert session.memory_usage() < 100
+
+
+def test_max_buffered_flushes_early():
+    session = StreamSession(get_chunker_registry().get("sentence"), max_buffered=100)
+    text = generate("no_punctuation", 2000)
+    results = []
+    for index, token in enumerate(llm_tokens(text)):
+        results += session.feed(token, index)
+        assert session.buffered <= 100
+    results += session.finalize()
+
+    assert session.forced_flushes == len(results) - 1
+    assert (results[0][1], results[-1][2]) == (0, len(text.rstrip()))
+    for previous, chunk in zip(results, results[1:]):
+        # Only whitespace is left out between chunks
+        assert not text[previous[2] : chunk[1]].strip()
+        assert previous[4] <= chunk[3] <= chunk[4]
+
+
+def test_max_chars_flushes_partial_chunks():
+    policy = FlushPolicy(max_chars=20)
+    session = StreamSession(get_chunker_registry().get("sentence"), flush_policy=policy)
+    messages = ["one two three ", "four five six ", "seven. Eight", " nine"]
+
+    results = run(session, messages)
+
+    assert results == [
+        ("one two three four five six", 0, 27, 0, 1),
+        # Started and completed by message 2
+        ("seven.", 28, 34, 2, 2),
+        ("Eight nine", 35, 45, 2, 3),
+    ]
+    assert session.policy_flushes == 1
+
+
+def test_max_messages_counts_since_the_last_emission():
+    policy = FlushPolicy(max_messages=2)
+    session = StreamSession(get_chunker_registry().get("sentence"), flush_policy=policy)
+
+    results = [session.feed(text, index) for index, text in enumerate(["a ", "b. C", " d", " e"])]
+
+    # Emitting "a b." restarts the count
+    assert results == [[], [("a b.", 0, 4, 0, 0)], [], [("C d e", 5, 10, 1, 3)]]
+
+
+def test_max_wait_flushes_on_poll():
+    policy = FlushPolicy(max_wait=0.1)
+    session = StreamSession(get_chunker_registry().get("sentence"), flush_policy=policy)
+
+    assert session.deadline() is None
+    assert session.feed("still", 0, now=10.0) == []
+    assert session.feed(" going", 1, now=10.05) == []
+    assert session.deadline() == pytest.approx(10.1)
+    assert session.poll(now=10.09) == []
+    assert session.poll(now=10.1) == [("still going", 0, 11, 0, 1)]
+    assert session.deadline() is None
+    assert session.feed(" on", 2, now=11.0) == []
+    assert session.deadline() == pytest.approx(11.1)
+
+
+def test_policy_from_metadata_overrides_the_default():
+    default = FlushPolicy.from_config({"max_chars": 100, "max_wait_ms": 500})
+
+    policy = FlushPolicy.from_metadata({"mm-flush-max-messages": "3", "mm-flush-max-chars": "10"}, default)
+
+    assert (policy.max_chars, policy.max_messages, policy.max_wait) == (10, 3, 0.5)
+    assert FlushPolicy.from_metadata({}, default) is default
+    with pytest.raises(ValueError, match="mm-flush-max-wait-ms"):
+        FlushPolicy.from_metadata({"mm-flush-max-wait-ms": "soon"})
+    with pytest.raises(ValueError, match="max_messages must be positive"):
+        FlushPolicy.from_metadata({"mm-flush-max-messages": "0"})
+    with pytest.raises(ValueError, match="Unknown flush settings"):
+        FlushPolicy.from_config({"max_tokens": 5})
+
+
+def open_stream(client, metadata):
+    """Bidi stream with a sender for its requests and the iterator of its responses."""
+    requests = queue.Queue()
+    done = object()
+
+    def send(text=None, index=0):
+        if text is None:
+            requests.put(done)
+        else:
+            requests.put(pb.BidiStreamingChunkerTokenizationTaskRequest(text_stream=text, input_index_stream=index))
+
+    responses = client.stub.BidiStreamingChunkerTokenizationTaskPredict(
+        iter(requests.get, done), metadata=(("mm-model-id", "sentence"), *metadata), timeout=5
+    )
+    # The server opens the stream with an empty response
+    assert not next(responses).results
+    return send, responses
+
+
+def texts(response):
+    return [token.text for token in response.results]
+
+
+@pytest.mark.parametrize(
+    "key, value, messages",
+    [
+        ("mm-flush-max-chars", "15", ["no boundary ", "in sight"]),
+        ("mm-flush-max-messages", "2", ["no boundary", " in sight"]),
+    ],
+)
+def test_flush_metadata_emits_before_a_boundary(client, key, value, messages):
+    send, responses = open_stream(client, [(key, value)])
+    for index, text in enumerate(messages):
+        send(text, index)
+
+    response = next(responses)
+    send()
+
+    assert texts(response) == ["no boundary in sight"]
+    assert (response.input_start_index, response.input_end_index) == (0, 1)
+    assert list(responses) == []
+
+
+def test_flush_wait_metadata_emits_while_the_client_is_idle(client):
+    send, responses = open_stream(client, [("mm-flush-max-wait-ms", "50")])
+    send("waiting for more", 7)
+
+    started = time.monotonic()
+    response = next(responses)
+    waited = time.monotonic() - started
+    send()
+
+    assert texts(response) == ["waiting for more"]
+    assert 0.03 < waited < 2
+    assert list(responses) == []
@@ -0,0 +1,44 @@
+"""
+Encodings of ``TokenChunker`` are looked up in the bundled directory
+without changing the environment of the process.
+"""
+
+import os
+
+import pytest
+
+from chunkers import token_chunker
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Cache directory seen by each tiktoken encoding load."""
+    seen = []
+
+    def get_encoding(name):
+        seen.append(os.environ.get("TIKTOKEN_CACHE_DIR"))
+        return name
+
+    monkeypatch.setattr(token_chunker.tiktoken, "get_encoding", get_encoding)
+    token_chunker.get_encoding.cache_clear()
+    yield seen
+    token_chunker.get_encoding.cache_clear()
+
+
+def test_cache_dir_is_set_only_while_loading(loads, monkeypatch, tmp_path):
+    monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+
+    token_chunker.get_encoding("cl100k_base")
+    token_chunker.get_encoding("o200k_base", tmp_path)
+
+    assert loads == [str(token_chunker.ENCODINGS_DIR), str(tmp_path)]
+    assert "TIKTOKEN_CACHE_DIR" not in os.environ
+
+
+def test_cache_dir_from_environment_wins(loads, monkeypatch, tmp_path):
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+
+    token_chunker.get_encoding("cl100k_base")
+
+    assert loads == [str(tmp_path)]
+    assert os.environ["TIKTOKEN_CACHE_DIR"] == str(tmp_path)
@@ -0,0 +1,108 @@
+"""
+Uploaded documents chunk as one unary request for the whole document
+would, whatever segments they arrive in.
+"""
+
+import logging
+
+import pytest
+
+from benchmarks.corpus import generate
+from chunkers import chunkers_pb2 as pb
+from chunkers import get_chunker_registry
+from chunkers.stream_session import UploadSession
+
+DOCUMENT = generate("prose", 1500) + generate("cjk", 500) + "Émoji 😀 ends it. Done!"
+# LangChain splitters re-run on the unemitted text only match the whole
+# document if no word is longer than their chunk size, unlike CJK text
+CASES = [
+    ("sentence", DOCUMENT),
+    ("sentence_english", DOCUMENT),
+    ("langchain_recursive_character", generate("prose", 2000) + "Émoji 😀 ends it. Done!"),
+]
+
+
+@pytest.fixture(autouse=True)
+def quiet_langchain(caplog):
+    # LangChain splitters warn about every oversized chunk
+    caplog.set_level(logging.ERROR)
+
+
+def segments(data, size):
+    return [data[start : start + size] for start in range(0, len(data), size)]
+
+
+def segment_of(ends, position):
+    """Number of the segment holding the character at ``position``."""
+    return next(number for number, end in enumerate(ends) if position < end)
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+@pytest.mark.parametrize("name, document", CASES, ids=[name for name, _ in CASES])
+def test_upload_matches_one_call(name, document, size):
+    chunker = get_chunker_registry().get(name)
+    session = UploadSession(chunker)
+    results = []
+    ends = []
+    decoded = b""
+    for data in segments(document.encode(), size):
+        results += session.feed(data=data)
+        decoded += data
+        ends.append(len(decoded.decode(errors="ignore")))
+    results += session.finalize()
+
+    assert [(text, start, end) for text, start, end, _, _ in results] == chunker.chunk(document)
+    for _, start, end, input_start, input_end in results:
+        assert (input_start, input_end) == (segment_of(ends, start), segment_of(ends, end - 1))
+
+
+def test_text_and_data_segments_mix():
+    session = UploadSession(get_chunker_registry().get("sentence"))
+
+    results = session.feed(text="Crème ") + session.feed(data="brûlée. ".encode()) + session.feed(text="Next")
+    results += session.finalize()
+
+    assert results == [("Crème brûlée.", 0, 13, 0, 1), ("Next", 14, 18, 2, 2)]
+
+
+@pytest.mark.parametrize(
+    "upload",
+    [[b"ok. \xff"], ["é".encode()[:1], "x"], ["é".encode()[:1]]],
+    ids=["invalid", "text_inside_character", "truncated"],
+)
+def test_bad_utf8_is_rejected(upload):
+    session = UploadSession(get_chunker_registry().get("sentence"))
+
+    with pytest.raises(ValueError):
+        for segment in upload:
+            session.feed(**{"text" if isinstance(segment, str) else "data": segment})
+        session.finalize()
+
+
+def test_max_buffered_emits_early():
+    session = UploadSession(get_chunker_registry().get("sentence"), max_buffered=100)
+    document = generate("no_punctuation", 1000)
+    results = []
+    for text in segments(document, 30):
+        results += session.feed(text=text)
+        assert session.buffered <= 100
+    results += session.finalize()
+
+    assert session.forced_flushes == len(results) - 1
+    for previous, chunk in zip(results, results[1:]):
+        assert not document[previous[2] : chunk[1]].strip()
+
+
+def test_upload_rpc_matches_unary(client):
+    metadata = (("mm-model-id", "sentence"), ("mm-offset-unit", "utf8"))
+    unary = client.stub.ChunkerTokenizationTaskPredict(
+        pb.ChunkerTokenizationTaskRequest(text=DOCUMENT), metadata=metadata
+    )
+
+    responses = client.stub.UploadChunkerTokenizationTaskPredict(
+        (pb.UploadChunkerTokenizationTaskRequest(data=data) for data in segments(DOCUMENT.encode(), 333)),
+        metadata=metadata,
+    )
+
+    tokens = [token for response in responses for token in response.results]
+    assert tokens == list(unary.results)